@@ -1,14 +1,22 @@
-from flask import Flask, jsonify, request
+from flask import Blueprint, Flask, jsonify, request
 from flask_cors import CORS
+import functools
 import os
 from dotenv import load_dotenv
-from weather_data import local_weather, rainfall_nowcast, uv_index, weather_warning, several_days_weather_forecast
+from hko_cache import CACHE
+from fetch_plan import required_feeds, fetch_feeds, fetch_many
+from refresh_scheduler import RefreshScheduler, hot_urls, REFRESH_FRACTION, JITTER
+from district_snapshot import DistrictSnapshots
+from intent_parser import IntentParser
+import gazetteer
+import spatial_index
+from session_store import SessionStore, SQLiteBackend
 
 # Load environment variables
 load_dotenv()
 
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+# The chat API, registered on the app create_app builds
+api = Blueprint('api', __name__)
 
 # District coordinates mapping
 DISTRICT_COORDINATES = {
@@ -21,50 +29,33 @@ DISTRICT_COORDINATES = {
     'yuen long': {'lat': 22.4445, 'lng': 114.0225}
 }
 
-def is_greeting(text):
-    """Check if the text is a greeting"""
-    greetings = ['hi', 'hello', 'hey', 'good morning', 'good afternoon', 'good evening']
-    return any(greeting in text.lower() for greeting in greetings)
+# The latest weather of every district, rebuilt whenever its feeds change
+SNAPSHOTS = DistrictSnapshots(DISTRICT_COORDINATES).attach(CACHE)
 
-def is_weather_query(text):
-    """Check if the text contains weather-related keywords"""
-    weather_keywords = ['weather', 'temperature', 'rain', 'humidity', 'uv', 'forecast', 'wind']
-    return any(keyword in text.lower() for keyword in weather_keywords)
+@functools.lru_cache(maxsize=None)
+def get_gazetteer():
+    """Every place a user can ask about: the districts above, then every named
+    place in the grid assets, in English and Chinese. Built on first use."""
+    return gazetteer.load(DISTRICT_COORDINATES)
 
-def extract_district(text):
-    """Extract Hong Kong district from text"""
-    for district in DISTRICT_COORDINATES.keys():
-        if district in text.lower():
-            return district
-    return None
+@functools.lru_cache(maxsize=None)
+def get_intent_parser():
+    """Reads every slot of a chat message in one pass. Built on first use."""
+    return IntentParser(get_gazetteer().aliases())
 
-def get_forecast_period(text):
-    """Extract forecast period from text"""
-    text = text.lower()
-    if '3 day' in text or '3-day' in text or '3day' in text:
-        return '3day'
-    elif '2 day' in text or '2-day' in text or '2day' in text:
-        return '2day'
-    elif 'tomorrow' in text:
-        return 'tomorrow'
-    elif 'today' in text:
-        return 'today'
-    return None
+def preload():
+    """Build the lookup tables, gazetteer and intent parser now instead of on
+    the first chat message, e.g. before a server forks its workers"""
+    spatial_index.preload()
+    get_intent_parser()
 
-def get_weather_info_type(text):
-    """Extract specific weather information type from text"""
-    text = text.lower()
-    if 'wind' in text:
-        return 'wind'
-    elif 'temperature' in text:
-        return 'temperature'
-    elif 'humidity' in text:
-        return 'humidity'
-    elif 'uv' in text:
-        return 'uv'
-    elif 'overall' in text or 'general' in text:
-        return 'overall'
-    return 'overall'
+# Conversations, so follow-up turns reuse the slots of earlier ones.
+# Set HKO_SESSION_DB to a file path to share them between the worker
+# processes of a host, whichever worker each turn reaches
+SESSIONS = SessionStore(SQLiteBackend(os.environ['HKO_SESSION_DB']) if os.environ.get('HKO_SESSION_DB') else None)
+
+# The most messages /api/chat/batch answers in one request
+MAX_BATCH = 100
 
 def get_weather_recommendations(weather_info, info_type):
     """Get recommendations based on weather conditions"""
@@ -142,116 +133,157 @@ def get_weather_recommendations(weather_info, info_type):
 def format_weather_response(district, coords, period, info_type):
     """Format weather data into a dialogue-friendly response"""
     try:
-        # Get local weather data
-        local_data = local_weather(coords['lat'], coords['lng'])
-        
-        # Get UV index data
-        uv_data = uv_index('EN')
-        
-        # Get forecast data
-        forecast_data = several_days_weather_forecast('EN')
+        # Answer from the district's snapshot when it is fresh, otherwise
+        # fetch only the feeds this answer reads, in parallel; those fetched
+        # for an earlier turn are answered by the response cache
+        snapshot = SNAPSHOTS.get(district)
+        if snapshot is not None:
+            data = snapshot.data
+        else:
+            data = fetch_feeds(coords, required_feeds(period, info_type))
+        return render_weather_response(district, period, info_type, data)
+    except Exception as e:
+        print(f"Error in format_weather_response: {str(e)}")  # Add logging
+        return f"Sorry, I couldn't get the weather information for {district.capitalize()} at the moment. Please try again later."
+
+def format_weather_responses(queries):
+    """Format several weather answers, fetching each feed they share only once
+
+    Args:
+        queries (list): (district, coords, period, info_type) tuples
+
+    Returns:
+        list: The answer to each query
+    """
+    datas = []
+    plans = []
+    for district, coords, period, info_type in queries:
+        snapshot = SNAPSHOTS.get(district)
+        if snapshot is not None:
+            datas.append(snapshot.data)
+            continue
+        plans.append((len(datas), coords, required_feeds(period, info_type)))
+        datas.append(None)
+    for (i, _, _), fetched in zip(plans, fetch_many([(coords, feeds) for _, coords, feeds in plans])):
+        datas[i] = fetched
+    messages = []
+    for (district, _, period, info_type), data in zip(queries, datas):
+        try:
+            errors = [value for value in data.values() if isinstance(value, Exception)]
+            if errors:
+                raise errors[0]
+            messages.append(render_weather_response(district, period, info_type, data))
+        except Exception as e:
+            print(f"Error in format_weather_responses: {str(e)}")
+            messages.append(f"Sorry, I couldn't get the weather information for {district.capitalize()} at the moment. Please try again later.")
+    return messages
+
+def render_weather_response(district, period, info_type, data):
+    """Render the answer from already fetched feeds, keyed as in fetch_plan.FEEDS"""
+    local_data = data.get('local')
+    uv_data = data.get('uv')
+    forecast_data = data.get('forecast')
+    warning_data = data.get('warnings')
+    
+    if period == 'today':
+        if info_type == 'uv':
+            response = f"Current UV index in {district.capitalize()}: {uv_data['result']['max_uv_index']} ({uv_data['result']['intensity']})"
+            recommendations = get_weather_recommendations(uv_data['result'], 'uv')
+            response += "\n\nRecommendations:\n" + "\n".join(f"• {rec}" for rec in recommendations)
+            return response
         
-        # Get any active warnings
-        warning_data = weather_warning('EN')
+        weather = local_data['result']['RegionalWeather']
         
-        if period == 'today':
-            weather = local_data['result']['RegionalWeather']
+        if info_type == 'wind':
+            wind_info = weather['Wind']
+            response = f"Current wind conditions in {district.capitalize()}: {wind_info['WindSpeed']} km/h from the {wind_info['WindDirection']} ({wind_info['WindDirectionCode']})"
+            recommendations = get_weather_recommendations(weather, 'wind')
+            response += "\n\nRecommendations:\n" + "\n".join(f"• {rec}" for rec in recommendations)
+            return response
             
-            if info_type == 'wind':
-                wind_info = weather['Wind']
-                response = f"Current wind conditions in {district.capitalize()}: {wind_info['WindSpeed']} km/h from the {wind_info['WindDirection']} ({wind_info['WindDirectionCode']})"
-                recommendations = get_weather_recommendations(weather, 'wind')
-                response += "\n\nRecommendations:\n" + "\n".join(f"• {rec}" for rec in recommendations)
-                return response
-                
-            elif info_type == 'temperature':
-                temp_info = weather['Temp']
-                response = f"Current temperature in {district.capitalize()} is {temp_info['Value']}°C"
-                recommendations = get_weather_recommendations(weather, 'temperature')
-                response += "\n\nRecommendations:\n" + "\n".join(f"• {rec}" for rec in recommendations)
-                return response
-                
-            elif info_type == 'humidity':
-                rh_info = weather['RH']
-                response = f"Current humidity in {district.capitalize()} is {rh_info['Value']}%"
-                recommendations = get_weather_recommendations(weather, 'humidity')
-                response += "\n\nRecommendations:\n" + "\n".join(f"• {rec}" for rec in recommendations)
-                return response
-                
-            elif info_type == 'uv':
-                response = f"Current UV index in {district.capitalize()}: {uv_data['result']['max_uv_index']} ({uv_data['result']['intensity']})"
-                recommendations = get_weather_recommendations(uv_data['result'], 'uv')
-                response += "\n\nRecommendations:\n" + "\n".join(f"• {rec}" for rec in recommendations)
-                return response
-                
-            else:  # overall
-                response = f"Current weather in {district.capitalize()}:\n"
-                response += f"• Temperature: {weather['Temp']['Value']}°C\n"
-                response += f"• Humidity: {weather['RH']['Value']}%\n"
-                response += f"• Wind: {weather['Wind']['WindSpeed']} km/h from the {weather['Wind']['WindDirection']} ({weather['Wind']['WindDirectionCode']})\n"
-                response += f"• UV Index: {uv_data['result']['max_uv_index']} ({uv_data['result']['intensity']})"
-                
-                # Add any active warnings
-                active_warnings = [w['Name'] for w in warning_data['result'].values() if w['InForce'] == 1]
-                if active_warnings:
-                    response += "\n\nActive Warnings:\n"
-                    response += "\n".join(f"• {w}" for w in active_warnings)
-                
-                # Add recommendations
-                recommendations = get_weather_recommendations(weather, 'overall')
-                response += "\n\nRecommendations:\n" + "\n".join(f"• {rec}" for rec in recommendations)
-                return response
+        elif info_type == 'temperature':
+            temp_info = weather['Temp']
+            response = f"Current temperature in {district.capitalize()} is {temp_info['Value']}°C"
+            recommendations = get_weather_recommendations(weather, 'temperature')
+            response += "\n\nRecommendations:\n" + "\n".join(f"• {rec}" for rec in recommendations)
+            return response
+            
+        elif info_type == 'humidity':
+            rh_info = weather['RH']
+            response = f"Current humidity in {district.capitalize()} is {rh_info['Value']}%"
+            recommendations = get_weather_recommendations(weather, 'humidity')
+            response += "\n\nRecommendations:\n" + "\n".join(f"• {rec}" for rec in recommendations)
+            return response
+            
+        else:  # overall
+            response = f"Current weather in {district.capitalize()}:\n"
+            response += f"• Temperature: {weather['Temp']['Value']}°C\n"
+            response += f"• Humidity: {weather['RH']['Value']}%\n"
+            response += f"• Wind: {weather['Wind']['WindSpeed']} km/h from the {weather['Wind']['WindDirection']} ({weather['Wind']['WindDirectionCode']})\n"
+            response += f"• UV Index: {uv_data['result']['max_uv_index']} ({uv_data['result']['intensity']})"
+            
+            # Add any active warnings
+            active_warnings = [w['Name'] for w in warning_data['result'].values() if w['InForce'] == 1]
+            if active_warnings:
+                response += "\n\nActive Warnings:\n"
+                response += "\n".join(f"• {w}" for w in active_warnings)
+            
+            # Add recommendations
+            recommendations = get_weather_recommendations(weather, 'overall')
+            response += "\n\nRecommendations:\n" + "\n".join(f"• {rec}" for rec in recommendations)
+            return response
+    
+    else:
+        # Format multi-day forecast
+        forecast = forecast_data['result']['forecast_detail']
+        days_to_show = 3 if period == '3day' else (2 if period == '2day' else 1)
         
-        else:
-            # Format multi-day forecast
-            forecast = forecast_data['result']['forecast_detail']
-            days_to_show = 3 if period == '3day' else (2 if period == '2day' else 1)
+        if info_type != 'overall':
+            # For specific info types in multi-day forecast
+            response = f"{days_to_show}-day {info_type} forecast for {district.capitalize()}:\n\n"
             
-            if info_type != 'overall':
-                # For specific info types in multi-day forecast
-                response = f"{days_to_show}-day {info_type} forecast for {district.capitalize()}:\n\n"
+            for i, day in enumerate(forecast[:days_to_show]):
+                date = day['forecast_date']
+                day_name = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday'][day['forecast_day_of_week']]
                 
-                for i, day in enumerate(forecast[:days_to_show]):
-                    date = day['forecast_date']
-                    day_name = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday'][day['forecast_day_of_week']]
-                    
-                    response += f"{day_name} ({date[4:6]}/{date[6:8]}):\n"
-                    if info_type == 'wind':
-                        response += f"• Wind: {day['wind_info']}\n"
-                    elif info_type == 'temperature':
-                        response += f"• Temperature: {day['min_temp']}°C to {day['max_temp']}°C\n"
-                    elif info_type == 'humidity':
-                        response += f"• Humidity: {day['min_rh']}% to {day['max_rh']}%\n"
-                    if i < days_to_show - 1:
-                        response += "\n"
-                
-                return response
-            else:
-                # Overall forecast
-                response = f"{days_to_show}-day forecast for {district.capitalize()}:\n\n"
-                
-                for i, day in enumerate(forecast[:days_to_show]):
-                    date = day['forecast_date']
-                    day_name = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday'][day['forecast_day_of_week']]
-                    
-                    response += f"{day_name} ({date[4:6]}/{date[6:8]}):\n"
-                    response += f"• {day['wx_desc']}\n"
+                response += f"{day_name} ({date[4:6]}/{date[6:8]}):\n"
+                if info_type == 'wind':
+                    response += f"• Wind: {day['wind_info']}\n"
+                elif info_type == 'temperature':
                     response += f"• Temperature: {day['min_temp']}°C to {day['max_temp']}°C\n"
+                elif info_type == 'humidity':
                     response += f"• Humidity: {day['min_rh']}% to {day['max_rh']}%\n"
-                    response += f"• Wind: {day['wind_info']}\n"
-                    if i < days_to_show - 1:
-                        response += "\n"
+                if i < days_to_show - 1:
+                    response += "\n"
+            
+            return response
+        else:
+            # Overall forecast
+            response = f"{days_to_show}-day forecast for {district.capitalize()}:\n\n"
+            
+            for i, day in enumerate(forecast[:days_to_show]):
+                date = day['forecast_date']
+                day_name = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday'][day['forecast_day_of_week']]
                 
-                return response
+                response += f"{day_name} ({date[4:6]}/{date[6:8]}):\n"
+                response += f"• {day['wx_desc']}\n"
+                response += f"• Temperature: {day['min_temp']}°C to {day['max_temp']}°C\n"
+                response += f"• Humidity: {day['min_rh']}% to {day['max_rh']}%\n"
+                response += f"• Wind: {day['wind_info']}\n"
+                if i < days_to_show - 1:
+                    response += "\n"
             
-    except Exception as e:
-        print(f"Error in format_weather_response: {str(e)}")  # Add logging
-        return f"Sorry, I couldn't get the weather information for {district.capitalize()} at the moment. Please try again later."
+            return response
+        
 
-@app.route('/api/chat', methods=['POST'])
-def chat():
-    data = request.get_json()
-    user_input = data.get('message', '').lower()
+def plan_chat_reply(user_input, session):
+    """Work out the reply to a chat message, short of fetching any weather
+
+    Returns:
+        tuple: The response, and (district, coords, period, info_type) of
+            the weather answer its message still needs, or None
+    """
+    user_input = user_input.lower()
     
     # Initialize response
     response = {
@@ -261,63 +293,151 @@ def chat():
         'needs_forecast_period': False,
         'needs_info_type': False,
         'selected_location': None,
-        'selected_period': None
+        'selected_period': None,
+        'session_id': session.id
     }
     
+    intent = get_intent_parser().parse(user_input)
+
     # Handle greeting
-    if is_greeting(user_input):
+    if intent.greeting:
         response['message'] = "Hello! I'm your Hong Kong Weather Assistant. How can I help you today?"
-        return jsonify(response)
+        return response, None
     
     # Extract district and period from input
-    district = extract_district(user_input)
-    period = get_forecast_period(user_input)
+    district = intent.district
+    period = intent.period
+    info_type = intent.info_type
+    info_requested = intent.info_requested
+    weather_query = intent.weather_query
+    
+    # A follow-up such as "and tomorrow?" names no district: take it, and
+    # every slot the message does not name, from the previous turn
+    remembered = session.slots
+    if not district and remembered['district'] and (weather_query or period or info_requested):
+        district = remembered['district']
+        period = period or remembered['period']
+        if not info_requested and remembered['info_type']:
+            info_type, info_requested = remembered['info_type'], True
+        weather_query = True
     
     # Check if this is just a location selection without any weather terms
-    if district and not is_weather_query(user_input):
+    if district and not weather_query:
         response['message'] = f"You've selected {district.capitalize()}. Would you like to know the weather for today, tomorrow, 2-day forecast, or 3-day forecast?"
         response['needs_forecast_period'] = True
         response['selected_location'] = district
-        return jsonify(response)
+        session.remember(district)
+        return response, None
     
     # Handle weather query
-    if is_weather_query(user_input):
+    if weather_query:
         # If no district is mentioned, ask for location
         if not district:
             response['message'] = 'Which district in Hong Kong would you like to know the weather for?'
             response['needs_location'] = True
-            return jsonify(response)
+            return response, None
         
-        # Get coordinates for the district
-        coords = DISTRICT_COORDINATES[district]
+        # Get coordinates and grid for the district
+        coords = get_gazetteer().coords(district)
         
         # If we have a location but no time period specified, ask for it
         if not period:
             response['message'] = f"For {district.capitalize()}, would you like to know the weather for today, tomorrow, 2-day forecast, or 3-day forecast?"
             response['needs_forecast_period'] = True
             response['selected_location'] = district
-            return jsonify(response)
+            session.remember(district)
+            return response, None
         
         # If we have location and time but no specific info type, ask for it
-        info_type = get_weather_info_type(user_input)
-        if info_type == 'overall' and not any(keyword in user_input for keyword in ['overall', 'general', 'temperature', 'humidity', 'wind', 'uv']):
+        if not info_requested:
             response['message'] = f"What specific information would you like to know? (overall weather, temperature, humidity, wind, or UV index)"
             response['needs_info_type'] = True
             response['selected_location'] = district
             response['selected_period'] = period
-            return jsonify(response)
+            session.remember(district, period)
+            return response, None
         
-        # If we have all information, format the response
-        response['message'] = format_weather_response(district, coords, period, info_type)
+        # If we have all information, the weather answer is formatted next
+        session.remember(district, period, info_type)
+        return response, (district, coords, period, info_type)
     else:
         response['message'] = "I can help you with weather information for different districts in Hong Kong. What would you like to know?"
     
+    return response, None
+
+@api.route('/api/chat', methods=['POST'])
+def chat():
+    data = request.get_json()
+    session = SESSIONS.get(data.get('session_id'))
+    response, query = plan_chat_reply(data.get('message', ''), session)
+    if query is not None:
+        response['message'] = format_weather_response(*query)
+    SESSIONS.save(session)
     return jsonify(response)
 
-@app.route('/api/health', methods=['GET'])
+@api.route('/api/chat/batch', methods=['POST'])
+def chat_batch():
+    """Answer several chat messages at once, fetching each shared feed once
+
+    The body is {"messages": [...]}, each item a message string or an object
+    with "message" and optionally "session_id"; the reply is {"responses":
+    [...]} in the same order, each as /api/chat would return it.
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('messages')
+    if not isinstance(items, list) or len(items) > MAX_BATCH:
+        return jsonify({'status': 'error',
+                        'message': f"'messages' must be a list of at most {MAX_BATCH} messages"}), 400
+    replies = []
+    sessions = {}
+    for item in items:
+        if not isinstance(item, dict):
+            item = {'message': item}
+        # Items of one conversation are planned in order against one
+        # session, as if each had been sent to /api/chat after the last
+        session = SESSIONS.get(item.get('session_id'))
+        session = sessions.setdefault(session.id, session)
+        response, query = plan_chat_reply(str(item.get('message') or ''), session)
+        replies.append((response, query))
+    queries = [query for _, query in replies if query is not None]
+    messages = iter(format_weather_responses(queries))
+    for response, query in replies:
+        if query is not None:
+            response['message'] = next(messages)
+    for session in sessions.values():
+        SESSIONS.save(session)
+    return jsonify({'responses': [response for response, _ in replies]})
+
+@api.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({"status": "healthy"})
 
+@api.route('/api/cache', methods=['GET'])
+def cache_stats():
+    return jsonify(CACHE.stats())
+
+def create_app():
+    """Build the Flask app that serves the chat API"""
+    app = Flask(__name__)
+    CORS(app)  # Enable CORS for all routes
+    app.register_blueprint(api)
+    return app
+
+# The app the development server and tests use
+app = create_app()
+
+def start_refresh_scheduler():
+    """Keep the feeds the chat answers read warm in the response cache"""
+    if os.environ.get('HKO_REFRESH', '1') == '0':
+        return None
+    fraction = float(os.environ.get('HKO_REFRESH_FRACTION', REFRESH_FRACTION))
+    jitter = float(os.environ.get('HKO_REFRESH_JITTER', JITTER))
+    return RefreshScheduler(hot_urls(DISTRICT_COORDINATES), fraction=fraction, jitter=jitter).start()
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
+    # The debug reloader also runs this block in its watcher process; only
+    # the child that serves requests should refresh feeds
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_refresh_scheduler()
     app.run(host='0.0.0.0', port=port, debug=True) 
\ No newline at end of file
@@ -0,0 +1,80 @@
+"""A script to compare the memory and load time of the JSON and compact grid assets
+
+Each way of loading runs in a fresh interpreter, which reports how much its
+resident set grew. Anonymous memory (RssAnon) is private to a worker; pages of
+a memory-mapped file (RssFile) come from the page cache, and every worker on
+the host shares them. Linux only, as it reads /proc/self/status.
+
+    python bench_asset_memory.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# How spatial_index loaded the grid before the compact format
+JSON_GRID = """
+import json, sys
+from compact_assets import ASSETS, GridPoint, NowcastPoint
+with open(ASSETS / 'grid_location.json', encoding='utf-8') as f:
+    grid = tuple(GridPoint(float(i['lat']), float(i['lng']), sys.intern(i['grid']), sys.intern(i['name']))
+                 for i in json.load(f))
+with open(ASSETS / 'rainfall_nowcast_mapping.json', encoding='utf-8') as f:
+    rainfall = tuple(NowcastPoint(float(i['lat']), float(i['lng'])) for i in json.load(f))
+"""
+
+COMPACT_GRID = """
+from compact_assets import ASSETS, PointTable
+grid = PointTable(ASSETS / 'grid_location.bin')
+rainfall = PointTable(ASSETS / 'rainfall_nowcast_mapping.bin')
+"""
+
+INDEX = """
+from spatial_index import NearestIndex, VectorizedIndex
+NearestIndex(grid).nearest(22.3, 114.1)
+VectorizedIndex(rainfall).nearest(22.3, 114.1)
+"""
+
+# Imports everything first, so only the assets count towards the growth
+MEASURE = """
+import gc, json, time
+import numpy, spatial_index
+
+def status():
+    with open('/proc/self/status') as f:
+        fields = dict(line.split(':', 1) for line in f)
+    return {{key: int(fields[key].split()[0]) for key in ('VmRSS', 'RssAnon', 'RssFile')}}
+
+gc.collect()
+before = status()
+start = time.perf_counter()
+{}
+elapsed = time.perf_counter() - start
+gc.collect()
+after = status()
+print(json.dumps({{'time': elapsed, **{{key: after[key] - before[key] for key in after}}}}))
+"""
+
+
+def measure(code):
+    done = subprocess.run([sys.executable, '-c', MEASURE.format(code)], cwd=HERE,
+                          capture_output=True, text=True, check=True)
+    return json.loads(done.stdout)
+
+
+if __name__ == "__main__":
+    if not os.path.exists('/proc/self/status'):
+        sys.exit('bench_asset_memory.py reads /proc/self/status and needs Linux')
+    for name, code in [('JSON assets', JSON_GRID), ('Compact assets', COMPACT_GRID),
+                       ('JSON assets + indexes', JSON_GRID + INDEX),
+                       ('Compact assets + indexes', COMPACT_GRID + INDEX)]:
+        result = measure(code)
+        print(name)
+        print(f"  Load time:       {result['time'] * 1000:8.1f} ms")
+        print(f"  RSS growth:      {result['VmRSS'] / 1024:8.1f} MB")
+        print(f"    private:       {result['RssAnon'] / 1024:8.1f} MB")
+        print(f"    shared (file): {result['RssFile'] / 1024:8.1f} MB")
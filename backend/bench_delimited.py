@@ -0,0 +1,47 @@
+"""A script to compare the delimited feed schemas with splitting the decoded text"""
+
+import re
+import time
+
+from delimited import ASTRO_TIDE, MAJOR_CITY, RAINFALL_NOWCAST
+from test_delimited import ASTRO_TIDE_PAYLOAD, CITIES, RAINFALL
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def split_fields(payload):
+    """How rainfall_nowcast, astro and tide read their feeds before"""
+    return re.split('[@#]', payload.decode('utf-8'))
+
+
+def split_cities(payload):
+    """How major_city_forecast.parse read a region before"""
+    response = []
+    for city in payload.decode('utf-8').split('@'):
+        temp = city.split('#')
+        if len(temp) < len(MAJOR_CITY.fields):
+            raise IndexError('expected {} fields, got {}'.format(len(MAJOR_CITY.fields), len(temp)))
+        response.append(dict(zip(MAJOR_CITY.fields, temp)))
+    return response
+
+
+if __name__ == "__main__":
+    # A region feed lists 20 to 60 cities
+    region = b'@'.join([CITIES] * 25)
+    feeds = [
+        ('rainfall nowcast', RAINFALL, split_fields, lambda payload: RAINFALL_NOWCAST.parse(payload)),
+        ('astro and tide', ASTRO_TIDE_PAYLOAD, split_fields, lambda payload: ASTRO_TIDE.parse(payload)),
+        ('major cities, 50', region, split_cities,
+         MAJOR_CITY.dicts),
+    ]
+    for name, payload, before, after in feeds:
+        split = timed(lambda: before(payload), 20000)
+        schema = timed(lambda: after(payload), 20000)
+        print(f"{name} ({len(payload)} bytes)")
+        print(f"  split decoded text: {split * 1e6:8.2f} us")
+        print(f"  schema:             {schema * 1e6:8.2f} us ({split / schema:.2f}x)")
@@ -0,0 +1,38 @@
+"""A script to measure distance_calculation per call and distance_matrix in bulk"""
+
+import random
+import time
+
+from distance_calculation import distance_calculation, distance_matrix
+from test_distance_calculation import hong_kong
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    pairs = hong_kong(1000, 0)
+    haversine = timed(lambda: [distance_calculation(*pair) for pair in pairs], 20) / len(pairs)
+    print("Per call")
+    print(f"  distance_calculation: {haversine * 1e6:8.2f} us")
+    try:
+        from LatLon23 import LatLon
+    except ImportError:
+        print("  LatLon23:             not installed")
+    else:
+        geodesic = timed(lambda: [LatLon(a, b).distance(LatLon(c, d)) for a, b, c, d in pairs], 2) / len(pairs)
+        print(f"  LatLon23:             {geodesic * 1e6:8.2f} us ({geodesic / haversine:.0f}x slower)")
+
+    # A lookup against every grid point, as the full scan in local_weather did
+    points = [pair[:2] for pair in pairs]
+    targets = [pair[2:] for pair in hong_kong(11829, 1)]
+    bulk = timed(lambda: distance_matrix(points[:100], targets), 5) / (100 * len(targets))
+    loop = timed(lambda: [distance_calculation(*points[0], *target) for target in targets], 5) / len(targets)
+    print(f"Bulk, 100 x {len(targets)} pairs")
+    print(f"  distance_matrix:      {bulk * 1e9:8.2f} ns per pair ({1 / bulk / 1e6:.0f} M pairs/s)")
+    print(f"  distance_calculation: {loop * 1e9:8.2f} ns per pair ({loop / bulk:.0f}x slower)")
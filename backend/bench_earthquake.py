@@ -0,0 +1,38 @@
+"""A script to compare hko.earthquake's parser with xmltodict and a JSON round trip"""
+
+import importlib
+import json
+import time
+
+from test_earthquake import feed
+
+
+earthquake = importlib.import_module('hko.earthquake')
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == "__main__":
+    try:
+        import xmltodict
+    except ImportError:
+        xmltodict = None
+    for count in (5, 30, 200):
+        content = feed(count)
+        print(f"{count} events ({len(content)} bytes)")
+        parse = timed(lambda: earthquake.parse(content), 500)
+        events = timed(lambda: list(earthquake.events(content)), 500)
+        if xmltodict is None:
+            print("  xmltodict + JSON:  not installed")
+            before = None
+        else:
+            before = timed(lambda: json.loads(json.dumps(xmltodict.parse(content.decode('utf-8')))), 500)
+            print(f"  xmltodict + JSON: {before * 1e3:8.3f} ms")
+        for name, elapsed in (('parse', parse), ('events', events)):
+            speedup = f" ({before / elapsed:.1f}x faster)" if before else ''
+            print(f"  {name + ':':17} {elapsed * 1e3:8.3f} ms{speedup}")
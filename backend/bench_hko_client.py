@@ -0,0 +1,35 @@
+"""A script to measure the latency win of the pooled keep-alive HKO client"""
+
+import time
+
+import requests
+
+from fake_hko import FakeHKO
+from hko_client import HKOClient
+
+
+def bench(runs=50, connect_latency=0.02):
+    with FakeHKO({'locspc/android_data/fnd_e.xml': b'{}' * 2000}, connect_latency=connect_latency) as server:
+        url = server.url + 'locspc/android_data/fnd_e.xml'
+
+        start = time.perf_counter()
+        for _ in range(runs):
+            requests.get(url)
+        bare_time = (time.perf_counter() - start) / runs
+        bare_connections = server.connections
+
+        client = HKOClient()
+        start = time.perf_counter()
+        for _ in range(runs):
+            client.get(url)
+        pooled_time = (time.perf_counter() - start) / runs
+        client.close()
+        pooled_connections = server.connections - bare_connections
+
+    print(f"Simulated handshake:  {connect_latency * 1e3:7.1f} ms per connection")
+    print(f"requests.get:         {bare_time * 1e3:7.2f} ms per fetch, {bare_connections} connections")
+    print(f"HKOClient:            {pooled_time * 1e3:7.2f} ms per fetch, {pooled_connections} connections")
+
+
+if __name__ == "__main__":
+    bench()
@@ -0,0 +1,53 @@
+"""A script to compare the one-pass intent parser with the keyword helpers it replaced"""
+
+import random
+import time
+
+import app
+from intent_parser import IntentParser
+from test_intent_parser import CORPUS, legacy
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def bench(name, parse, oracle, corpus):
+    assert [tuple(parse(message)) for message in corpus] == [oracle(message) for message in corpus]
+    legacy_time = timed(lambda: [oracle(message) for message in corpus], 200)
+    parser_time = timed(lambda: [parse(message) for message in corpus], 200)
+    runs = len(corpus)
+    print(name)
+    print(f"  Keyword helpers: {legacy_time / runs * 1e6:8.2f} us per message")
+    print(f"  Intent parser:   {parser_time / runs * 1e6:8.2f} us per message")
+    print(f"  Speedup:         {legacy_time / parser_time:8.1f}x")
+
+
+def with_aliases(count):
+    """Register count extra districts and the legacy scan over all of them"""
+    districts = {name: [] for name in app.DISTRICT_COORDINATES}
+    for i in range(count):
+        districts[f'district {i}'] = [f'alias {i} a', f'alias {i} b']
+    parser = IntentParser(districts)
+    names = {name: [name] + aliases for name, aliases in districts.items()}
+
+    def oracle(text):
+        text = text.lower()
+        result = list(legacy(text))
+        result[1] = next((name for name, aliases in names.items() if any(a in text for a in aliases)), None)
+        return tuple(result)
+
+    return parser.parse, oracle
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    corpus = CORPUS * 20
+    random.shuffle(corpus)
+    bench(f'{len(app.DISTRICT_COORDINATES)} districts', app.get_intent_parser().parse, legacy, corpus)
+    for count in (100, 500):
+        parse, oracle = with_aliases(count)
+        bench(f'{count} more districts, 3 aliases each', parse, oracle, corpus)
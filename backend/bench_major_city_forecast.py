@@ -0,0 +1,38 @@
+"""A script to compare fetching the six major city regions one by one and in parallel"""
+
+import importlib
+import time
+
+import hko
+import hko_cache
+from fake_hko import FakeHKO
+from test_major_city_forecast import routes
+
+
+major_city_forecast = importlib.import_module('hko.major_city_forecast')
+
+
+def bench(runs=5, latency=0.05):
+    with FakeHKO(routes('EN'), latency=latency) as server:
+        major_city_forecast.BASE_URL = server.url
+
+        start = time.perf_counter()
+        for _ in range(runs):
+            hko_cache.CACHE.clear()
+            for _, url_uc, url_en in major_city_forecast.REGIONS:
+                major_city_forecast.region(url_uc, url_en, 'EN')
+        sequential_time = (time.perf_counter() - start) / runs
+
+        start = time.perf_counter()
+        for _ in range(runs):
+            hko_cache.CACHE.clear()
+            hko.major_city_forecast('EN')
+        parallel_time = (time.perf_counter() - start) / runs
+
+    print(f"Round trip:   {latency * 1e3:7.1f} ms")
+    print(f"Sequential:   {sequential_time * 1e3:7.1f} ms")
+    print(f"Parallel:     {parallel_time * 1e3:7.1f} ms")
+
+
+if __name__ == "__main__":
+    bench()
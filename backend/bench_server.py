@@ -0,0 +1,68 @@
+"""A script to load-test the production server and report requests per second
+by number of gunicorn workers
+
+HKO is replaced by a local FakeHKO serving sample feeds, so the numbers
+measure the backend rather than the network.
+"""
+
+import multiprocessing
+import threading
+import time
+
+import requests
+
+from fake_hko import FakeHKO
+from gunicorn_server import serve
+from test_district_snapshot import routes
+
+
+MESSAGES = [
+    'hello',
+    "What's the weather like in Tai Po?",
+    'Show me the today weather forecast for Central',
+    'Show me the temperature for Wan Chai today forecast',
+    'Show me the overall for Tuen Mun today forecast',
+    'Show me the wind for Yuen Long 3-day forecast',
+    'Show me the uv index for Shatin today forecast',
+    'Show me the humidity for Causeway Bay tomorrow forecast',
+]
+
+
+def load(url, clients, duration):
+    """Send chat messages from several clients for duration seconds"""
+    counts = [0] * clients
+    deadline = time.perf_counter() + duration
+
+    def client(n):
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            message = MESSAGES[(n + counts[n]) % len(MESSAGES)]
+            session.post(url + 'chat', json={'message': message}).raise_for_status()
+            counts[n] += 1
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - start)
+
+
+def bench(worker_counts, clients=32, duration=5):
+    with FakeHKO(routes()) as upstream:
+        for workers in worker_counts:
+            server, url = serve(workers, upstream.url)
+            try:
+                load(url, clients, 1)  # warm every worker's cache
+                rps = load(url, clients, duration)
+            finally:
+                server.terminate()
+                server.wait()
+            print(f"{workers:3d} workers: {rps:8.0f} requests/s")
+
+
+if __name__ == "__main__":
+    cores = multiprocessing.cpu_count()
+    print(f"{cores} cores, 32 concurrent clients")
+    bench(sorted({1, 2, cores, cores * 2 + 1}))
@@ -0,0 +1,38 @@
+"""A script to compare the spatial indexes against the full scans they replaced"""
+
+import random
+import time
+
+from spatial_index import GRID, GRID_INDEX, RAINFALL_MAPPING, RAINFALL_INDEX, RASTER
+from test_spatial_index import scan
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def bench(name, points, index, locations, raster):
+    expected, scan_time = timed(lambda: [scan(points, lat, lng) for lat, lng in locations], 1)
+    found, index_time = timed(lambda: [index.nearest(lat, lng) for lat, lng in locations], 20)
+    assert found == expected
+    runs = len(locations)
+    print(f"{name} ({len(points)} points)")
+    print(f"  Full scan:   {scan_time / runs * 1e3:9.3f} ms per lookup")
+    print(f"  Index:       {index_time / runs * 1e3:9.3f} ms per lookup")
+    print(f"  Speedup:     {scan_time / index_time:9.0f}x")
+    if hasattr(index, 'nearest_many'):
+        batch, batch_time = timed(lambda: index.nearest_many(locations), 20)
+        assert batch == expected
+        print(f"  Batch:       {batch_time / runs * 1e3:9.3f} ms per lookup")
+    _, raster_time = timed(lambda: [raster(lat, lng) for lat, lng in locations], 200)
+    print(f"  Raster:      {raster_time / runs * 1e3:9.3f} ms per lookup")
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    locations = [(random.uniform(22.15, 22.55), random.uniform(113.85, 114.45)) for _ in range(20)]
+    bench('local_weather grid', GRID, GRID_INDEX, locations, RASTER.grid)
+    bench('rainfall_nowcast mapping', RAINFALL_MAPPING, RAINFALL_INDEX, locations, RASTER.nowcast_point)
@@ -0,0 +1,62 @@
+"""A script to report how long a cold start of the backend takes
+
+Each entry point is imported in a fresh interpreter under `python -X importtime`.
+The script reports the median wall time, the slowest imports, and what the
+first chat message costs when the assets are loaded lazily.
+
+    python bench_startup.py [repeat]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# What each process imports or runs before it can answer
+ENTRY_POINTS = [
+    ('import weather_data', 'import weather_data'),
+    ('import app', 'import app'),
+    ('import app + first greeting', "import app; app.get_intent_parser().parse('hello')"),
+    ('import wsgi (preloaded)', 'import wsgi'),
+]
+
+
+def run(code):
+    """Run code in a fresh interpreter
+
+    Returns:
+        tuple: The wall time in seconds, and the (self, cumulative, module)
+            rows of its import time report, in microseconds
+    """
+    timer = 'import time; start = time.perf_counter(); {}; print(time.perf_counter() - start)'
+    env = dict(os.environ, HKO_REFRESH='0')
+    done = subprocess.run([sys.executable, '-X', 'importtime', '-c', timer.format(code)],
+                          cwd=HERE, env=env, capture_output=True, text=True, check=True)
+    rows = []
+    for line in done.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, module = line[len('import time:'):].split('|')
+        rows.append((int(own), int(cumulative), module.strip()))
+    return float(done.stdout.split()[-1]), rows
+
+
+def report(name, code, repeat):
+    times = []
+    for _ in range(repeat):
+        elapsed, rows = run(code)
+        times.append(elapsed)
+    print(f"{name}")
+    print(f"  Wall time: {statistics.median(times) * 1000:8.1f} ms (median of {repeat})")
+    print("  Slowest imports (cumulative):")
+    for own, cumulative, module in sorted(rows, reverse=True, key=lambda row: row[1])[:5]:
+        print(f"    {cumulative / 1000:8.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    for name, code in ENTRY_POINTS:
+        report(name, code, repeat)
@@ -0,0 +1,159 @@
+"""A module to store the grid and rainfall nowcast points in a compact binary
+format that is memory-mapped instead of parsed
+
+    python compact_assets.py
+
+rebuilds assets/grid_location.bin and assets/rainfall_nowcast_mapping.bin
+from the JSON files next to them; run it whenever those change.
+
+A file is a 16 byte header followed by little-endian arrays:
+
+    header     magic b'HKOP', version (uint16), decimals (uint16),
+               point count (uint32), name count (uint32)
+    lat        float32 * count
+    lng        float32 * count
+
+and, when the name count is not 0, for points that carry a grid and a name:
+
+    grid       uint16 * count, the grid id as a number
+    name       uint16 * count, an index into the name table
+    offsets    uint32 * (names + 1), where each name starts in the text
+    text       the UTF-8 names, one after the other
+"""
+
+import json
+import mmap
+import struct
+import sys
+from array import array
+from collections import namedtuple
+from collections.abc import Sequence
+from pathlib import Path
+
+
+MAGIC = b'HKOP'
+VERSION = 1
+HEADER = struct.Struct('<4sHHII')
+
+# Lookup data is shared by every request thread, so the points are immutable
+# records and the tables never change after they are loaded.
+GridPoint = namedtuple('GridPoint', ['lat', 'lng', 'grid', 'name'])
+NowcastPoint = namedtuple('NowcastPoint', ['lat', 'lng'])
+
+# The assets sit next to this module; it is not part of a package, which
+# importlib.resources requires, so they are found from its own path
+ASSETS = Path(__file__).resolve().parent / 'assets'
+# The JSON assets and the decimal places their coordinates are given to
+SOURCES = {'grid_location': 4, 'rainfall_nowcast_mapping': 3}
+
+
+def pack(points, decimals):
+    """Encode points in the compact format
+
+    Args:
+        points (list): Dicts with 'lat' and 'lng', and 'grid' (four digits)
+            and 'name' if any point has them
+        decimals (int): The decimal places of the coordinates, which float32
+            must reproduce exactly once rounded to them
+
+    Returns:
+        bytes: The encoded file
+
+    Raises:
+        ValueError: If a coordinate or grid id does not survive the encoding
+    """
+    lat = array('f', (float(i['lat']) for i in points))
+    lng = array('f', (float(i['lng']) for i in points))
+    for column, key in ((lat, 'lat'), (lng, 'lng')):
+        for value, point in zip(column, points):
+            if round(value, decimals) != float(point[key]):
+                raise ValueError('{} {} needs more than {} decimals'.format(key, point[key], decimals))
+    names = {}
+    if points and 'name' in points[0]:
+        for point in points:
+            names.setdefault(point['name'], len(names))
+            if '{:04d}'.format(int(point['grid'])) != point['grid']:
+                raise ValueError('grid id {!r} is not four digits'.format(point['grid']))
+    columns = [lat, lng]
+    if names:
+        text = [name.encode('utf-8') for name in names]
+        offsets = array('I', [0])
+        for name in text:
+            offsets.append(offsets[-1] + len(name))
+        columns += [array('H', (int(i['grid']) for i in points)),
+                    array('H', (names[i['name']] for i in points)),
+                    offsets]
+    if sys.byteorder == 'big':
+        for column in columns:
+            column.byteswap()
+    body = b''.join(column.tobytes() for column in columns)
+    if names:
+        body += b''.join(text)
+    return HEADER.pack(MAGIC, VERSION, decimals, len(points), len(names)) + body
+
+
+def read_column(view, offset, typecode, count):
+    """Read count items of typecode at offset, swapping bytes on big-endian hosts"""
+    size = array(typecode).itemsize * count
+    column = view[offset:offset + size].cast(typecode)
+    if sys.byteorder == 'big':
+        column = array(typecode, column)
+        column.byteswap()
+    return column, offset + size
+
+
+class PointTable(Sequence):
+    """A read-only sequence of points over a memory-mapped compact file
+
+    Nothing is parsed when the file is opened: the columns are views of the
+    mapped pages, which every process on the host shares through the page
+    cache, and a GridPoint or NowcastPoint is built only when it is read.
+
+    Args:
+        path (str): The file, as written by pack
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.decimals, count, names = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('{} is not a version {} point table'.format(path, VERSION))
+        view = memoryview(self._map)
+        offset = HEADER.size
+        self._lat, offset = read_column(view, offset, 'f', count)
+        self._lng, offset = read_column(view, offset, 'f', count)
+        self._names = None
+        if names:
+            self._grid, offset = read_column(view, offset, 'H', count)
+            self._name, offset = read_column(view, offset, 'H', count)
+            starts, offset = read_column(view, offset, 'I', names + 1)
+            self._names = tuple(sys.intern(str(view[offset + starts[i]:offset + starts[i + 1]], 'utf-8'))
+                                for i in range(names))
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self[i] for i in range(*index.indices(self._count)))
+        lat = round(self._lat[index], self.decimals)
+        lng = round(self._lng[index], self.decimals)
+        if self._names is None:
+            return NowcastPoint(lat, lng)
+        return GridPoint(lat, lng, sys.intern('{:04d}'.format(self._grid[index])), self._names[self._name[index]])
+
+
+def build(name, decimals):
+    """Write assets/<name>.bin from assets/<name>.json"""
+    with open(ASSETS / (name + '.json'), encoding='utf-8') as f:
+        points = json.load(f)
+    with open(ASSETS / (name + '.bin'), 'wb') as f:
+        f.write(pack(points, decimals))
+
+
+if __name__ == "__main__":
+    for name, decimals in SOURCES.items():
+        build(name, decimals)
+        print(f"{name}.json -> {name}.bin ({(ASSETS / (name + '.bin')).stat().st_size} bytes)")
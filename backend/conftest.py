@@ -0,0 +1,73 @@
+import pytest
+
+import app
+import fetch_plan
+import hko_cache
+from district_snapshot import DistrictSnapshots
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResponse(object):
+    def __init__(self, url, ok=True):
+        self.url = url
+        self.ok = ok
+        self.content = url.encode()
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    """Answer every HKO request with a FakeResponse and record the URLs"""
+    urls = []
+
+    def get(url):
+        urls.append(url)
+        return FakeResponse(url, ok='broken' not in url)
+
+    monkeypatch.setattr(hko_cache.hko_client, 'get', get)
+    return urls
+
+
+SAMPLE_FEEDS = {
+    'local': {'status': 1, 'place': 'Central', 'result': {'RegionalWeather': {
+        'Temp': {'Value': '25'},
+        'RH': {'Value': '70'},
+        'Wind': {'WindSpeed': '12', 'WindDirection': 'East', 'WindDirectionCode': 'E'},
+    }}},
+    'uv': {'status': 1, 'result': {'date': '18 Oct', 'max_uv_index': '5', 'intensity': 'moderate'}},
+    'forecast': {'status': 1, 'result': {'forecast_detail': [
+        {'forecast_date': '20261019', 'forecast_day_of_week': 1, 'wx_desc': 'Fine.',
+         'min_temp': 20, 'max_temp': 27, 'min_rh': 60, 'max_rh': 85, 'wind_info': 'East force 3.'},
+        {'forecast_date': '20261020', 'forecast_day_of_week': 2, 'wx_desc': 'Fine.',
+         'min_temp': 21, 'max_temp': 28, 'min_rh': 55, 'max_rh': 80, 'wind_info': 'East force 3.'},
+        {'forecast_date': '20261021', 'forecast_day_of_week': 3, 'wx_desc': 'Showers.',
+         'min_temp': 21, 'max_temp': 26, 'min_rh': 70, 'max_rh': 95, 'wind_info': 'East force 4.'},
+    ]}},
+    'warnings': {'status': 1, 'result': {
+        'WTS': {'Name': 'Thunderstorm Warning', 'InForce': 1},
+        'WFIRE': {'Name': 'Fire Danger Warning', 'InForce': 0},
+    }},
+}
+
+
+@pytest.fixture
+def feeds(monkeypatch):
+    """Replace every upstream feed with SAMPLE_FEEDS and record the calls"""
+    monkeypatch.setattr(app, 'SNAPSHOTS', DistrictSnapshots({}))
+    calls = []
+    for name in fetch_plan.FEEDS:
+        def fetch(coords, name=name):
+            calls.append(name)
+            return SAMPLE_FEEDS[name]
+
+        async def fetch_async(coords, fetch=fetch):
+            return fetch(coords)
+        monkeypatch.setitem(fetch_plan.FEEDS, name, fetch)
+        monkeypatch.setitem(fetch_plan.ASYNC_FEEDS, name, fetch_async)
+    return calls
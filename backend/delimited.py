@@ -0,0 +1,141 @@
+"""A module to parse the '@' and '#' delimited feeds of Hong Kong Observatory
+
+Rainfall nowcasts, astronomical and tide data and the major city forecasts
+are plain text fields separated by '@' and '#'. A Schema declares the fields
+of a feed's records and reads them from the body of a response:
+
+    record = ASTRO_TIDE.parse(response.content)
+    cities = MAJOR_CITY.dicts(response.content)
+
+hko_cache keeps every body whole in memory, so each is decoded once and cut
+with bytes.replace and str.split, which do the work in C.
+"""
+
+from collections import namedtuple
+
+
+RECORD_SEPARATOR = '@'
+FIELD_SEPARATOR = '#'
+_RECORD_BYTE = RECORD_SEPARATOR.encode()
+_FIELD_BYTE = FIELD_SEPARATOR.encode()
+
+
+def _text(content):
+    """Decode a body as UTF-8, replacing invalid bytes; text is returned as is"""
+    return content.decode('utf-8', 'replace') if isinstance(content, bytes) else content
+
+
+def _fields(content):
+    """Return the text of a body with every field separator made a record one
+
+    Both separators are ASCII, so they never occur inside a multibyte UTF-8
+    sequence and can be replaced before the body is decoded.
+    """
+    if isinstance(content, bytes):
+        return content.replace(_FIELD_BYTE, _RECORD_BYTE).decode('utf-8', 'replace')
+    return content.replace(FIELD_SEPARATOR, RECORD_SEPARATOR)
+
+
+class Schema(object):
+    """The fields of one record of a delimited feed, in order
+
+    Args:
+        name (str): The name of the record type
+        fields (list): The name of each field
+
+    Attributes:
+        record (type): The namedtuple type of the records
+    """
+
+    def __init__(self, name, fields):
+        self.record = namedtuple(name, fields)
+        self.fields = list(fields)
+
+    def _check(self, values):
+        if len(values) < len(self.fields):
+            raise IndexError('{} expects {} fields, got {}'.format(
+                self.record.__name__, len(self.fields), len(values)))
+
+    def parse(self, content):
+        """Read one record from the start of a feed whose fields are
+        separated by either delimiter
+
+        Args:
+            content (bytes): The body, or its text
+
+        Raises:
+            IndexError: If the feed ends before the last field; anything
+                after it is left unsplit
+        """
+        size = len(self.fields)
+        values = _fields(content).split(RECORD_SEPARATOR, size)
+        if len(values) != size:
+            self._check(values)
+            values = values[:size]
+        return self.record._make(values)
+
+    def records(self, content):
+        """Read every record of a feed; records are separated by '@' and
+        their fields by '#'
+
+        Args:
+            content (bytes): The body, or its text
+
+        Yields:
+            record: The records; fields after the last one of the schema
+                are skipped
+
+        Raises:
+            IndexError: If a record has fewer fields than the schema
+        """
+        make = self.record._make
+        size = len(self.fields)
+        for record in _text(content).split(RECORD_SEPARATOR):
+            values = record.split(FIELD_SEPARATOR)
+            if len(values) != size:
+                self._check(values)
+                values = values[:size]
+            yield make(values)
+
+    def dicts(self, content):
+        """Read every record of a feed as a dict of field name to value, as
+        the feeds' results are
+
+        Args:
+            content (bytes): The body, or its text
+
+        Returns:
+            list: One dict per record; fields after the last one of the
+                schema are skipped
+
+        Raises:
+            IndexError: If a record has fewer fields than the schema
+        """
+        fields = self.fields
+        size = len(fields)
+        result = []
+        for record in _text(content).split(RECORD_SEPARATOR):
+            values = record.split(FIELD_SEPARATOR)
+            if len(values) != size:
+                self._check(values)
+            result.append(dict(zip(fields, values)))
+        return result
+
+
+# The fields of a rainfall nowcast: the start of each half hour and the
+# rainfall expected in it, then descriptions in three languages
+RAINFALL_NOWCAST = Schema('RainfallNowcast', [
+    'from_0', 'value_0', 'from_30', 'value_30', 'from_60', 'value_60', 'from_90', 'value_90', 'to_120',
+    'description_en', 'description_tc', 'description_sc',
+])
+
+# The fields of astro_tide.xml, shared by hko.astro and hko.tide
+ASTRO_TIDE = Schema('AstroTide', [
+    'sunrise', 'sunset', 'moonrise', 'moonset',
+    'low_tide_1_value', 'low_tide_1_time', 'high_tide_1_value', 'high_tide_1_time',
+    'low_tide_2_value', 'low_tide_2_time', 'high_tide_2_value', 'high_tide_2_time',
+    'date',
+])
+
+# One city of a major city forecast feed; cities are separated by '@'
+MAJOR_CITY = Schema('City', ['place', 'mintemp', 'maxtemp', 'status', 'photo'])
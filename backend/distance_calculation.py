@@ -1,10 +1,53 @@
 """A module to calculate distance."""
 
-from LatLon23 import LatLon
+import math
+
+
+# The mean radius of the WGS84 ellipsoid in km. Over Hong Kong, great circle
+# distances on this sphere are within 0.5% of the geodesic distances on the
+# ellipsoid.
+EARTH_RADIUS = 6371.0088
 
 
 def distance_calculation(lat1, lng1, lat2, lng2):
 
-    """A function to calculate distance."""
+    """A function to calculate distance.
+
+    Args:
+        lat1 (float): Latitude of the first location
+        lng1 (float): Longitude of the first location
+        lat2 (float): Latitude of the second location
+        lng2 (float): Longitude of the second location
+
+    Returns:
+        float: The great circle (haversine) distance in km
+    """
+
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    a = math.sin((phi2 - phi1) / 2) ** 2 + \
+        math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def distance_matrix(points, targets):
+
+    """A function to calculate the distance from many locations to many others at once.
+
+    Args:
+        points (array-like): (lat, lng) pairs
+        targets (array-like): (lat, lng) pairs
+
+    Returns:
+        numpy.ndarray: The distance_calculation of every pair in km, a row
+            for each of points and a column for each of targets
+    """
+
+    import numpy as np
 
-    return LatLon(lat1, lng1).distance(LatLon(lat2, lng2))
+    points = np.radians(np.asarray(points, dtype=float).reshape(-1, 2))
+    targets = np.radians(np.asarray(targets, dtype=float).reshape(-1, 2))
+    lat1, lng1 = points[:, :1], points[:, 1:]
+    lat2, lng2 = targets[:, 0], targets[:, 1]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
@@ -0,0 +1,131 @@
+"""A module to serve the weather of every chat district from an in-memory snapshot"""
+
+import functools
+import threading
+import time
+from collections import namedtuple
+
+import weather_data
+from fetch_plan import FEEDS
+from hko_cache import prefetched
+import spatial_index
+
+
+# How many forecast days a chat answer can show
+FORECAST_DAYS = 3
+
+# Everything a chat answer needs for one district, in the shapes
+# app.render_weather_response reads from fetch_plan.FEEDS
+Snapshot = namedtuple('Snapshot', ['district', 'grid', 'urls', 'data', 'built'])
+
+
+class DistrictSnapshots(object):
+    """A table of Snapshot records, one per district
+
+    The table is rebuilt whenever the body of one of its source feeds
+    changes, on the thread the cache tells its listeners on, and replaced in
+    one assignment so readers see either the old or the new table. A rebuild
+    only reads responses already in the cache and never fetches: a district
+    gets a snapshot once chat answers or the refresh scheduler have fetched
+    all of its feeds. A snapshot is only served while every feed it was
+    built from is still fresh in the cache.
+
+    Args:
+        districts (dict): Maps a district name to its 'lat' and 'lng'
+    """
+
+    def __init__(self, districts):
+        self.districts = districts
+        self.cache = None
+        self.rebuilds = 0
+        self._table = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    @functools.cached_property
+    def _grids(self):
+        # Resolved on first use, so building the table reads no grid asset
+        grids = {}
+        for district, coords in self.districts.items():
+            # The grid local_weather reads for these coordinates
+            grid, _ = spatial_index.RASTER.grid(coords['lat'], coords['lng'])
+            if grid is not None:
+                grids[district] = grid
+        return grids
+
+    def sources(self, district):
+        """List the URLs the snapshot of a district is built from"""
+        urls = [weather_data.HKO_WEB_URL + weather_data.WEATHER_WARNING_URLS['EN'],
+                weather_data.HKO_PDA_URL + weather_data.FORECAST_URLS['EN'],
+                weather_data.HKO_PDA_URL + weather_data.UV_INDEX_URLS['EN']]
+        if district in self._grids:
+            urls.append(weather_data.HKO_PDA_URL + weather_data.GRID_DATA_URL.format(self._grids[district]))
+        return urls
+
+    def attach(self, cache):
+        """Rebuild whenever a source feed changes in cache, and check freshness there"""
+        self.cache = cache
+        cache.subscribe(self.on_update)
+        return self
+
+    def on_update(self, url, changed):
+        if changed and any(url in self.sources(district) for district in self.districts):
+            self.rebuild()
+
+    def _build(self, district):
+        urls = self.sources(district)
+        responses = {url: self.cache.peek(url) for url in urls}
+        if any(response is None for response in responses.values()):
+            return None
+        # The fetchers parse the cached responses; none of them is fetched
+        with prefetched(responses):
+            data = {feed: FEEDS[feed](self.districts[district]) for feed in ('local', 'uv', 'forecast', 'warnings')}
+        if any(data[feed]['status'] != 1 for feed in data):
+            return None
+        local = data['local']
+        forecast = data['forecast']['result']
+        warnings = data['warnings']['result']
+        return Snapshot(district, self._grids.get(district), tuple(urls), {
+            'local': {'status': 1, 'place': local.get('place'),
+                      'result': {'RegionalWeather': local['result']['RegionalWeather']}},
+            'uv': data['uv'],
+            'forecast': {'status': 1, 'result': {'forecast_detail': forecast['forecast_detail'][:FORECAST_DAYS]}},
+            'warnings': {'status': 1, 'result': {key: value for key, value in warnings.items()
+                                                 if value.get('InForce') == 1}},
+        }, time.time())
+
+    def rebuild(self):
+        """Rebuild every snapshot from the cached feeds and swap the table in
+
+        A rebuild asked for while another is running makes the running one
+        go round again. Without a cache the table is left empty.
+        """
+        if self.cache is None:
+            return
+        self._dirty = True
+        while self._dirty and self._lock.acquire(blocking=False):
+            try:
+                while self._dirty:
+                    self._dirty = False
+                    table = {}
+                    for district in self.districts:
+                        # A bad feed must not stop the other districts
+                        try:
+                            snapshot = self._build(district)
+                        except Exception:
+                            snapshot = None
+                        if snapshot is not None:
+                            table[district] = snapshot
+                    self._table = table
+                    self.rebuilds += 1
+            finally:
+                self._lock.release()
+
+    def get(self, district):
+        """Return the snapshot of a district, or None if it is missing or stale"""
+        snapshot = self._table.get(district)
+        if snapshot is None or self.cache is None:
+            return None
+        if not all(self.cache.fresh(url) for url in snapshot.urls):
+            return None
+        return snapshot
@@ -0,0 +1,96 @@
+"""A local stand-in for the Hong Kong Observatory servers, for tests and benchmarks"""
+
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that time out hang up mid-response; that is expected here
+        pass
+
+
+class FakeHKO(object):
+    """An HTTP/1.1 server that answers HKO feed paths with canned payloads
+
+    Use it as a context manager; url is the base URL to put in front of a
+    feed path such as 'locspc/android_data/fnd_e.xml'.
+
+    Args:
+        routes (dict): Maps a path (without the leading '/') to the response
+            body as bytes, or to a function taking the request handler and
+            returning (status, headers, body)
+        latency (float): Seconds to wait before answering each request
+        connect_latency (float): Seconds to wait when a connection is opened,
+            standing in for the TCP and TLS handshakes to the real servers
+    """
+
+    def __init__(self, routes=None, latency=0, connect_latency=0):
+        self.routes = dict(routes or {})
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.requests = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = _Server(('127.0.0.1', 0), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/'.format(self._server.server_address[1])
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                with fake._lock:
+                    fake.connections += 1
+                time.sleep(fake.connect_latency)
+                BaseHTTPRequestHandler.setup(self)
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_GET(self):
+                path = self.path.lstrip('/')
+                with fake._lock:
+                    fake.requests.append(path)
+                time.sleep(fake.latency)
+                route = fake.routes.get(path)
+                if route is None:
+                    status, headers, body = 404, {}, b'Not Found'
+                elif callable(route):
+                    status, headers, body = route(self)
+                else:
+                    status, headers, body = 200, {}, route
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
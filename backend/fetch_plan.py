@@ -0,0 +1,110 @@
+"""A module to fetch only the weather feeds a chat answer needs"""
+
+import asyncio
+
+import hko_client
+import weather_data_async
+from weather_data import local_weather, grid_weather, uv_index, weather_warning, several_days_weather_forecast
+
+
+# Every feed a chat answer can use, fetched for a district's coordinates.
+# Coordinates from the gazetteer carry their grid, so no grid search is needed
+FEEDS = {
+    'local': lambda coords: grid_weather(coords['grid'], coords['place']) if 'grid' in coords
+    else local_weather(coords['lat'], coords['lng']),
+    'uv': lambda coords: uv_index('EN'),
+    'forecast': lambda coords: several_days_weather_forecast('EN'),
+    'warnings': lambda coords: weather_warning('EN'),
+}
+
+# The same feeds as coroutines, for callers running an event loop and for
+# answers that read more than one feed
+ASYNC_FEEDS = {
+    'local': lambda coords: weather_data_async.grid_weather(coords['grid'], coords['place']) if 'grid' in coords
+    else weather_data_async.local_weather(coords['lat'], coords['lng']),
+    'uv': lambda coords: weather_data_async.uv_index('EN'),
+    'forecast': lambda coords: weather_data_async.several_days_weather_forecast('EN'),
+    'warnings': lambda coords: weather_data_async.weather_warning('EN'),
+}
+
+
+def required_feeds(period, info_type):
+    """Work out which feeds the answer for a period and info type reads
+
+    Args:
+        period (str): 'today', 'tomorrow', '2day' or '3day'
+        info_type (str): 'overall', 'temperature', 'humidity', 'wind' or 'uv'
+
+    Returns:
+        tuple: Names of entries in FEEDS
+    """
+    if period != 'today':
+        return ('forecast',)
+    if info_type == 'uv':
+        return ('uv',)
+    if info_type == 'overall':
+        return ('local', 'uv', 'warnings')
+    return ('local',)
+
+
+def fetch_feeds(coords, feeds):
+    """Fetch several feeds at once
+
+    A single feed is fetched on the calling thread; more than one are awaited
+    together on the event loop of hko_client.ASYNC_CLIENT, so the wait is
+    bounded by the slowest feed and takes no thread per feed.
+
+    Args:
+        coords (dict): 'lat' and 'lng' of the district, and optionally its
+            'grid' and grid point 'place' as from gazetteer.Gazetteer.coords
+        feeds (tuple): Names of entries in FEEDS
+
+    Returns:
+        dict: The response of each feed, keyed by name
+    """
+    if len(feeds) == 1:
+        return {feeds[0]: FEEDS[feeds[0]](coords)}
+    return hko_client.ASYNC_CLIENT.run(fetch_feeds_async(coords, feeds))
+
+
+def feed_key(feed, coords):
+    """Identify the upstream fetch behind a feed for some coordinates
+
+    Only local weather depends on the place; every other feed is the same
+    for all districts.
+    """
+    if feed != 'local':
+        return (feed,)
+    if 'grid' in coords:
+        return (feed, coords['grid'])
+    return (feed, coords['lat'], coords['lng'])
+
+
+def fetch_many(plans):
+    """Fetch the feeds of several answers at once, each distinct feed only once
+
+    Args:
+        plans (list): (coords, feeds) pairs, as taken by fetch_feeds
+
+    Returns:
+        list: For each pair, the response of each feed keyed by name; a feed
+            whose fetcher raised maps to the exception instead
+    """
+    fetches = {}
+    for coords, feeds in plans:
+        for feed in feeds:
+            fetches.setdefault(feed_key(feed, coords), (feed, coords))
+    results = hko_client.ASYNC_CLIENT.run(_fetch_all(fetches)) if fetches else {}
+    return [{feed: results[feed_key(feed, coords)] for feed in feeds} for coords, feeds in plans]
+
+
+async def _fetch_all(fetches):
+    results = await asyncio.gather(*(ASYNC_FEEDS[feed](coords) for feed, coords in fetches.values()),
+                                   return_exceptions=True)
+    return dict(zip(fetches, results))
+
+
+async def fetch_feeds_async(coords, feeds):
+    """The asyncio counterpart of fetch_feeds, awaiting every feed at once"""
+    results = await asyncio.gather(*(ASYNC_FEEDS[feed](coords) for feed in feeds))
+    return dict(zip(feeds, results))
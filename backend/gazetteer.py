@@ -0,0 +1,130 @@
+"""A module to resolve Hong Kong place names to coordinates and grid ids"""
+
+from collections import namedtuple
+
+import spatial_index
+
+
+# A named place, with every name it answers to and the grid and grid point
+# name local_weather would pick for its coordinates (both None when no grid
+# point is within 10 km)
+Place = namedtuple('Place', ['name', 'names', 'lat', 'lng', 'grid', 'place'])
+
+
+def _normalize(name):
+    return ' '.join(name.lower().split())
+
+
+def representative_points(points):
+    """Pick one point for every name in the grid
+
+    Each name covers a patch of grid points; its representative is the point
+    closest to the middle of the patch, so it always lies inside it.
+
+    Args:
+        points (tuple): GridPoint records
+
+    Returns:
+        dict: Maps a name to the (lat, lng) of its representative, in the
+            order the names first appear
+    """
+    patches = {}
+    for point in points:
+        patches.setdefault(point.name, []).append(point)
+    centres = {}
+    for name, patch in patches.items():
+        lat = sum(point.lat for point in patch) / len(patch)
+        lng = sum(point.lng for point in patch) / len(patch)
+        best = min(patch, key=lambda point: (point.lat - lat) ** 2 + (point.lng - lng) ** 2)
+        centres[name] = (best.lat, best.lng)
+    return centres
+
+
+class Gazetteer(object):
+    """A hash index from place names, in English or Chinese, to Place records
+
+    Names are matched ignoring case and repeated spaces. The grid of every
+    place is looked up once when it is added, so requests for a known place
+    never search the grid.
+    """
+
+    def __init__(self):
+        self.places = {}
+        self._names = {}
+
+    def add(self, name, lat, lng, aliases=()):
+        """Add a place, or more names for it if name is already known
+
+        Args:
+            name (str): The name the place is reported under
+            lat (float): Latitude of the place
+            lng (float): Longitude of the place
+            aliases (list): Other names of the place
+
+        Returns:
+            Place: The place added or extended
+        """
+        known = self.lookup(name)
+        if known is None:
+            grid, place = spatial_index.RASTER.grid(lat, lng)
+            known = Place(_normalize(name), (), lat, lng, grid, place)
+        names = list(known.names)
+        for alias in [name] + list(aliases):
+            alias = _normalize(alias)
+            if alias not in self._names:
+                self._names[alias] = known.name
+                names.append(alias)
+        self.places[known.name] = known._replace(names=tuple(names))
+        return self.places[known.name]
+
+    def lookup(self, name):
+        """Return the Place a name refers to, or None if it is unknown"""
+        return self.places.get(self._names.get(_normalize(name)))
+
+    def coords(self, name):
+        """Return the 'lat', 'lng', 'grid' and 'place' of a place, as fetch_plan reads them"""
+        place = self.lookup(name)
+        if place is None:
+            return None
+        return {'lat': place.lat, 'lng': place.lng, 'grid': place.grid, 'place': place.place}
+
+    def aliases(self):
+        """Map every place name to its other names, in the order the places were added"""
+        return {name: list(place.names[1:]) for name, place in self.places.items()}
+
+    def __len__(self):
+        return len(self._names)
+
+
+def load(districts=None):
+    """Build a gazetteer of the given districts and every place in the assets
+
+    The districts come first, so they win wherever their names overlap the
+    assets. region.json then gives English names for the Chinese names of
+    grid_location.json; stations whose Chinese name is not in the grid have
+    no coordinates and are left out. Every other grid name is added under its
+    Chinese name alone.
+
+    Args:
+        districts (dict): Maps a district name to its 'lat' and 'lng'
+
+    Returns:
+        Gazetteer: The index
+    """
+    gazetteer = Gazetteer()
+    for name, coords in (districts or {}).items():
+        gazetteer.add(name, coords['lat'], coords['lng'])
+    centres = representative_points(spatial_index.GRID)
+    # region.json holds the Chinese names as escaped strings such as '\\u9577\\u6d32'
+    for english, escaped in spatial_index.load_asset('region.json').items():
+        chinese = escaped.encode('ascii').decode('unicode_escape')
+        if chinese not in centres:
+            continue
+        known = gazetteer.lookup(english) or gazetteer.lookup(chinese)
+        if known is not None:
+            gazetteer.add(known.name, known.lat, known.lng, [english, chinese])
+        else:
+            gazetteer.add(english, *centres[chinese], aliases=[chinese])
+    for chinese, (lat, lng) in centres.items():
+        gazetteer.add(chinese, lat, lng)
+    return gazetteer
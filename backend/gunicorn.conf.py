@@ -0,0 +1,73 @@
+"""gunicorn settings for the chat backend
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+WEB_CONCURRENCY and GUNICORN_THREADS override the number of worker processes
+and threads per worker, and HKO_SESSION_DB the file the workers share
+conversations in; by default it is created in a new private directory.
+"""
+
+import gc
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+
+port = os.environ.get('PORT', '5000')
+bind = '0.0.0.0:' + port
+
+# Any worker may receive the next turn of a conversation, so unless another
+# file is named they all keep conversations in one database on this host. It
+# goes in a directory only this user can enter (mkdtemp creates it with mode
+# 0700 under an unguessable name), so no other local user can plant or read
+# the database first; the directory is removed when the server exits
+SESSION_DIR = None
+if not os.environ.get('HKO_SESSION_DB'):
+    SESSION_DIR = tempfile.mkdtemp(prefix='hko-sessions-')
+    os.environ['HKO_SESSION_DB'] = os.path.join(SESSION_DIR, 'sessions.sqlite3')
+
+# Chat answers mostly wait on HKO, so every worker serves requests from a
+# few threads while the processes spread parsing and rendering over the cores
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Build the indexes and gazetteer in the master, before forking
+preload_app = True
+
+# Workers finish the requests in flight for up to graceful_timeout seconds
+# after SIGTERM before they are killed
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+
+def when_ready(server):
+    # Move everything loaded so far out of the collector's reach, so workers
+    # do not write to (and copy) the shared pages just by collecting garbage
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import hko_client
+    from app import start_refresh_scheduler
+
+    # Threads and pooled connections do not survive a fork: each worker
+    # opens its own connections and refreshes its own cache
+    hko_client.CLIENT.close()
+    worker.refresh_scheduler = start_refresh_scheduler()
+
+
+def worker_exit(server, worker):
+    import hko_client
+
+    scheduler = getattr(worker, 'refresh_scheduler', None)
+    if scheduler is not None:
+        scheduler.stop()
+    hko_client.CLIENT.close()
+
+
+def on_exit(server):
+    if SESSION_DIR is not None:
+        shutil.rmtree(SESSION_DIR, ignore_errors=True)
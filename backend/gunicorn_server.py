@@ -0,0 +1,42 @@
+"""Start the production server on a local port, for tests and benchmarks"""
+
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import requests
+
+
+BACKEND = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def serve(workers, upstream, **settings):
+    """Start gunicorn with the production settings and wait until it answers
+
+    The server reads HKO from upstream and sees none of the caller's
+    environment but PATH; settings adds environment variables to it, e.g.
+    HKO_SESSION_DB. Returns the process and the base URL of the API.
+    """
+    port = free_port()
+    env = {'PATH': os.environ.get('PATH', os.defpath), 'PORT': str(port), 'WEB_CONCURRENCY': str(workers),
+           'HKO_PDA_URL': upstream, 'HKO_WEB_URL': upstream, 'HKO_REFRESH': '1'}
+    env.update(settings)
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                              cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}/api/'
+    for _ in range(200):
+        try:
+            requests.get(url + 'health', timeout=1)
+            return server, url
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.05)
+    server.kill()
+    raise RuntimeError('gunicorn did not start')
@@ -1,6 +1,7 @@
 """A package to retrieve data from Hong Kong Observatory"""
 
 from hko.astro import astro
+from hko.astro_tide import astro_tide
 from hko.blog import blog
 from hko.earthquake import earthquake
 from hko.local_weather import local_weather
@@ -0,0 +1,130 @@
+"""A module to retrieve data from Hong Kong Observatory without blocking the event loop
+
+Every coroutine here mirrors the hko function of the same name: it fetches
+the URLs that function reads concurrently through the shared response cache,
+then runs the function on the prefetched responses.
+"""
+
+import importlib
+
+import hko
+from hko_cache import run_prefetched
+import spatial_index
+
+
+def _module(name):
+    # hko re-exports each function under its module's name, so look the
+    # module itself up to read its URL constants
+    return importlib.import_module('hko.' + name)
+
+
+def _url(name, attr='URL'):
+    module = _module(name)
+    return module.BASE_URL + getattr(module, attr)
+
+
+def _lang_urls(name, lang, uc='URL_UC', en='URL_EN'):
+    if lang == 'UC':
+        return [_url(name, uc)]
+    if lang == 'EN':
+        return [_url(name, en)]
+    return []
+
+
+def _valid(lat, lng):
+    return isinstance(lat, float) and isinstance(lng, float) and\
+        -90 <= lat <= 90 and -180 <= lng <= 180
+
+
+async def astro():
+    """See hko.astro"""
+    return await run_prefetched(hko.astro, [_url('astro_tide')])
+
+
+async def astro_tide():
+    """See hko.astro_tide"""
+    return await run_prefetched(hko.astro_tide, [_url('astro_tide')])
+
+
+async def blog():
+    """See hko.blog"""
+    return await run_prefetched(hko.blog, [_url('blog')])
+
+
+async def earthquake(lang='UC'):
+    """See hko.earthquake"""
+    return await run_prefetched(hko.earthquake, _lang_urls('earthquake', lang), lang)
+
+
+async def local_weather(lat, lng):
+    """See hko.local_weather"""
+    urls = []
+    if _valid(lat, lng):
+        grid, _ = spatial_index.RASTER.grid(lat, lng)
+        if grid is not None:
+            urls.append(_module('local_weather').BASE_URL +
+                        'locspc/android_data/gridData/{}_tc.xml'.format(grid))
+    return await run_prefetched(hko.local_weather, urls, lat, lng)
+
+
+async def lunar_date():
+    """See hko.lunar_date"""
+    return await run_prefetched(hko.lunar_date, [_url('lunar_date')])
+
+
+async def major_city_forecast(lang='UC'):
+    """See hko.major_city_forecast"""
+    urls = []
+    if lang in ['UC', 'EN']:
+        module = _module('major_city_forecast')
+        urls = [module.BASE_URL + (url_uc if lang == 'UC' else url_en) for _, url_uc, url_en in module.REGIONS]
+    return await run_prefetched(hko.major_city_forecast, urls, lang)
+
+
+async def marine_forecast(lang='UC'):
+    """See hko.marine_forecast"""
+    return await run_prefetched(hko.marine_forecast, _lang_urls('marine_forecast', lang), lang)
+
+
+async def rainfall_nowcast(lat, lng):
+    """See hko.rainfall_nowcast"""
+    urls = []
+    if _valid(lat, lng):
+        nearest = spatial_index.RASTER.nowcast_point(lat, lng)
+        if nearest is not None:
+            urls.append(_module('rainfall_nowcast').BASE_URL +
+                        'locspc/android_data/rainfallnowcast/{}_{}.xml'.format(float(nearest.lat),
+                                                                              float(nearest.lng)))
+    return await run_prefetched(hko.rainfall_nowcast, urls, lat, lng)
+
+
+async def regional_weather():
+    """See hko.regional_weather"""
+    return await run_prefetched(hko.regional_weather, [_url('regional_weather')])
+
+
+async def serval_days_weather_forecast(lang='UC'):
+    """See hko.serval_days_weather_forecast"""
+    return await run_prefetched(hko.serval_days_weather_forecast,
+                                _lang_urls('serval_days_weather_forecast', lang), lang)
+
+
+async def south_china_coastal_waters(lang='UC'):
+    """See hko.south_china_coastal_waters"""
+    return await run_prefetched(hko.south_china_coastal_waters,
+                                _lang_urls('south_china_coastal_waters', lang), lang)
+
+
+async def tide():
+    """See hko.tide"""
+    return await run_prefetched(hko.tide, [_url('astro_tide')])
+
+
+async def uv_index(lang='UC'):
+    """See hko.uv_index"""
+    return await run_prefetched(hko.uv_index, _lang_urls('uv_index', lang, uc='URL_TC'), lang)
+
+
+async def weather_warning(lang='UC'):
+    """See hko.weather_warning"""
+    return await run_prefetched(hko.weather_warning, _lang_urls('weather_warning', lang), lang)
@@ -1,34 +1,15 @@
 """A module to retrieve astro data from Hong Kong Observatory"""
 
-import re
-
-import requests
-
-
-BASE_URL = 'http://pda.weather.gov.hk/'
-URL = 'locspc/android_data/astro_tide.xml'
+from hko.astro_tide import ASTRO_FIELDS, view
+from hko_cache import single_flight
 
 
+@single_flight
 def astro():
 
-    """A function to retrieve astro data from Hong Kong Observatory"""
+    """A function to retrieve astro data from Hong Kong Observatory
+
+    The data comes from the feed hko.tide reads too, which is fetched and
+    parsed once for both (see hko.astro_tide)."""
 
-    response = {}
-    try:
-        data = requests.get(BASE_URL + URL).content
-        data2 = re.split('[@#]', data.decode('utf-8'))
-        temp = {}
-        temp['sunrise'] = data2[0]
-        temp['sunset'] = data2[1]
-        temp['moonrise'] = data2[2]
-        temp['moonset'] = data2[3]
-        temp['date'] = data2[12]
-        response['result'] = temp
-        response['status'] = 1
-    except IndexError:
-        response['result'] = ''
-        response['status'] = 2
-    except requests.exceptions.RequestException:
-        response['result'] = ''
-        response['status'] = 5
-    return response
+    return view(ASTRO_FIELDS)
@@ -0,0 +1,66 @@
+"""A module to retrieve astro and tide data from Hong Kong Observatory, which
+hko.astro and hko.tide read from the one feed"""
+
+import requests
+
+from delimited import ASTRO_TIDE
+from hko import feeds
+from hko_cache import single_flight
+
+
+BASE_URL = 'http://pda.weather.gov.hk/'
+URL = 'locspc/android_data/astro_tide.xml'
+
+ASTRO_FIELDS = ['sunrise', 'sunset', 'moonrise', 'moonset', 'date']
+TIDE_FIELDS = ['low_tide_1', 'high_tide_1', 'low_tide_2', 'high_tide_2', 'date']
+
+
+def parse(data):
+
+    """A function to parse the astro and tide feed into one dict"""
+
+    record = ASTRO_TIDE.parse(data.content)
+    temp = {}
+    temp['sunrise'] = record.sunrise
+    temp['sunset'] = record.sunset
+    temp['moonrise'] = record.moonrise
+    temp['moonset'] = record.moonset
+    for tide in ['low_tide_1', 'high_tide_1', 'low_tide_2', 'high_tide_2']:
+        temp[tide] = {'value': getattr(record, tide + '_value'), 'time': getattr(record, tide + '_time')}
+    temp['date'] = record.date
+    return temp
+
+
+feeds.register(URL, parse)
+
+
+@single_flight
+def astro_tide():
+
+    """A function to retrieve astro and tide data from Hong Kong Observatory"""
+
+    response = {}
+    try:
+        response['result'] = feeds.read(BASE_URL, URL)
+        response['status'] = 1
+    except IndexError:
+        response['result'] = ''
+        response['status'] = 2
+    except requests.exceptions.RequestException:
+        response['result'] = ''
+        response['status'] = 5
+    return response
+
+
+def view(fields):
+
+    """A function to retrieve some fields of astro_tide, with the same status"""
+
+    data = astro_tide()
+    response = {}
+    if data['status'] == 1:
+        response['result'] = {field: data['result'][field] for field in fields}
+    else:
+        response['result'] = ''
+    response['status'] = data['status']
+    return response
@@ -4,18 +4,21 @@ import json
 
 import requests
 
+from hko_cache import cached_get, single_flight
+
 
 BASE_URL = 'http://www.weather.gov.hk/'
 URL = 'forecaster_blog/json/blog_json_uc.xml'
 
 
+@single_flight
 def blog():
 
     """A function to retrieve blog data from Hong Kong Observatory"""
 
     response = {}
     try:
-        data = json.loads(requests.get(BASE_URL + URL).content)
+        data = json.loads(cached_get(BASE_URL + URL).content)
         response['result'] = data
         response['status'] = 1
     except IndexError:
@@ -1,9 +1,14 @@
-"""A module to retrieve astro data from Hong Kong Observatory"""
+"""A module to retrieve earthquake data from Hong Kong Observatory"""
 
-import json
+import io
+import re
+from collections import namedtuple
+from functools import lru_cache
+from xml.etree import ElementTree
 
 import requests
-import xmltodict
+
+from hko_cache import cached_get, single_flight
 
 
 BASE_URL = 'http://pda.weather.gov.hk/'
@@ -11,22 +16,146 @@ URL_UC = 'locspc/android_data/earthquake/eq_app_uc.xml'
 URL_EN = 'locspc/android_data/earthquake/eq_app_e.xml'
 
 
+def _elements(content):
+    """Read an XML document as each element is completed, with names as written
+
+    ElementTree names a namespaced element '{uri}local' and drops xmlns
+    attributes, where xmltodict keeps 'prefix:local' and the attributes, so
+    namespace declarations are followed when the document has any.
+
+    Yields:
+        tuple: The element, its name and its attributes as a list of
+            ('@name', value)
+    """
+    if b'xmlns' not in content:
+        for _, element in ElementTree.iterparse(io.BytesIO(content)):
+            attributes = element.attrib
+            yield element, element.tag, [('@' + name, value) for name, value in attributes.items()] \
+                if attributes else ()
+        return
+    prefixes = {}
+    declared = {}
+    pending = []
+    for event, item in ElementTree.iterparse(io.BytesIO(content), events=('start-ns', 'start', 'end')):
+        if event == 'start-ns':
+            prefix, uri = item
+            prefixes[uri] = prefix
+            pending.append(('@xmlns:' + prefix if prefix else '@xmlns', uri))
+        elif event == 'start':
+            if pending:
+                declared[item] = pending
+                pending = []
+        else:
+            attributes = declared.pop(item, [])
+            attributes.extend(('@' + _qualified(name, prefixes), value) for name, value in item.attrib.items())
+            yield item, _qualified(item.tag, prefixes), attributes
+
+
+def _qualified(name, prefixes):
+    if name[:1] != '{':
+        return name
+    uri, local = name[1:].split('}', 1)
+    prefix = prefixes.get(uri)
+    return '{}:{}'.format(prefix, local) if prefix else local
+
+
+def _text(element):
+    """Return the character data directly inside an element, stripped, or None"""
+    text = element.text
+    for child in element:
+        if child.tail:
+            text = (text or '') + child.tail
+    return text.strip() or None if text else None
+
+
+def parse(content):
+
+    """A function to parse an XML document into dicts, lists and strings
+
+    The result is exactly what xmltodict.parse gives, as plain dicts: each
+    element is its text when it has neither attributes nor children, and
+    otherwise a dict of '@' attributes, children by name (a list when a
+    name repeats) and '#text'. The document is read as a stream, and the
+    children of an element are released once it has them.
+
+    Args:
+        content (bytes): The document
+
+    Raises:
+        xml.etree.ElementTree.ParseError: If content is not well-formed"""
+
+    # The name and value of each element whose parent is still open
+    done = {}
+    for element, name, attributes in _elements(content):
+        text = _text(element)
+        if not attributes and not len(element):
+            done[element] = (name, text)
+            continue
+        value = dict(attributes) if attributes else {}
+        for child in element:
+            key, item = done.pop(child)
+            if key not in value:
+                value[key] = item
+            elif isinstance(value[key], list):
+                value[key].append(item)
+            else:
+                value[key] = [value[key], item]
+        if text is not None:
+            value['#text'] = text
+        del element[:]
+        done[element] = (name, value)
+    return dict(done.values())
+
+
+@lru_cache(maxsize=64)
+def _record_type(name, fields):
+    return namedtuple(re.sub(r'\W', '_', name), fields, rename=True)
+
+
+def events(content):
+
+    """A function to read the events of an earthquake feed as compact records
+
+    An event is an element whose children all hold plain text, like the
+    date, time, location and magnitude of a quake. Each one is a namedtuple
+    named after its element, with a field per child in document order.
+
+    Args:
+        content (bytes): The feed
+
+    Yields:
+        namedtuple: Each event, as soon as it has been read"""
+
+    # The name of each element whose parent is still open, and whether it
+    # holds plain text
+    done = {}
+    for element, name, attributes in _elements(content):
+        plain = not attributes and not len(element)
+        if len(element):
+            children = [done.pop(child) for child in element]
+            names = tuple(child_name for child_name, _ in children)
+            if not attributes and all(leaf for _, leaf in children) and len(set(names)) == len(names) \
+                    and _text(element) is None:
+                yield _record_type(name, names)._make([_text(child) for child in element])
+            del element[:]
+        done[element] = (name, plain)
+
+
+@single_flight
 def earthquake(lang='UC'):
 
-    """A function to retrieve astro data from Hong Kong Observatory"""
+    """A function to retrieve earthquake data from Hong Kong Observatory"""
 
     response = {}
     if lang in ['UC', 'EN']:
         try:
             if lang == 'UC':
-                data = requests.get(BASE_URL + URL_UC)
+                data = cached_get(BASE_URL + URL_UC)
             if lang == 'EN':
-                data = requests.get(BASE_URL + URL_EN)
-            data.encoding = 'utf8'
-            data = json.loads(json.dumps(xmltodict.parse(data.text)))
-            response['result'] = data
+                data = cached_get(BASE_URL + URL_EN)
+            response['result'] = parse(data.content)
             response['status'] = 1
-        except IndexError:
+        except (IndexError, ElementTree.ParseError):
             response['result'] = ''
             response['status'] = 2
         except requests.exceptions.RequestException:
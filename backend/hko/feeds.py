@@ -0,0 +1,43 @@
+"""A module to fetch and parse each Hong Kong Observatory feed once, whichever
+hko modules read it
+
+A feed is registered with its parser by the module that owns it. read
+fetches it through the shared response cache and parses it once per response
+the cache serves, however many functions read it: hko.astro and hko.tide
+share one fetch and one parse of astro_tide.xml.
+"""
+
+from hko_cache import cached_get, single_flight
+
+
+# The parser of each registered feed, by its path under a base URL
+PARSERS = {}
+
+
+def register(path, parse):
+
+    """A function to register the parser of a feed
+
+    Args:
+        path (str): The path of the feed, such as 'locspc/android_data/astro_tide.xml'
+        parse (callable): Builds the parsed feed from a requests.Response
+
+    Raises:
+        ValueError: If the feed already has another parser"""
+
+    if PARSERS.setdefault(path, parse) is not parse:
+        raise ValueError('{} already has a parser'.format(path))
+
+
+@single_flight
+def read(base_url, path):
+
+    """A function to fetch and parse a registered feed
+
+    Every reader gets its own copy of the one parsed feed.
+
+    Raises:
+        KeyError: If the feed is not registered
+        requests.exceptions.RequestException: If the feed cannot be fetched"""
+
+    return PARSERS[path](cached_get(base_url + path))
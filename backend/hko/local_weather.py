@@ -1,19 +1,17 @@
 """A module to retrieve local weather data from Hong Kong Observatory"""
 
 import json
-import pkg_resources
 
-from operator import itemgetter
 import requests
 
-from hko.distance_calculation import distance_calculation
+from hko_cache import cached_get, single_flight
+import spatial_index
 
 
-with open(pkg_resources.resource_filename(__name__, 'assets/grid_location.json')) as f:
-    GRID = json.load(f)
 BASE_URL = 'http://pda.weather.gov.hk/'
 
 
+@single_flight
 def local_weather(lat, lng):
 
     """A function to retrieve local weather data from Hong Kong Observatory"""
@@ -21,19 +19,14 @@ def local_weather(lat, lng):
     response = {}
     if isinstance(lat, float) and isinstance(lng, float) and\
        -90 <= lat <= 90 and -180 <= lng <= 180:
-        temp_dict = GRID
-        for i in temp_dict:
-            distance = distance_calculation(lat, lng, float(i['lat']), float(i['lng']))
-            i['dis'] = distance
-        newlist = sorted(temp_dict, key=itemgetter('dis'))
-        if newlist[0]['dis'] < 10:
+        grid, place = spatial_index.RASTER.grid(lat, lng)
+        if grid is not None:
             try:
-                grid = newlist[0]['grid']
                 url = 'locspc/android_data/gridData/{}_tc.xml'.format(grid)
-                grid_data = json.loads(requests.get(BASE_URL + url).text)
+                grid_data = json.loads(cached_get(BASE_URL + url).text)
                 response['status'] = 1
                 response['result'] = grid_data
-                response['place'] = newlist[0]['name']
+                response['place'] = place
             except IndexError:
                 response['result'] = ''
                 response['status'] = 2
@@ -4,18 +4,21 @@ import json
 
 import requests
 
+from hko_cache import cached_get, single_flight
+
 
 BASE_URL = 'http://pda.weather.gov.hk/'
 URL = 'locspc/android_data/lunar_date_uc.xml'
 
 
+@single_flight
 def lunar_date():
 
     """A function to retrieve lunar date data from Hong Kong Observatory"""
 
     response = {}
     try:
-        data = json.loads(requests.get(BASE_URL + URL).content)
+        data = json.loads(cached_get(BASE_URL + URL).content)
         response['result'] = data
         response['status'] = 1
     except IndexError:
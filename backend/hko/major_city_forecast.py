@@ -1,7 +1,13 @@
 """A module to retrieve major cities weather forecast data from Hong Kong Observatory"""
 
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 
+from delimited import MAJOR_CITY
+from hko_cache import cached_get, single_flight
+
 
 BASE_URL = 'http://pda.weather.gov.hk/'
 URL_ASIA_UC = 'locspc/android_data/asis_wwic.xml'
@@ -17,28 +23,42 @@ URL_NORTHCENTRALAMERICA_EN = 'locspc/android_data/north_central_america_wwi.xml'
 URL_SOUTHAMERICA_UC = 'locspc/android_data/south_america_wwic.xml'
 URL_SOUTHAMERICA_EN = 'locspc/android_data/south_america_wwi.xml'
 
+# The result key of each region and its URLs in each language
+REGIONS = [
+    ('Asia', URL_ASIA_UC, URL_ASIA_EN),
+    ('Africa', URL_AFRICA_UC, URL_AFRICA_EN),
+    ('AustraliaSouthPacific', URL_AUSTRALIASOUTHPACIFIC_UC, URL_AUSTRALIASOUTHPACIFIC_EN),
+    ('Europe', URL_EUROPE_UC, URL_EUROPE_EN),
+    ('NorthCentralAmerica', URL_NORTHCENTRALAMERICA_UC, URL_NORTHCENTRALAMERICA_EN),
+    ('SouthAmerica', URL_SOUTHAMERICA_UC, URL_SOUTHAMERICA_EN),
+]
+# The '#' separated fields of each city, in order
+FIELDS = MAJOR_CITY.fields
+
+FETCH_POOL = ThreadPoolExecutor(max_workers=len(REGIONS), thread_name_prefix='hko-major-city')
+
+
+def parse(content):
+
+    """A function to parse a major cities feed, as bytes or text, into one dict per city"""
+
+    return MAJOR_CITY.dicts(content)
+
+
+@single_flight
+def region(url_uc, url_en, lang='UC'):
+
+    """A function to retrieve the major cities weather forecast data of one region
+    from Hong Kong Observatory"""
+
+    return parse(cached_get(BASE_URL + (url_uc if lang == 'UC' else url_en)).content)
+
 
 def asia(lang='UC'):
 
     """A function to retrieve major Asian cities weather forecast data from Hong Kong Observatory"""
 
-    response = []
-    if lang == 'UC':
-        data = requests.get(BASE_URL + URL_ASIA_UC)
-    if lang == 'EN':
-        data = requests.get(BASE_URL + URL_ASIA_EN)
-    data.encoding = 'utf8'
-    data2 = data.text.split('@')
-    for i in data2:
-        temp = i.split('#')
-        temp_dict = {}
-        temp_dict['place'] = temp[0]
-        temp_dict['mintemp'] = temp[1]
-        temp_dict['maxtemp'] = temp[2]
-        temp_dict['status'] = temp[3]
-        temp_dict['photo'] = temp[4]
-        response.append(temp_dict)
-    return response
+    return region(URL_ASIA_UC, URL_ASIA_EN, lang)
 
 
 def africa(lang='UC'):
@@ -46,23 +66,7 @@ def africa(lang='UC'):
     """A function to retrieve major African cities weather forecast
     data from Hong Kong Observatory"""
 
-    response = []
-    if lang == 'UC':
-        data = requests.get(BASE_URL + URL_AFRICA_UC)
-    if lang == 'EN':
-        data = requests.get(BASE_URL + URL_AFRICA_EN)
-    data.encoding = 'utf8'
-    data2 = data.text.split('@')
-    for i in data2:
-        temp = i.split('#')
-        temp_dict = {}
-        temp_dict['place'] = temp[0]
-        temp_dict['mintemp'] = temp[1]
-        temp_dict['maxtemp'] = temp[2]
-        temp_dict['status'] = temp[3]
-        temp_dict['photo'] = temp[4]
-        response.append(temp_dict)
-    return response
+    return region(URL_AFRICA_UC, URL_AFRICA_EN, lang)
 
 
 def australia_south_pacific(lang='UC'):
@@ -70,23 +74,7 @@ def australia_south_pacific(lang='UC'):
     """A function to retrieve major Australian and South Pacific cities weather forecast
     data from Hong Kong Observatory"""
 
-    response = []
-    if lang == 'UC':
-        data = requests.get(BASE_URL + URL_AUSTRALIASOUTHPACIFIC_UC)
-    if lang == 'EN':
-        data = requests.get(BASE_URL + URL_AUSTRALIASOUTHPACIFIC_EN)
-    data.encoding = 'utf8'
-    data2 = data.text.split('@')
-    for i in data2:
-        temp = i.split('#')
-        temp_dict = {}
-        temp_dict['place'] = temp[0]
-        temp_dict['mintemp'] = temp[1]
-        temp_dict['maxtemp'] = temp[2]
-        temp_dict['status'] = temp[3]
-        temp_dict['photo'] = temp[4]
-        response.append(temp_dict)
-    return response
+    return region(URL_AUSTRALIASOUTHPACIFIC_UC, URL_AUSTRALIASOUTHPACIFIC_EN, lang)
 
 
 def europe(lang='UC'):
@@ -94,23 +82,7 @@ def europe(lang='UC'):
     """A function to retrieve major European cities weather forecast
     data from Hong Kong Observatory"""
 
-    response = []
-    if lang == 'UC':
-        data = requests.get(BASE_URL + URL_EUROPE_UC)
-    if lang == 'EN':
-        data = requests.get(BASE_URL + URL_EUROPE_EN)
-    data.encoding = 'utf8'
-    data2 = data.text.split('@')
-    for i in data2:
-        temp = i.split('#')
-        temp_dict = {}
-        temp_dict['place'] = temp[0]
-        temp_dict['mintemp'] = temp[1]
-        temp_dict['maxtemp'] = temp[2]
-        temp_dict['status'] = temp[3]
-        temp_dict['photo'] = temp[4]
-        response.append(temp_dict)
-    return response
+    return region(URL_EUROPE_UC, URL_EUROPE_EN, lang)
 
 
 def north_central_america(lang='UC'):
@@ -118,23 +90,7 @@ def north_central_america(lang='UC'):
     """A function to retrieve major North and Central American cities weather forecast
     data from Hong Kong Observatory"""
 
-    response = []
-    if lang == 'UC':
-        data = requests.get(BASE_URL + URL_NORTHCENTRALAMERICA_UC)
-    if lang == 'EN':
-        data = requests.get(BASE_URL + URL_NORTHCENTRALAMERICA_EN)
-    data.encoding = 'utf8'
-    data2 = data.text.split('@')
-    for i in data2:
-        temp = i.split('#')
-        temp_dict = {}
-        temp_dict['place'] = temp[0]
-        temp_dict['mintemp'] = temp[1]
-        temp_dict['maxtemp'] = temp[2]
-        temp_dict['status'] = temp[3]
-        temp_dict['photo'] = temp[4]
-        response.append(temp_dict)
-    return response
+    return region(URL_NORTHCENTRALAMERICA_UC, URL_NORTHCENTRALAMERICA_EN, lang)
 
 
 def south_america(lang='UC'):
@@ -142,46 +98,47 @@ def south_america(lang='UC'):
     """A function to retrieve major South American cities weather forecast
     data from Hong Kong Observatory"""
 
-    response = []
-    if lang == 'UC':
-        data = requests.get(BASE_URL + URL_SOUTHAMERICA_UC)
-    if lang == 'EN':
-        data = requests.get(BASE_URL + URL_SOUTHAMERICA_EN)
-    data.encoding = 'utf8'
-    data2 = data.text.split('@')
-    for i in data2:
-        temp = i.split('#')
-        temp_dict = {}
-        temp_dict['place'] = temp[0]
-        temp_dict['mintemp'] = temp[1]
-        temp_dict['maxtemp'] = temp[2]
-        temp_dict['status'] = temp[3]
-        temp_dict['photo'] = temp[4]
-        response.append(temp_dict)
-    return response
+    return region(URL_SOUTHAMERICA_UC, URL_SOUTHAMERICA_EN, lang)
 
 
+@single_flight
 def major_city_forecast(lang='UC'):
 
-    """A function to retrieve major cities weather forecast data from Hong Kong Observatory"""
+    """A function to retrieve major cities weather forecast data from Hong Kong Observatory
+
+    The six regions are fetched in parallel. A region that fails is left
+    out of the result as '' and named in response['failed'], which is only
+    there when some region failed, so a full answer has the same keys as
+    before. The status is only an error when every region fails."""
 
     response = {}
     if lang in ['UC', 'EN']:
-        try:
-            response['result'] = {}
-            response['result']['Asia'] = asia(lang)
-            response['result']['Africa'] = africa(lang)
-            response['result']['AustraliaSouthPacific'] = australia_south_pacific(lang)
-            response['result']['Europe'] = europe(lang)
-            response['result']['NorthCentralAmerica'] = north_central_america(lang)
-            response['result']['SouthAmerica'] = south_america(lang)
+        # Each fetch runs in a copy of this context so prefetched responses
+        # (see hko_cache.prefetched) reach the pool threads
+        futures = [(name, FETCH_POOL.submit(contextvars.copy_context().run, region, url_uc, url_en, lang))
+                   for name, url_uc, url_en in REGIONS]
+        response['result'] = {}
+        failed = []
+        statuses = []
+        for name, future in futures:
+            try:
+                response['result'][name] = future.result()
+                statuses.append(1)
+            except IndexError:
+                response['result'][name] = ''
+                failed.append(name)
+                statuses.append(2)
+            except requests.exceptions.RequestException:
+                response['result'][name] = ''
+                failed.append(name)
+                statuses.append(5)
+        if failed:
+            response['failed'] = failed
+        if 1 in statuses:
             response['status'] = 1
-        except IndexError:
-            response['result'] = ''
-            response['status'] = 2
-        except requests.exceptions.RequestException:
+        else:
             response['result'] = ''
-            response['status'] = 5
+            response['status'] = statuses[0]
     else:
         response['result'] = ''
         response['status'] = 0
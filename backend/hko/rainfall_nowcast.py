@@ -1,20 +1,16 @@
 """A module to retrieve rainfall nowcast data from Hong Kong Observatory"""
 
-import json
-import pkg_resources
-import re
-from operator import itemgetter
-
 import requests
 
-from hko.distance_calculation import distance_calculation
+from delimited import RAINFALL_NOWCAST
+from hko_cache import cached_get, single_flight
+import spatial_index
 
 
-with open(pkg_resources.resource_filename(__name__, 'assets/rainfall_nowcast_mapping.json')) as f:
-    MAPPING = json.load(f)
 BASE_URL = 'http://pda.weather.gov.hk/'
 
 
+@single_flight
 def rainfall_nowcast(lat, lng):
 
     """A function to retrieve rainfall nowcast data from Hong Kong Observatory"""
@@ -22,29 +18,24 @@ def rainfall_nowcast(lat, lng):
     response = {}
     if isinstance(lat, float) and isinstance(lng, float) and\
        -90 <= lat <= 90 and -180 <= lng <= 180:
-        temp_dict = MAPPING
-        for i in temp_dict:
-            distance = distance_calculation(lat, lng, float(i['lat']), float(i['lng']))
-            i['dis'] = distance
-        newlist = sorted(temp_dict, key=itemgetter('dis'))
-        if newlist[0]['dis'] > 10:
+        nearest = spatial_index.RASTER.nowcast_point(lat, lng)
+        if nearest is None:
             response['result'] = ''
             response['status'] = 3
             return response
-        lat_2 = newlist[0]['lat']
-        lng_2 = newlist[0]['lng']
+        lat_2 = nearest.lat
+        lng_2 = nearest.lng
         try:
             url = 'locspc/android_data/rainfallnowcast/{}_{}.xml'.format(float(lat_2), float(lng_2))
-            data = requests.get(BASE_URL + url).content
-            data2 = re.split('[@#]', data.decode('utf-8'))
+            record = RAINFALL_NOWCAST.parse(cached_get(BASE_URL + url).content)
             temp = {}
-            temp['0-30'] = {'from_time': data2[0], 'to_time': data2[2], 'value': data2[1]}
-            temp['30-60'] = {'from_time': data2[2], 'to_time': data2[4], 'value': data2[3]}
-            temp['60-90'] = {'from_time': data2[4], 'to_time': data2[6], 'value': data2[5]}
-            temp['90-120'] = {'from_time': data2[6], 'to_time': data2[8], 'value': data2[7]}
-            temp['description_en'] = data2[9]
-            temp['description_tc'] = data2[10]
-            temp['description_sc'] = data2[11]
+            temp['0-30'] = {'from_time': record.from_0, 'to_time': record.from_30, 'value': record.value_0}
+            temp['30-60'] = {'from_time': record.from_30, 'to_time': record.from_60, 'value': record.value_30}
+            temp['60-90'] = {'from_time': record.from_60, 'to_time': record.from_90, 'value': record.value_60}
+            temp['90-120'] = {'from_time': record.from_90, 'to_time': record.to_120, 'value': record.value_90}
+            temp['description_en'] = record.description_en
+            temp['description_tc'] = record.description_tc
+            temp['description_sc'] = record.description_sc
             response['result'] = temp
             response['status'] = 1
         except IndexError:
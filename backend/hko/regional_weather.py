@@ -4,18 +4,21 @@ import json
 
 import requests
 
+from hko_cache import cached_get, single_flight
+
 
 BASE_URL = 'http://pda.weather.gov.hk/'
 URL = 'locspc/android_data/myobservatory_regionalweather_uc.xml'
 
 
+@single_flight
 def regional_weather():
 
     """A function to retrieve regional weather data from Hong Kong Observatory"""
 
     response = {}
     try:
-        data = json.loads(requests.get(BASE_URL + URL).content)
+        data = json.loads(cached_get(BASE_URL + URL).content)
         response['result'] = data
         response['status'] = 1
     except IndexError:
@@ -4,12 +4,15 @@ import json
 
 import requests
 
+from hko_cache import cached_get, single_flight
+
 
 BASE_URL = 'http://pda.weather.gov.hk/'
 URL_UC = 'locspc/android_data/fnd_uc.xml'
 URL_EN = 'locspc/android_data/fnd_e.xml'
 
 
+@single_flight
 def serval_days_weather_forecast(lang='UC'):
 
     """A function to retrieve serval days weather forecast data from Hong Kong Observatory"""
@@ -18,9 +21,9 @@ def serval_days_weather_forecast(lang='UC'):
     if lang in ['UC', 'EN']:
         try:
             if lang == 'UC':
-                data = json.loads(requests.get(BASE_URL + URL_UC).content)
+                data = json.loads(cached_get(BASE_URL + URL_UC).content)
             if lang == 'EN':
-                data = json.loads(requests.get(BASE_URL + URL_EN).content)
+                data = json.loads(cached_get(BASE_URL + URL_EN).content)
             response['result'] = data
             response['status'] = 1
         except IndexError:
@@ -4,12 +4,15 @@
 
 import requests
 
+from hko_cache import cached_get, single_flight
+
 
 BASE_URL = 'http://pda.weather.gov.hk/'
 URL_TC = 'locspc/android_data/fuvc.xml'
 URL_EN = 'locspc/android_data/fuve.xml'
 
 
+@single_flight
 def uv_index(lang='UC'):
 
     """A function to retrieve uv index data from Hong Kong Observatory"""
@@ -18,7 +21,7 @@ def uv_index(lang='UC'):
     if lang in ['UC', 'EN']:
         try:
             if lang == 'UC':
-                data = requests.get(BASE_URL + URL_TC).content.decode('utf8')
+                data = cached_get(BASE_URL + URL_TC).content.decode('utf8')
                 data_1 = data.split(u'的最高紫外線指數大約是')
                 response['result'] = {}
                 response['result']['date'] = data_1[0]
@@ -26,7 +29,7 @@ def uv_index(lang='UC'):
                 response['result']['intensity'] = data_1[1].split(u'，強度屬於')[1][:-1]
                 response['status'] = 1
             if lang == 'EN':
-                data = requests.get(BASE_URL + URL_EN).content.decode('utf8')
+                data = cached_get(BASE_URL + URL_EN).content.decode('utf8')
                 data_1 = data.replace('The maximum UV Index for ', '')\
                              .replace(' will be about ', ',')\
                              .replace('. The intensity of UV radiation wll be ', ',')[:-1]
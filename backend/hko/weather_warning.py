@@ -4,12 +4,15 @@ import json
 
 import requests
 
+from hko_cache import cached_get, single_flight
+
 
 BASE_URL = 'http://www.weather.gov.hk/'
 URL_UC = 'wxinfo/json/warnsumc.xml'
 URL_EN = 'wxinfo/json/warnsum.xml'
 
 
+@single_flight
 def weather_warning(lang='UC'):
 
     """A function to retrieve weather warning data from Hong Kong Observatory"""
@@ -18,9 +21,9 @@ def weather_warning(lang='UC'):
     if lang in ['UC', 'EN']:
         try:
             if lang == 'UC':
-                data = requests.get(BASE_URL + URL_UC)
+                data = cached_get(BASE_URL + URL_UC)
             if lang == 'EN':
-                data = requests.get(BASE_URL + URL_EN)
+                data = cached_get(BASE_URL + URL_EN)
             data_2 = json.loads(data.text.replace('var weather_warning_summary = ', '')[:-2] + '}')
             response['result'] = data_2
             response['status'] = 1
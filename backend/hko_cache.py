@@ -0,0 +1,536 @@
+"""A module to cache responses from Hong Kong Observatory"""
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+import hko_client
+from shared_cache import SQLiteStore
+
+
+# Seconds a response stays fresh, chosen by the first URL fragment that
+# matches. The language is part of every HKO URL, so the URL alone tells the
+# English and Chinese versions of a feed apart.
+TTL_POLICIES = [
+    ('wxinfo/json/warnsum', 60),                  # weather warnings
+    ('locspc/android_data/rainfallnowcast/', 300),
+    ('locspc/android_data/earthquake/', 300),
+    ('locspc/android_data/gridData/', 600),       # local weather by grid
+    ('locspc/android_data/myobservatory_regionalweather', 600),
+    ('locspc/android_data/fmar', 1800),           # marine forecast
+    ('locspc/android_data/sccw_json', 1800),      # south China coastal waters
+    ('locspc/android_data/fnd_', 3600),           # 9-day forecast
+    ('forecaster_blog/', 3600),
+    ('_wwi', 3600),                               # major city forecasts
+    ('locspc/android_data/fuv', 86400),           # UV index
+    ('locspc/android_data/astro_tide', 86400),
+    ('locspc/android_data/lunar_date', 86400),
+]
+DEFAULT_TTL = 300
+# Seconds between checks while another process fetches a feed for the first time
+POLL_INTERVAL = 0.05
+# Parsed results kept per fetcher, for different arguments
+MEMO_SIZE = 64
+
+
+def _validators(previous):
+    """Build the headers that ask HKO to answer 304 if previous is still current"""
+    headers = {}
+    previous_headers = getattr(previous, 'headers', None) or {}
+    if 'ETag' in previous_headers:
+        headers['If-None-Match'] = previous_headers['ETag']
+    if 'Last-Modified' in previous_headers:
+        headers['If-Modified-Since'] = previous_headers['Last-Modified']
+    return headers
+
+
+class SingleFlight(object):
+    """Coalesce concurrent calls with the same key into one
+
+    The first caller for a key runs the call; callers arriving while it is
+    in flight wait for it and get the same return value, or the same
+    exception, instead of running it again.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def do(self, key, func, *args):
+        """Run func(*args), or wait for the call already running under key"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'done': threading.Event()}
+            else:
+                self.shared += 1
+        if not leader:
+            call['done'].wait()
+            if 'error' in call:
+                raise call['error']
+            return call['result']
+        try:
+            call['result'] = func(*args)
+            return call['result']
+        except BaseException as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+
+
+class ResponseCache(object):
+    """A thread-safe LRU cache of HTTP responses with per-feed TTLs
+
+    Only successful responses are stored. Expired entries are refetched on
+    the next request for them, with the ETag and Last-Modified validators of
+    the expired response: when HKO answers 304 Not Modified, the expired
+    response object is stored again as it is, so fetchers can keep what
+    they parsed from it. Refetching happens at once, unless stale_while_revalidate is set: then an
+    entry expired for less than one more TTL is still returned at once while
+    a background thread refetches it.
+
+    With a shared store, such as shared_cache.SQLiteStore, every process
+    reads the responses the others stored before fetching, and a refresh
+    lock in the store lets exactly one process fetch an expired feed while
+    the rest keep answering from the previous response.
+
+    Args:
+        maxsize (int): The most responses kept before the least recently
+            used one is evicted
+        policies (list): (URL fragment, TTL in seconds) pairs
+        default_ttl (int): The TTL of URLs no policy matches
+        clock (function): Returns the current time in seconds
+        stale_while_revalidate (bool): Serve recently expired entries while
+            they are refreshed in the background
+        shared: A store shared with other processes, or None
+    """
+
+    def __init__(self, maxsize=256, policies=TTL_POLICIES, default_ttl=DEFAULT_TTL, clock=time.monotonic,
+                 stale_while_revalidate=False, shared=None):
+        self.maxsize = maxsize
+        self.policies = policies
+        self.default_ttl = default_ttl
+        self.clock = clock
+        self.stale_while_revalidate = stale_while_revalidate
+        self.shared = shared
+        self._flights = SingleFlight()
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._listeners = []
+        self._notices = queue.Queue()
+        self._notifier = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.shared_hits = 0
+        self.not_modified = 0
+        self.bytes_saved = 0
+
+    def ttl(self, url):
+        """Return how many seconds a response from url stays fresh"""
+        for fragment, ttl in self.policies:
+            if fragment in url:
+                return ttl
+        return self.default_ttl
+
+    def get(self, url):
+        """Return the response for url, fetching it if it is missing or expired
+
+        Threads that miss the same URL at the same time wait for a single
+        fetch.
+
+        Args:
+            url (str): The full URL to fetch
+
+        Returns:
+            requests.Response: The cached or freshly fetched response
+
+        Raises:
+            requests.exceptions.RequestException: If the fetch fails
+        """
+        response = self._lookup(url)
+        if response is None:
+            # Concurrent misses for the same URL share one fetch
+            response = self._flights.do(url, self._fill, url)
+        return response
+
+    def _fill(self, url):
+        response = self._from_shared(url)
+        if response is None:
+            response = self.refresh(url)
+        return response
+
+    async def get_async(self, url):
+        """The asyncio counterpart of get, fetching misses without blocking
+
+        Misses are not coordinated with other processes: a shared response is
+        used if it is fresh, otherwise this process fetches its own.
+        """
+        response = self._lookup(url)
+        if response is None:
+            response = self._from_shared(url)
+        if response is None:
+            previous, headers = self._previous(url)
+            response = self._received(url, await hko_client.get_async(url, headers or None), previous)
+        return response
+
+    def peek(self, url):
+        """Return the response get would answer from memory, or None instead of fetching"""
+        return self._lookup(url, count_miss=False)
+
+    def _lookup(self, url, count_miss=True):
+        """Return the fresh (or servable stale) response for url, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(url)
+            now = self.clock()
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(url)
+                self.hits += 1
+                return entry[1]
+            if entry is not None and self.stale_while_revalidate and entry[0] + self.ttl(url) > now:
+                self._entries.move_to_end(url)
+                self.stale_hits += 1
+                if url not in self._refreshing:
+                    self._refreshing.add(url)
+                    threading.Thread(target=self._revalidate, args=(url,), daemon=True).start()
+                return entry[1]
+            if count_miss:
+                self.misses += 1
+        return None
+
+    def _revalidate(self, url):
+        try:
+            if self._from_shared(url) is None:
+                self.refresh(url)
+        except requests.exceptions.RequestException:
+            pass  # keep serving the stale entry until it runs out
+        finally:
+            with self._lock:
+                self._refreshing.discard(url)
+
+    def _from_shared(self, url, max_age=None):
+        """Return the response for url another process stored, if it is fresh
+
+        It is then cached here until it expires in the shared store.
+
+        Args:
+            url (str): The full URL
+            max_age (float): Only use a response stored less than this many
+                seconds ago
+        """
+        if self.shared is None:
+            return None
+        entry = self.shared.get(url)
+        now = self.shared.clock()
+        if entry is None or entry.expires <= now or (max_age is not None and now - entry.stored >= max_age):
+            return None
+        with self._lock:
+            self.shared_hits += 1
+        self._store(url, entry.response, entry.expires - now)
+        return entry.response
+
+    def refresh(self, url, max_age=None):
+        """Fetch url now and store the response if it is successful
+
+        With a shared store only the process holding the refresh lock of url
+        fetches it; the others return the previous shared response, or wait
+        for the first one if there is none yet.
+
+        Args:
+            url (str): The full URL to fetch
+            max_age (float): With a shared store, use a response another
+                process stored less than this many seconds ago instead
+
+        Returns:
+            requests.Response: The fresh response
+
+        Raises:
+            requests.exceptions.RequestException: If the fetch fails
+        """
+        if self.shared is None:
+            return self._fetch(url)
+        if max_age is not None:
+            response = self._from_shared(url, max_age)
+            if response is not None:
+                return response
+        if self.shared.acquire(url):
+            try:
+                return self._fetch(url)
+            finally:
+                self.shared.release(url)
+        entry = self.shared.get(url)
+        if entry is not None:
+            return entry.response
+        while self.shared.locked(url):
+            time.sleep(POLL_INTERVAL)
+        response = self._from_shared(url)
+        # The other process failed to fetch it, so try once more here
+        return response if response is not None else self._fetch(url)
+
+    def _fetch(self, url):
+        previous, headers = self._previous(url)
+        response = hko_client.get(url, headers=headers) if headers else hko_client.get(url)
+        return self._received(url, response, previous)
+
+    def _previous(self, url):
+        """Return the last response stored for url, even if it has expired,
+        and the validator headers to revalidate it, if it has any"""
+        with self._lock:
+            entry = self._entries.get(url)
+        headers = _validators(entry[1]) if entry is not None else {}
+        return (entry[1] if headers else None), headers
+
+    def _received(self, url, response, previous):
+        """Store a fetched response, keeping the previous one if it was not modified"""
+        if previous is not None and response.status_code == 304:
+            with self._lock:
+                self.not_modified += 1
+                self.bytes_saved += len(previous.content)
+            response = previous
+        if response.ok:
+            self.put(url, response)
+        return response
+
+    def put(self, url, response):
+        """Store a response for url for the TTL of its feed
+
+        It is also written to the shared store, if there is one. Listeners
+        added with subscribe are then told whether the body differs from the
+        one stored before.
+        """
+        if self.shared is not None:
+            self.shared.set(url, response, self.ttl(url))
+        self._store(url, response, self.ttl(url))
+
+    def _store(self, url, response, ttl):
+        with self._lock:
+            previous = self._entries.get(url)
+            self._entries[url] = (self.clock() + ttl, response)
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            if not self._listeners:
+                return
+            # Started on first use, so a server that forks after importing
+            # the app starts one in every worker
+            if self._notifier is None or not self._notifier.is_alive():
+                self._notifier = threading.Thread(target=self._notify, name='hko-cache-listeners', daemon=True)
+                self._notifier.start()
+        changed = previous is None or previous[1].content != response.content
+        self._notices.put((url, changed))
+
+    def _notify(self):
+        """Tell the listeners about each response stored, in order
+
+        Listeners run on this thread rather than the one that stored the
+        response, which may itself be waiting on work a listener starts.
+        """
+        while True:
+            url, changed = self._notices.get()
+            with self._lock:
+                listeners = list(self._listeners)
+            for listener in listeners:
+                try:
+                    listener(url, changed)
+                except Exception:
+                    # A failing listener must not stop the others, or later notices
+                    pass
+            self._notices.task_done()
+
+    def drain(self):
+        """Wait until the listeners have been told of every response stored so far"""
+        self._notices.join()
+
+    def fresh(self, url):
+        """Return whether a response for url is stored and has not expired"""
+        with self._lock:
+            entry = self._entries.get(url)
+            return entry is not None and entry[0] > self.clock()
+
+    def subscribe(self, listener):
+        """Call listener(url, changed) after every response stored
+
+        The listener runs on a thread of the cache, never the thread that
+        stored the response; drain waits for it.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def clear(self):
+        """Drop every cached response and reset the statistics"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.stale_hits = self.misses = self.evictions = self.shared_hits = 0
+            self.not_modified = self.bytes_saved = 0
+            self._flights.shared = 0
+
+    def stats(self):
+        """Return the hit, miss and eviction counts and the current size"""
+        with self._lock:
+            return {'hits': self.hits, 'stale_hits': self.stale_hits, 'misses': self.misses,
+                    'shared_hits': self.shared_hits, 'coalesced': self._flights.shared, 'evictions': self.evictions,
+                    'not_modified': self.not_modified, 'bytes_saved': self.bytes_saved,
+                    'size': len(self._entries), 'maxsize': self.maxsize}
+
+
+# Set HKO_SHARED_CACHE to a file path to share responses between the worker
+# processes of one host
+CACHE = ResponseCache(stale_while_revalidate=True,
+                      shared=SQLiteStore(os.environ['HKO_SHARED_CACHE']) if os.environ.get('HKO_SHARED_CACHE') else None)
+
+# Responses (or fetch errors) gathered by prefetch, visible only to the
+# call made inside the prefetched block
+_PREFETCHED = contextvars.ContextVar('prefetched', default=None)
+# The (URL, response) pairs read by the single_flight fetcher running now
+_READS = contextvars.ContextVar('reads', default=None)
+
+
+def single_flight(func):
+    """Let calls of a fetcher with the same arguments share one parsed result
+
+    Callers arriving while a call with the same arguments is in flight wait
+    for it and share its result. Later calls share it too, without parsing
+    again, as long as the cache still serves the very response objects the
+    call read, including once they were revalidated by a 304 Not Modified.
+    Each caller gets its own copy of the shared result (see _copy), so one
+    that modifies it changes nothing for the others. Calls answered from
+    prefetched responses run on their own, as they make no request.
+    """
+    flights = SingleFlight()
+    memos = OrderedDict()
+    lock = threading.Lock()
+
+    def run(key, args, kwargs):
+        with lock:
+            memo = memos.get(key)
+        if memo is not None and _unchanged(memo[0]):
+            _record(memo[0])
+            return memo[1]
+        reads = []
+        token = _READS.set(reads)
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            _READS.reset(token)
+            _record(reads)
+        if all(response is not None for _, response in reads):
+            with lock:
+                memos[key] = (tuple(reads), result)
+                memos.move_to_end(key)
+                while len(memos) > MEMO_SIZE:
+                    memos.popitem(last=False)
+        return result
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _PREFETCHED.get() is not None:
+            return func(*args, **kwargs)
+        key = (args, tuple(sorted(kwargs.items())))
+        return _copy(flights.do(key, run, key, args, kwargs))
+
+    wrapper.flights = flights
+    return wrapper
+
+
+def _copy(value):
+    """Copy the dicts and lists of a fetcher's result, sharing everything else
+
+    Results are built from dicts, lists and immutable values such as strings,
+    numbers and namedtuples, so this copies as much as copy.deepcopy at a
+    fraction of the cost.
+    """
+    if type(value) is dict:
+        return {key: _copy(item) for key, item in value.items()}
+    if type(value) is list:
+        return [_copy(item) for item in value]
+    return value
+
+
+def _record(reads):
+    """Add the responses a fetcher read to those of the fetcher calling it, if any"""
+    outer = _READS.get()
+    if outer is not None:
+        outer.extend(reads)
+
+
+def _unchanged(reads):
+    """Return whether the cache still answers every URL with the response read before
+
+    Only responses in memory are compared; anything else means the fetcher
+    has to run, and fetch, again.
+    """
+    return all(CACHE.peek(url) is response for url, response in reads)
+
+
+def cached_get(url):
+    """Fetch url through the shared response cache"""
+    responses = _PREFETCHED.get()
+    if responses is not None and url in responses:
+        if isinstance(responses[url], Exception):
+            raise responses[url]
+        return responses[url]
+    reads = _READS.get()
+    try:
+        response = CACHE.get(url)
+    except Exception:
+        if reads is not None:
+            reads.append((url, None))
+        raise
+    if reads is not None:
+        reads.append((url, response))
+    return response
+
+
+async def prefetch(urls):
+    """Fetch several URLs concurrently through the shared response cache
+
+    Returns:
+        dict: The response, or the exception raised fetching it, for each URL
+    """
+    responses = await asyncio.gather(*(CACHE.get_async(url) for url in urls), return_exceptions=True)
+    return dict(zip(urls, responses))
+
+
+@contextlib.contextmanager
+def prefetched(responses):
+    """Make cached_get answer from prefetched responses inside the block"""
+    token = _PREFETCHED.set(responses)
+    try:
+        yield
+    finally:
+        _PREFETCHED.reset(token)
+
+
+async def run_prefetched(func, urls, *args):
+    """Run a synchronous fetcher without blocking the event loop
+
+    The URLs the fetcher reads are fetched concurrently first, so when it
+    runs every cached_get it makes is answered from memory, and fetch errors
+    are raised where it expects them.
+
+    Args:
+        func (function): A fetcher such as weather_data.uv_index
+        urls (list): Every URL func will request for these arguments
+        *args: The arguments for func
+
+    Returns:
+        The return value of func
+    """
+    with prefetched(await prefetch(urls)):
+        return func(*args)
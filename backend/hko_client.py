@@ -0,0 +1,212 @@
+"""A module to send HTTP requests to Hong Kong Observatory over a shared connection pool"""
+
+import asyncio
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+RETRIES = 2
+BACKOFF = 0.3
+POOL_SIZE = 16
+MAX_CONCURRENCY = 16
+# The longest a fetch can take: every attempt timing out while connecting
+# and then reading, with the backoff between attempts
+MAX_FETCH_TIME = (RETRIES + 1) * (CONNECT_TIMEOUT + READ_TIMEOUT) + sum(BACKOFF * 2 ** i for i in range(RETRIES))
+
+
+class HKOClient(object):
+    """A pooled, keep-alive HTTP client for Hong Kong Observatory feeds
+
+    Connections are reused across requests and threads, every request has a
+    connect and read timeout, failed connections and 5xx responses are
+    retried a bounded number of times with exponential backoff, and no more
+    than max_concurrency requests are in flight at once.
+
+    Args:
+        timeout (tuple): (connect, read) timeouts in seconds
+        retries (int): How many times a failed request is retried
+        backoff (float): Backoff factor between retries, in seconds
+        pool_size (int): Connections kept open per host
+        max_concurrency (int): The most requests in flight at once
+    """
+
+    def __init__(self, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), retries=RETRIES, backoff=BACKOFF,
+                 pool_size=POOL_SIZE, max_concurrency=MAX_CONCURRENCY):
+        self.timeout = timeout
+        retry = Retry(total=retries, connect=retries, read=retries, status=retries,
+                      backoff_factor=backoff, status_forcelist=(500, 502, 503, 504),
+                      allowed_methods=frozenset(['GET', 'HEAD']), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def get(self, url, **kwargs):
+        """Send a GET request
+
+        Args:
+            url (str): The full URL to fetch
+            **kwargs: Passed on to requests.Session.get
+
+        Returns:
+            requests.Response: The response
+
+        Raises:
+            requests.exceptions.RequestException: If the request fails or
+                times out after every retry
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        with self._slots:
+            return self.session.get(url, **kwargs)
+
+    def close(self):
+        """Close every pooled connection"""
+        self.session.close()
+
+
+class AsyncHKOClient(object):
+    """The asyncio counterpart of HKOClient, built on httpx
+
+    It has the same timeouts, retry policy and concurrency cap, and returns
+    requests.Response objects and raises requests exceptions, so callers and
+    the response cache treat both clients alike.
+
+    The client owns one event loop, run on a daemon thread, and one httpx
+    connection pool on that loop. Coroutines awaiting get on any other loop
+    have their requests sent from the client's loop, so an asyncio.run per
+    call and the threads of the Flask app (through run) all share the same
+    keep-alive connections. The loop is started on first use in each
+    process, so a server that forks after importing the app starts one in
+    every worker, and httpx is only imported then.
+    """
+
+    def __init__(self, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), retries=RETRIES, backoff=BACKOFF,
+                 pool_size=POOL_SIZE, max_concurrency=MAX_CONCURRENCY):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.max_concurrency = max_concurrency
+        self._loop = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        """Return the event loop of this process, starting it and its pool if needed"""
+        with self._lock:
+            if self._pid != os.getpid():
+                import httpx
+
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def serve():
+                    asyncio.set_event_loop(loop)
+                    timeout = httpx.Timeout(self.timeout[1], connect=self.timeout[0])
+                    limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+                    self._client = httpx.AsyncClient(timeout=timeout, limits=limits)
+                    self._slots = asyncio.Semaphore(self.max_concurrency)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                threading.Thread(target=serve, name='hko-aio', daemon=True).start()
+                ready.wait()
+                self._loop, self._pid = loop, os.getpid()
+            return self._loop
+
+    def run(self, coroutine):
+        """Run a coroutine on the client's event loop and wait for its result
+
+        For synchronous callers, such as a Flask request thread; it must not
+        be called from the client's own loop, which would wait on itself.
+        """
+        loop = self._start()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            coroutine.close()
+            raise RuntimeError('AsyncHKOClient.run called from its own event loop')
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+    async def get(self, url, headers=None):
+        """Send a GET request
+
+        Args:
+            url (str): The full URL to fetch
+            headers (dict): Extra request headers
+
+        Returns:
+            requests.Response: The response
+
+        Raises:
+            requests.exceptions.RequestException: If the request fails or
+                times out after every retry
+        """
+        loop = self._start()
+        if asyncio.get_running_loop() is loop:
+            return await self._get(url, headers)
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._get(url, headers), loop))
+
+    async def _get(self, url, headers):
+        import httpx
+
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            try:
+                async with self._slots:
+                    reply = await self._client.get(url, headers=headers)
+            except httpx.TimeoutException as e:
+                if last:
+                    raise requests.exceptions.Timeout(str(e))
+            except httpx.HTTPError as e:
+                if last:
+                    raise requests.exceptions.ConnectionError(str(e))
+            else:
+                if last or reply.status_code not in (500, 502, 503, 504):
+                    return _to_requests_response(reply)
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    def close(self):
+        """Close the connection pool and stop the event loop of this process"""
+        with self._lock:
+            loop, self._loop, self._pid = self._loop, None, None
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+
+
+def _to_requests_response(reply):
+    """Convert an httpx response into the requests.Response the fetchers parse"""
+    response = requests.Response()
+    response.status_code = reply.status_code
+    response.headers = CaseInsensitiveDict(reply.headers)
+    response._content = reply.content
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.url = str(reply.url)
+    response.reason = reply.reason_phrase
+    return response
+
+
+CLIENT = HKOClient()
+ASYNC_CLIENT = AsyncHKOClient()
+
+
+def get(url, **kwargs):
+    """Send a GET request through the shared client"""
+    return CLIENT.get(url, **kwargs)
+
+
+async def get_async(url, headers=None):
+    """Send a GET request through the shared asyncio client"""
+    return await ASYNC_CLIENT.get(url, headers)
+
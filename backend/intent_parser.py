@@ -0,0 +1,189 @@
+"""A module to read the intent and slots of a chat message in one pass"""
+
+import re
+from collections import namedtuple
+
+
+GREETINGS = ['hi', 'hello', 'hey', 'good morning', 'good afternoon', 'good evening']
+WEATHER_KEYWORDS = ['weather', 'temperature', 'rain', 'humidity', 'uv', 'forecast', 'wind']
+
+# Slot values in priority order: when a message names several, the first wins
+PERIODS = [
+    ('3day', ['3 day', '3-day', '3day']),
+    ('2day', ['2 day', '2-day', '2day']),
+    ('tomorrow', ['tomorrow']),
+    ('today', ['today']),
+]
+INFO_TYPES = [
+    ('wind', ['wind']),
+    ('temperature', ['temperature']),
+    ('humidity', ['humidity']),
+    ('uv', ['uv']),
+    ('overall', ['overall', 'general']),
+]
+
+Intent = namedtuple('Intent', ['greeting', 'district', 'period', 'info_type', 'weather_query', 'info_requested'])
+Intent.__doc__ = """What a chat message asks for
+
+greeting and weather_query tell whether the message contains a greeting or a
+weather keyword; district and period are None when the message names none,
+info_type defaults to 'overall', and info_requested tells whether an info
+type was named at all.
+"""
+
+
+def _trie_pattern(words):
+    """Build a regular expression matching the longest of words at a position
+
+    The words are merged into a trie, so the regex engine follows one branch
+    per character instead of trying every word in turn.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Greedy: a longer word is tried before the shorter one it extends
+        return '(?:' + body + ')?' if '' in node else body
+
+    return build(trie)
+
+
+def _mask_within(phrase, phrases):
+    """OR together the bits of every phrase that occurs inside phrase"""
+    mask = 0
+    for other, bits in phrases.items():
+        if other in phrase:
+            mask |= bits
+    return mask
+
+
+def _outermost(spans):
+    """OR together the bits of every (start, end, bits) span not inside a longer one"""
+    merged = {}
+    for start, end, bits in spans:
+        merged[start, end] = merged.get((start, end), 0) | bits
+    mask = 0
+    reach = -1
+    # By start, longest first: a span is inside a longer one iff one listed
+    # before it reaches as far
+    for (start, end), bits in sorted(merged.items(), key=lambda item: (item[0][0], -item[0][1])):
+        if end > reach:
+            mask |= bits
+            reach = end
+    return mask
+
+
+def _spans_within(phrase, phrases, mask):
+    """Find where the phrases with bits in mask occur inside phrase
+
+    Returns:
+        tuple: (start, end, bits) of each occurrence not inside a longer one
+    """
+    spans = []
+    for other, bits in phrases.items():
+        if bits & mask:
+            start = phrase.find(other)
+            while start != -1:
+                spans.append((start, start + len(other), bits & mask))
+                start = phrase.find(other, start + 1)
+    return tuple(span for span in spans
+                 if not any(o[0] <= span[0] and span[1] <= o[1] and o[1] - o[0] > span[1] - span[0]
+                            for o in spans))
+
+
+class IntentParser(object):
+    """Find every keyword, district and slot value of a message in one scan
+
+    All phrases are compiled into a single regular expression that, at each
+    position of the message, matches the longest phrase starting there. Each
+    phrase maps to a bitmask of the slot values it stands for, including
+    those of every shorter phrase it contains, so OR-ing the masks of the
+    matches gives the same answers as checking every phrase as a substring,
+    however many district aliases there are. Districts are the exception:
+    each phrase also records where district names occur inside it, and a
+    name inside a longer name, such as 'tai po' in 'tai po kau', is dropped.
+
+    Args:
+        districts (dict): Maps a district name to a list of its aliases, in
+            priority order; the name itself always counts as an alias
+    """
+
+    def __init__(self, districts):
+        self._slots = {'greeting': [], 'weather': [], 'info': [], 'district': [], 'period': [], 'info_type': []}
+        phrases = {}
+
+        def add(slot, value, words):
+            bit = 1 << sum(len(values) for values in self._slots.values())
+            self._slots[slot].append((value, bit))
+            for word in words:
+                phrases[word] = phrases.get(word, 0) | bit
+
+        add('greeting', True, GREETINGS)
+        add('weather', True, WEATHER_KEYWORDS)
+        add('info', True, [word for _, words in INFO_TYPES for word in words])
+        for name, aliases in districts.items():
+            add('district', name, [name] + [alias.lower() for alias in aliases])
+        for period, words in PERIODS:
+            add('period', period, words)
+        for info_type, words in INFO_TYPES:
+            add('info_type', info_type, words)
+
+        self._any = {slot: sum(bit for _, bit in values) for slot, values in self._slots.items()}
+        districts = self._any['district']
+        self._masks = {phrase: _mask_within(phrase, phrases) & ~districts for phrase in phrases}
+        self._spans = {phrase: spans for phrase, spans in
+                       ((phrase, _spans_within(phrase, phrases, districts)) for phrase in phrases) if spans}
+        self._named = {phrase: _outermost(spans) for phrase, spans in self._spans.items()}
+        self._values = {bit: value for values in self._slots.values() for value, bit in values}
+        self._regex = re.compile('(?=(' + _trie_pattern(phrases) + '))')
+
+    def _first(self, slot, mask, default=None):
+        # Bits are handed out in priority order, so the lowest set bit wins
+        mask &= self._any[slot]
+        return self._values[mask & -mask] if mask else default
+
+    def parse(self, text):
+        """Read the intent and slots of a message
+
+        Args:
+            text (str): The message, in any case
+
+        Returns:
+            Intent: What the message asks for
+        """
+        text = text.lower()
+        mask = 0
+        masks = self._masks
+        named = []
+        for phrase in self._regex.findall(text):
+            mask |= masks[phrase]
+            if phrase in self._spans:
+                named.append(phrase)
+        if len(named) == 1:
+            mask |= self._named[named[0]]
+        elif named:
+            # Names found in several places may overlap: find out where
+            spans = []
+            for match in self._regex.finditer(text):
+                phrase = match.group(1)
+                if phrase in self._spans:
+                    start = match.start()
+                    spans.extend((start + i, start + j, bits) for i, j, bits in self._spans[phrase])
+            mask |= _outermost(spans)
+        return Intent(
+            greeting=bool(mask & self._any['greeting']),
+            district=self._first('district', mask),
+            period=self._first('period', mask),
+            info_type=self._first('info_type', mask, 'overall'),
+            weather_query=bool(mask & self._any['weather']),
+            info_requested=bool(mask & self._any['info']),
+        )
+
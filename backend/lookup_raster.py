@@ -0,0 +1,271 @@
+"""A module to answer nearest grid point and rainfall nowcast point lookups
+from a table precomputed over Hong Kong
+
+    python lookup_raster.py
+
+rebuilds assets/lookup_raster.bin from the compact grid and rainfall assets;
+run it after `python compact_assets.py` whenever those change.
+
+The table covers every location within 10 km of a grid or nowcast point with
+square cells of STEP degrees, one layer for each kind of point. A cell holds
+one of:
+
+    a point index   every location in the cell has that point's grid and
+                    name (or, for nowcast points, that point) as its nearest,
+                    and it is within 10 km
+    OUT_OF_RANGE    no location in the cell is within 10 km of any point
+    a candidate set the few points that can be nearest to some location in
+                    the cell, found by comparing the exact distance to each
+
+A file is a header, then for each layer a small header, the cells (uint16,
+row by row from the south-west corner), the offsets of the candidate sets
+(uint32) and their members (uint16), all little-endian. The header records
+the CRC-32 of the compact assets it was built from, and loading a table
+built from other assets fails.
+"""
+
+import math
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+
+from compact_assets import ASSETS, PointTable, read_column
+from distance_calculation import distance_calculation, distance_matrix
+
+
+MAGIC = b'HKOR'
+VERSION = 1
+HEADER = struct.Struct('<4sHxxdddIII')
+LAYER = struct.Struct('<III')
+
+# Degrees per cell side, about 200 m
+STEP = 0.002
+# Points further than this many km are out of range of a location
+MAX_DISTANCE = 10
+# Degrees the table extends past the points; a location outside it is more
+# than MAX_DISTANCE from all of them
+MARGIN = 0.11
+OUT_OF_RANGE = 0xFFFF
+
+SOURCES = ('grid_location.bin', 'rainfall_nowcast_mapping.bin')
+LAYERS = ('grid', 'nowcast')
+
+
+def checksum(paths):
+    """Return the CRC-32 of the files the table is built from"""
+    crc = 0
+    for path in paths:
+        with open(path, 'rb') as f:
+            crc = zlib.crc32(f.read(), crc)
+    return crc
+
+
+class LookupRaster(object):
+    """Nearest grid point and nowcast point lookups in constant time
+
+    Finding the cell of a location takes two divisions. Most cells hold the
+    answer; the rest hold the two to a dozen points that could be nearest,
+    and only those are compared. The answers are exactly those of
+    spatial_index.GRID_INDEX and RAINFALL_INDEX. The table is memory-mapped
+    and read-only, so threads and forked workers share it.
+
+    Args:
+        path (str): The table, as written by build
+        grid (PointTable): The grid points it was built from
+        nowcast (PointTable): The rainfall nowcast points it was built from
+        sources (list): The compact asset files of grid and nowcast
+
+    Raises:
+        ValueError: If path is not a table, or was built from other assets
+    """
+
+    def __init__(self, path, grid, nowcast, sources):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.lat0, self.lng0, self.step, self.rows, self.cols, crc = \
+            HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('{} is not a version {} lookup table'.format(path, VERSION))
+        if crc != checksum(sources):
+            raise ValueError('{} is out of date, run `python lookup_raster.py`'.format(path))
+        view = memoryview(self._map)
+        offset = HEADER.size
+        self._layers = {}
+        for name, points in zip(LAYERS, (grid, nowcast)):
+            count, sets, members = LAYER.unpack_from(self._map, offset)
+            if count != len(points):
+                raise ValueError('{} was built for {} {} points'.format(path, count, name))
+            cells, offset = read_column(view, offset + LAYER.size, 'H', self.rows * self.cols)
+            starts, offset = read_column(view, offset, 'I', sets + 1)
+            indexes, offset = read_column(view, offset, 'H', members)
+            self._layers[name] = (points, cells, starts, indexes)
+
+    def _nearest(self, layer, lat, lng):
+        """Find the point nearest to a location, or one as good for the layer
+
+        Returns:
+            tuple: The point and its distance in km, the point and None when
+                the cell guarantees it is in range, or (None, None) when no
+                point is in range
+        """
+        row = int((lat - self.lat0) // self.step)
+        col = int((lng - self.lng0) // self.step)
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            return None, None
+        points, cells, starts, indexes = self._layers[layer]
+        cell = cells[row * self.cols + col]
+        if cell == OUT_OF_RANGE:
+            return None, None
+        if cell < len(points):
+            return points[cell], None
+        best = None
+        cell -= len(points)
+        for index in indexes[starts[cell]:starts[cell + 1]]:
+            point = points[index]
+            distance = distance_calculation(lat, lng, point.lat, point.lng)
+            if best is None or distance < best[1]:
+                best = (point, distance)
+        return best
+
+    def grid(self, lat, lng):
+        """Find the grid of a location, as local_weather does
+
+        Args:
+            lat (float): Latitude
+            lng (float): Longitude
+
+        Returns:
+            tuple: The grid id and place name of the nearest grid point, or
+                (None, None) if no grid point is within 10 km
+        """
+        point, distance = self._nearest('grid', lat, lng)
+        if point is None or (distance is not None and not distance < MAX_DISTANCE):
+            return None, None
+        return point.grid, point.name
+
+    def nowcast_point(self, lat, lng):
+        """Find the rainfall nowcast point of a location, as rainfall_nowcast does
+
+        Args:
+            lat (float): Latitude
+            lng (float): Longitude
+
+        Returns:
+            NowcastPoint: The nearest nowcast point, or None if it is more
+                than 10 km away
+        """
+        point, distance = self._nearest('nowcast', lat, lng)
+        if point is None or (distance is not None and distance > MAX_DISTANCE):
+            return None
+        return point
+
+
+def _layer(points, groups, lat0, lng0, rows, cols, step):
+    """Fill the cells of one layer
+
+    Args:
+        points (Sequence): Records with lat and lng attributes
+        groups (list): For each point, what a lookup answers with; points
+            with the same group are interchangeable
+        lat0, lng0, rows, cols, step: The extent of the table
+
+    Returns:
+        tuple: The cells (array of uint16) and the candidate sets (list of
+            tuples of point indexes)
+    """
+    import numpy as np
+    from spatial_index import TOLERANCE
+
+    # Of points at the same location only the first listed is ever nearest
+    first = {}
+    for index, point in enumerate(points):
+        first.setdefault((point.lat, point.lng), index)
+    keep = np.array(sorted(first.values()))
+    lats = np.array([points[i].lat for i in keep])
+    lngs = np.array([points[i].lng for i in keep])
+    group_ids = {}
+    group = np.array([group_ids.setdefault(groups[i], len(group_ids)) for i in keep])
+
+    cells = np.full((rows, cols), OUT_OF_RANGE, dtype=np.uint16)
+    sets = {}
+    tile = 40
+    # A point further than this from a tile is more than 12 km from all of
+    # its cells, so it can be neither nearest nor in range
+    band = MARGIN + 0.01
+    for row in range(0, rows, tile):
+        for col in range(0, cols, tile):
+            cell_lats = lat0 + (np.arange(row, min(row + tile, rows)) + 0.5) * step
+            cell_lngs = lng0 + (np.arange(col, min(col + tile, cols)) + 0.5) * step
+            near = np.flatnonzero((lats > cell_lats[0] - band) & (lats < cell_lats[-1] + band) &
+                                  (lngs > cell_lngs[0] - band) & (lngs < cell_lngs[-1] + band))
+            if not len(near):
+                continue
+            centre_lat, centre_lng = (i.ravel() for i in np.meshgrid(cell_lats, cell_lngs, indexing='ij'))
+            # Half the cell's diagonal, towards the wider southern edge
+            radius = np.repeat([distance_calculation(lat, 0, lat - step / 2, step / 2) + 1e-6 for lat in cell_lats],
+                               len(cell_lngs))
+            distances = distance_matrix(np.column_stack([centre_lat, centre_lng]),
+                                        np.column_stack([lats[near], lngs[near]]))
+            best = distances.argmin(axis=1)
+            d1 = distances[np.arange(len(best)), best]
+            # Lookups compare distance_calculation, which is within
+            # TOLERANCE of these distances, so any point that can be nearest
+            # to some location in the cell is within this bound of its centre
+            candidates = distances <= (TOLERANCE ** 2 * (d1 + 2 * radius))[:, None]
+            same = np.where(candidates, group[near], len(group_ids)).min(axis=1) == \
+                np.where(candidates, group[near], -1).max(axis=1)
+            inside = TOLERANCE * (d1 + radius) < MAX_DISTANCE
+            outside = d1 / TOLERANCE - TOLERANCE * radius > MAX_DISTANCE
+            values = np.full(len(best), OUT_OF_RANGE, dtype=np.int64)
+            certain = same & inside
+            values[certain] = keep[near[best[certain]]]
+            for i in np.flatnonzero(~certain & ~outside):
+                members = tuple(int(j) for j in keep[near[candidates[i]]])
+                values[i] = len(points) + sets.setdefault(members, len(sets))
+            cells[row:row + tile, col:col + tile] = values.reshape(len(cell_lats), len(cell_lngs))
+    if len(points) + len(sets) >= OUT_OF_RANGE:
+        raise ValueError('too many candidate sets for uint16 cells, use a finer STEP')
+    return array('H', cells.ravel().tolist()), list(sets)
+
+
+def build(grid, nowcast, crc, step=STEP):
+    """Compute the table for the given points
+
+    Args:
+        grid (Sequence): GridPoint records
+        nowcast (Sequence): NowcastPoint records
+        crc (int): The checksum of the assets they were read from
+        step (float): Degrees per cell side
+
+    Returns:
+        bytes: The encoded table
+    """
+    everything = list(grid) + list(nowcast)
+    lat0 = math.floor((min(i.lat for i in everything) - MARGIN) / step) * step
+    lng0 = math.floor((min(i.lng for i in everything) - MARGIN) / step) * step
+    rows = math.ceil((max(i.lat for i in everything) + MARGIN - lat0) / step)
+    cols = math.ceil((max(i.lng for i in everything) + MARGIN - lng0) / step)
+    parts = [HEADER.pack(MAGIC, VERSION, lat0, lng0, step, rows, cols, crc)]
+    for points, groups in ((grid, [(i.grid, i.name) for i in grid]), (nowcast, list(range(len(nowcast))))):
+        cells, sets = _layer(points, groups, lat0, lng0, rows, cols, step)
+        starts = array('I', [0])
+        for members in sets:
+            starts.append(starts[-1] + len(members))
+        indexes = array('H', (index for members in sets for index in members))
+        columns = [cells, starts, indexes]
+        if sys.byteorder == 'big':
+            for column in columns:
+                column.byteswap()
+        parts.append(LAYER.pack(len(points), len(sets), len(indexes)))
+        parts.extend(column.tobytes() for column in columns)
+    return b''.join(parts)
+
+
+if __name__ == "__main__":
+    sources = [ASSETS / name for name in SOURCES]
+    table = build(PointTable(sources[0]), PointTable(sources[1]), checksum(sources))
+    with open(ASSETS / 'lookup_raster.bin', 'wb') as f:
+        f.write(table)
+    print(f"lookup_raster.bin ({len(table)} bytes)")
@@ -0,0 +1,109 @@
+"""A module to keep hot Hong Kong Observatory feeds warm in the response cache"""
+
+import heapq
+import random
+import threading
+import time
+
+import requests
+
+import hko_cache
+import weather_data
+import spatial_index
+
+
+# Refresh each feed after this fraction of its TTL, so it never expires
+REFRESH_FRACTION = 0.8
+# Spread refreshes by up to this fraction of their cadence either way
+JITTER = 0.1
+# Seconds to wait before retrying a feed that failed to refresh
+RETRY_DELAY = 30
+
+
+def hot_urls(districts):
+    """List the URLs the chat answers read
+
+    Args:
+        districts (dict): Maps a district name to its 'lat' and 'lng'
+
+    Returns:
+        list: The warnings, 9-day forecast and UV URLs, and the grid data URL
+            of every district
+    """
+    urls = [weather_data.HKO_WEB_URL + weather_data.WEATHER_WARNING_URLS['EN'],
+            weather_data.HKO_PDA_URL + weather_data.FORECAST_URLS['EN'],
+            weather_data.HKO_PDA_URL + weather_data.UV_INDEX_URLS['EN']]
+    for coords in districts.values():
+        grid, _ = spatial_index.RASTER.grid(coords['lat'], coords['lng'])
+        url = weather_data.HKO_PDA_URL + weather_data.GRID_DATA_URL.format(grid)
+        if grid is not None and url not in urls:
+            urls.append(url)
+    return urls
+
+
+class RefreshScheduler(object):
+    """A background thread that refreshes cached feeds before they expire
+
+    Every URL is fetched as soon as the scheduler starts, then again after
+    REFRESH_FRACTION of its TTL, with jitter so feeds sharing a TTL do not
+    refresh in lockstep. A failed refresh is retried after RETRY_DELAY while
+    the cache keeps serving the previous response.
+
+    Args:
+        urls (list): The URLs to keep warm
+        fraction (float): The share of each TTL to wait between refreshes
+        jitter (float): The largest random change to a wait, as a fraction
+        retry_delay (float): Seconds to wait after a failed refresh
+    """
+
+    def __init__(self, urls, fraction=REFRESH_FRACTION, jitter=JITTER, retry_delay=RETRY_DELAY):
+        self.urls = list(urls)
+        self.fraction = fraction
+        self.jitter = jitter
+        self.retry_delay = retry_delay
+        self.refreshes = 0
+        self.failures = 0
+        self._queue = [(0, url) for url in self.urls]
+        self._stop = threading.Event()
+        self._thread = None
+
+    def cadence(self, url):
+        """Return the seconds to wait before refreshing url again"""
+        wait = hko_cache.CACHE.ttl(url) * self.fraction
+        return wait * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def refresh(self, url):
+        """Refresh one URL and return the seconds until its next refresh"""
+        # Another worker sharing the cache may have refreshed it already
+        max_age = hko_cache.CACHE.ttl(url) * self.fraction * (1 - self.jitter)
+        try:
+            if hko_cache.CACHE.refresh(url, max_age=max_age).ok:
+                self.refreshes += 1
+                return self.cadence(url)
+        except requests.exceptions.RequestException:
+            pass
+        self.failures += 1
+        return self.retry_delay
+
+    def _run(self):
+        while not self._stop.is_set():
+            due, url = self._queue[0]
+            wait = due - time.monotonic()
+            if wait > 0:
+                self._stop.wait(wait)
+                continue
+            heapq.heapreplace(self._queue, (time.monotonic() + self.refresh(url), url))
+
+    def start(self):
+        """Start refreshing in a daemon thread"""
+        if self._thread is None and self._queue:
+            self._thread = threading.Thread(target=self._run, name='hko-refresh', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop refreshing and wait for the thread to finish"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
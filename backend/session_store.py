@@ -0,0 +1,194 @@
+"""A module to remember chat conversations between requests"""
+
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from shared_cache import connection
+
+
+# Seconds a conversation is kept after its last message
+SESSION_TTL = 1800
+MAX_SESSIONS = 10000
+# The longest session id looked up; the ids handed out are 32 characters
+MAX_SESSION_ID = 64
+
+
+class MemoryBackend(object):
+    """A thread-safe in-memory LRU store whose entries expire after a TTL
+
+    Any object with the same get, set and delete methods can stand in for it,
+    e.g. SQLiteBackend, which shares sessions between processes.
+
+    Args:
+        maxsize (int): The most sessions kept before the least recently used
+            one is evicted
+        ttl (float): Seconds an entry is kept after it was last set
+        clock (function): Returns the current time in seconds
+    """
+
+    def __init__(self, maxsize=MAX_SESSIONS, ttl=SESSION_TTL, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the value stored under key, or None if it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        """Store value under key for another ttl seconds"""
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend(object):
+    """Sessions stored as JSON in an SQLite database in WAL mode, shared by
+    every process on the host that opens the same file
+
+    gunicorn hands each request to whichever worker accepts it, so the
+    follow-up turns of a conversation need a store all of them read. Like
+    shared_cache.SQLiteStore, it opens its connections with
+    shared_cache.connection, so it can be created before the workers are
+    forked.
+    The sessions saved longest ago are evicted first. Values are read back
+    with json.loads, never unpickled, so they must be plain JSON data, such
+    as the slots SessionStore keeps.
+
+    Args:
+        path (str): The database file, created if it does not exist
+        maxsize (int): The most sessions kept
+        ttl (float): Seconds an entry is kept after it was last set
+        clock (function): Returns the wall-clock time in seconds, which
+            every process must agree on
+    """
+
+    def __init__(self, path, maxsize=MAX_SESSIONS, ttl=SESSION_TTL, clock=time.time):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._local = threading.local()
+        db = self._connection()
+        db.execute('CREATE TABLE IF NOT EXISTS sessions (key TEXT PRIMARY KEY, expires REAL, value TEXT)')
+        db.execute('CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires)')
+
+    def _connection(self):
+        return connection(self._local, self.path)
+
+    def get(self, key):
+        """Return the value stored under key, or None if it is missing or expired"""
+        row = self._connection().execute(
+            'SELECT value FROM sessions WHERE key = ? AND expires > ?', (key, self.clock())).fetchone()
+        if row is None:
+            return None
+        try:
+            return json.loads(row[0])
+        except ValueError:
+            # Not JSON, e.g. written by an older version: start afresh
+            return None
+
+    def set(self, key, value):
+        """Store value under key for another ttl seconds"""
+        now = self.clock()
+        db = self._connection()
+        db.execute('INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)',
+                   (key, now + self.ttl, json.dumps(value)))
+        db.execute('DELETE FROM sessions WHERE expires <= ? OR key IN '
+                   '(SELECT key FROM sessions ORDER BY expires DESC LIMIT -1 OFFSET ?)', (now, self.maxsize))
+
+    def delete(self, key):
+        self._connection().execute('DELETE FROM sessions WHERE key = ?', (key,))
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+
+
+class Session(object):
+    """The state of one conversation
+
+    Only the slots are kept: the feeds an answer reads are held by the
+    response cache, which answers a follow-up's feeds without a request while
+    they are fresh.
+
+    Attributes:
+        id (str): The session id the client sends back with every message
+        slots (dict): The 'district', 'period' and 'info_type' resolved so far
+        stored (bool): Whether the conversation was read from the store
+        changed (bool): Whether the slots changed since it was read or started
+    """
+
+    def __init__(self, session_id, slots=None, stored=False):
+        self.id = session_id
+        self.slots = slots or {'district': None, 'period': None, 'info_type': None}
+        self.stored = stored
+        self.changed = False
+
+    def remember(self, district, period=None, info_type=None):
+        """Record the slots of the latest turn"""
+        slots = {'district': district, 'period': period, 'info_type': info_type}
+        if slots != self.slots:
+            self.slots = slots
+            self.changed = True
+
+
+class SessionStore(object):
+    """Conversations keyed by session id, kept in a pluggable backend
+
+    Args:
+        backend: An object with get, set and delete, such as SQLiteBackend,
+            MemoryBackend by default
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else MemoryBackend()
+
+    def get(self, session_id=None):
+        """Return the conversation with session_id, or start a new one
+
+        Args:
+            session_id (str): The id sent by the client, if any
+
+        Returns:
+            Session: The stored conversation, or a new one with a new id if
+                the id is missing, unknown or expired, or is not a string of
+                at most MAX_SESSION_ID characters
+        """
+        valid = isinstance(session_id, str) and 0 < len(session_id) <= MAX_SESSION_ID
+        slots = self.backend.get(session_id) if valid else None
+        if slots is None:
+            return Session(uuid.uuid4().hex)
+        return Session(session_id, slots, stored=True)
+
+    def save(self, session):
+        """Store a conversation worth keeping, restarting its TTL
+
+        A conversation is kept once it has slots to carry over. One that was
+        never stored and resolved nothing, such as a greeting or an anonymous
+        question that could not be answered, is not written at all.
+        """
+        if session.stored or session.changed:
+            self.backend.set(session.id, session.slots)
+            session.stored, session.changed = True, False
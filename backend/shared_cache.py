@@ -0,0 +1,136 @@
+"""A module to share cached Hong Kong Observatory responses between processes"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import hko_client
+
+
+# Seconds a refresh lock is held at most, so a worker that dies while
+# refreshing does not stop the others for long. It outlasts the slowest
+# fetch hko_client can make, so a lock never runs out while its holder is
+# still fetching and another worker fetches the same feed
+LOCK_TIMEOUT = hko_client.MAX_FETCH_TIME + 5
+# Seconds a connection waits for another process's write to finish
+BUSY_TIMEOUT = 15
+
+# A response stored by some process: when it was stored and when it expires
+# (wall-clock seconds), and the response itself
+SharedEntry = namedtuple('SharedEntry', ['stored', 'expires', 'response'])
+
+
+def connection(local, path, timeout=BUSY_TIMEOUT):
+    """Return the connection of this thread and process to an SQLite database
+    in WAL mode, opening it on first use
+
+    A connection is never shared between threads, nor used by a child
+    process that inherited it through fork, so stores built on this can be
+    created before gunicorn forks its workers.
+
+    Args:
+        local (threading.local): Where the store keeps its connections
+        path (str): The database file, created if it does not exist
+        timeout (float): Seconds to wait for another writer
+    """
+    pid = os.getpid()
+    if getattr(local, 'pid', None) != pid:
+        db = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        local.db, local.pid = db, pid
+    return local.db
+
+
+def _to_response(url, status, headers, body):
+    """Rebuild the requests.Response the fetchers parse from its stored parts"""
+    response = requests.Response()
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(json.loads(headers))
+    response._content = body
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.url = url
+    return response
+
+
+class SQLiteStore(object):
+    """Responses and refresh locks in an SQLite database in WAL mode
+
+    Every worker process on the host opens the same file. WAL mode lets
+    readers carry on while one writer stores a response, and each lock is a
+    row that at most one process can claim until it is released or times
+    out. Connections are opened per thread and per process (see
+    connection), so the store can be created before gunicorn forks its
+    workers.
+
+    Args:
+        path (str): The database file, created if it does not exist
+        lock_timeout (float): Seconds a refresh lock is held at most
+        clock (function): Returns the wall-clock time in seconds, which
+            every process must agree on
+    """
+
+    def __init__(self, path, lock_timeout=LOCK_TIMEOUT, clock=time.time):
+        self.path = path
+        self.lock_timeout = lock_timeout
+        self.clock = clock
+        self._local = threading.local()
+        self._id = uuid.uuid4().hex
+        db = self._connection()
+        db.execute('CREATE TABLE IF NOT EXISTS responses (url TEXT PRIMARY KEY, stored REAL, '
+                   'expires REAL, status INTEGER, headers TEXT, body BLOB)')
+        db.execute('CREATE TABLE IF NOT EXISTS locks (url TEXT PRIMARY KEY, owner TEXT, until REAL)')
+
+    def _connection(self):
+        return connection(self._local, self.path)
+
+    def _owner(self):
+        # One owner per store, process and thread, so a lock is only
+        # released by whoever claimed it
+        return '{}:{}:{}'.format(self._id, os.getpid(), threading.get_ident())
+
+    def get(self, url):
+        """Return the SharedEntry stored for url, expired or not, or None"""
+        row = self._connection().execute(
+            'SELECT stored, expires, status, headers, body FROM responses WHERE url = ?', (url,)).fetchone()
+        if row is None:
+            return None
+        return SharedEntry(row[0], row[1], _to_response(url, row[2], row[3], row[4]))
+
+    def set(self, url, response, ttl):
+        """Store a response for ttl seconds"""
+        now = self.clock()
+        self._connection().execute(
+            'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)',
+            (url, now, now + ttl, response.status_code, json.dumps(dict(response.headers)), response.content))
+
+    def acquire(self, url):
+        """Claim the refresh lock of url, returning whether this caller got it"""
+        now = self.clock()
+        cursor = self._connection().execute(
+            'INSERT INTO locks VALUES (?, ?, ?) ON CONFLICT(url) DO UPDATE '
+            'SET owner = excluded.owner, until = excluded.until WHERE locks.until <= ?',
+            (url, self._owner(), now + self.lock_timeout, now))
+        return cursor.rowcount == 1
+
+    def locked(self, url):
+        """Return whether some caller holds the refresh lock of url"""
+        row = self._connection().execute('SELECT until FROM locks WHERE url = ?', (url,)).fetchone()
+        return row is not None and row[0] > self.clock()
+
+    def release(self, url):
+        """Give up the refresh lock of url if this caller holds it"""
+        self._connection().execute('DELETE FROM locks WHERE url = ? AND owner = ?', (url, self._owner()))
+
+    def clear(self):
+        """Drop every stored response and lock"""
+        db = self._connection()
+        db.execute('DELETE FROM responses')
+        db.execute('DELETE FROM locks')
@@ -0,0 +1,242 @@
+"""A module to find the nearest Hong Kong Observatory grid point or rainfall
+nowcast station to a location"""
+
+import json
+import math
+import threading
+from array import array
+
+from compact_assets import ASSETS, PointTable
+from distance_calculation import distance_calculation, distance_matrix
+from lookup_raster import LookupRaster, SOURCES as RASTER_SOURCES
+
+
+# The k-d tree searches by chord length on the unit sphere, which grows with
+# the haversine distance distance_calculation returns, and distance_matrix is
+# the same haversine in NumPy, so either can only order near-ties differently
+# from distance_calculation through rounding. Every point within this factor
+# of the winner is re-ranked with distance_calculation. A 1% margin is far
+# wider than the rounding needs; it is kept because the candidate sets in
+# assets/lookup_raster.bin were built with it.
+TOLERANCE = 1.01
+
+
+def _to_xyz(lat, lng):
+    """Convert a latitude/longitude in degrees to a point on the unit sphere"""
+    phi = math.radians(lat)
+    lam = math.radians(lng)
+    return (math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi))
+
+
+def _freeze(points):
+    """Return points as a sequence no caller can change under an index
+
+    A PointTable is already read-only and is kept as it is, so its memory
+    stays shared; anything else is copied into a tuple.
+    """
+    return points if isinstance(points, PointTable) else tuple(points)
+
+
+class NearestIndex(object):
+    """A k-d tree over points on the unit sphere
+
+    The straight-line (chord) distance between two points on the unit sphere
+    grows with their great circle distance, so an ordinary 3-d k-d tree answers
+    nearest-point queries for any location on earth in O(log n). The tree is
+    read-only once built, so it can be queried from many threads at once.
+
+    Args:
+        points (tuple): Records with lat and lng attributes, e.g. GRID
+    """
+
+    def __init__(self, points):
+        self.points = _freeze(points)
+        xyz = [_to_xyz(i.lat, i.lng) for i in self.points]
+        self._x = array('d', (i[0] for i in xyz))
+        self._y = array('d', (i[1] for i in xyz))
+        self._z = array('d', (i[2] for i in xyz))
+        # The tree is stored implicitly: the node for the slice [lo, hi) of
+        # _order is _order[(lo + hi) // 2] and splits on _axis of that slot.
+        order = list(range(len(self.points)))
+        axes = [0] * len(self.points)
+        self._build(order, axes, 0, len(order))
+        self._order = array('l', order)
+        self._axis = array('b', axes)
+
+    def _build(self, order, axes, lo, hi):
+        if hi - lo <= 1:
+            return
+        members = order[lo:hi]
+        columns = (self._x, self._y, self._z)
+        spread = [max(column[i] for i in members) - min(column[i] for i in members)
+                  for column in columns]
+        axis = spread.index(max(spread))
+        members.sort(key=columns[axis].__getitem__)
+        order[lo:hi] = members
+        mid = (lo + hi) // 2
+        axes[mid] = axis
+        self._build(order, axes, lo, mid)
+        self._build(order, axes, mid + 1, hi)
+
+    def _search(self, query, lo, hi, radius, found):
+        """Collect the index of every point within radius
+
+        radius is a one-item list holding the squared search radius. When
+        found is None the radius shrinks to the best match seen so far.
+        """
+        if lo >= hi:
+            return
+        mid = (lo + hi) // 2
+        index = self._order[mid]
+        point = (self._x[index], self._y[index], self._z[index])
+        d2 = ((point[0] - query[0]) ** 2 + (point[1] - query[1]) ** 2 +
+              (point[2] - query[2]) ** 2)
+        if d2 <= radius[0]:
+            if found is None:
+                radius[0] = d2
+            else:
+                found.append(index)
+        if hi - lo == 1:
+            return
+        diff = query[self._axis[mid]] - point[self._axis[mid]]
+        if diff < 0:
+            near, far = (lo, mid), (mid + 1, hi)
+        else:
+            near, far = (mid + 1, hi), (lo, mid)
+        self._search(query, near[0], near[1], radius, found)
+        if diff * diff <= radius[0]:
+            self._search(query, far[0], far[1], radius, found)
+
+    def nearest(self, lat, lng):
+        """Find the point nearest to a location
+
+        Ties are broken in favour of the point listed first, which matches a
+        stable sort of the whole list by distance.
+
+        Args:
+            lat (float): Latitude
+            lng (float): Longitude
+
+        Returns:
+            tuple: The nearest point and its distance in km, or (None, None)
+                if the index is empty
+        """
+        if not self.points:
+            return None, None
+        query = _to_xyz(lat, lng)
+        radius = [float('inf')]
+        self._search(query, 0, len(self.points), radius, None)
+        radius[0] = radius[0] * TOLERANCE ** 2 + 1e-18
+        candidates = []
+        self._search(query, 0, len(self.points), radius, candidates)
+        best = None
+        for index in sorted(candidates):
+            point = self.points[index]
+            distance = distance_calculation(lat, lng, point.lat, point.lng)
+            if best is None or distance < best[1]:
+                best = (point, distance)
+        return best
+
+
+class VectorizedIndex(object):
+    """A nearest-point lookup over NumPy coordinate arrays
+
+    Every query is a single distance_matrix over all points, which suits
+    small point sets such as the rainfall nowcast mapping and lets many
+    locations be resolved in one call. The arrays are read-only once built.
+    NumPy is imported when the first index is built rather than with this
+    module.
+
+    Args:
+        points (tuple): Records with lat and lng attributes, e.g. RAINFALL_MAPPING
+    """
+
+    def __init__(self, points):
+        import numpy as np
+
+        self.points = _freeze(points)
+        self._coords = np.array([(i.lat, i.lng) for i in self.points], dtype=float).reshape(-1, 2)
+        self._coords.flags.writeable = False
+
+    def _pick(self, lat, lng, distances):
+        """Re-rank the spherical near-ties of one location with the exact distance"""
+        limit = distances.min() * TOLERANCE + 1e-9
+        best = None
+        for index in (distances <= limit).nonzero()[0]:
+            point = self.points[index]
+            distance = distance_calculation(lat, lng, point.lat, point.lng)
+            if best is None or distance < best[1]:
+                best = (point, distance)
+        return best
+
+    def nearest(self, lat, lng):
+        """Find the point nearest to a location
+
+        Args:
+            lat (float): Latitude
+            lng (float): Longitude
+
+        Returns:
+            tuple: The nearest point and its distance in km, or (None, None)
+                if the index is empty
+        """
+        return self.nearest_many([(lat, lng)])[0]
+
+    def nearest_many(self, locations):
+        """Find the nearest point to each of many locations in one pass
+
+        Args:
+            locations (list): (lat, lng) pairs
+
+        Returns:
+            list: A (point, distance in km) tuple for every location, in order
+        """
+        if not self.points:
+            return [(None, None)] * len(locations)
+        if not locations:
+            return []
+        lats = [float(i[0]) for i in locations]
+        lngs = [float(i[1]) for i in locations]
+        distances = distance_matrix(list(zip(lats, lngs)), self._coords)
+        return [self._pick(lat, lng, row) for lat, lng, row in zip(lats, lngs, distances)]
+
+
+def load_asset(name):
+    """Load one of the JSON files shipped in assets/"""
+    with open(ASSETS / name, encoding='utf-8') as f:
+        return json.load(f)
+
+
+# GRID, GRID_INDEX, RAINFALL_MAPPING, RAINFALL_INDEX and RASTER are built on first
+# use, so importing this module reads no asset. Callers look them up as
+# attributes of the module at call time rather than importing the names.
+_BUILDERS = {
+    'GRID': lambda: PointTable(ASSETS / 'grid_location.bin'),
+    'GRID_INDEX': lambda: NearestIndex(__getattr__('GRID')),
+    'RAINFALL_MAPPING': lambda: PointTable(ASSETS / 'rainfall_nowcast_mapping.bin'),
+    'RAINFALL_INDEX': lambda: VectorizedIndex(__getattr__('RAINFALL_MAPPING')),
+    'RASTER': lambda: LookupRaster(ASSETS / 'lookup_raster.bin', __getattr__('GRID'), __getattr__('RAINFALL_MAPPING'),
+                                   [ASSETS / name for name in RASTER_SOURCES]),
+}
+_build_lock = threading.RLock()
+
+
+def __getattr__(name):
+    if name not in _BUILDERS:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    with _build_lock:
+        if name not in globals():
+            globals()[name] = _BUILDERS[name]()
+    return globals()[name]
+
+
+# The tables the server answers from; GRID_INDEX and RAINFALL_INDEX are only
+# built for tools and tests that ask for them
+SERVING = ('GRID', 'RAINFALL_MAPPING', 'RASTER')
+
+
+def preload():
+    """Build the lookup tables the server answers from now, e.g. before a
+    server forks its workers"""
+    for name in SERVING:
+        __getattr__(name)
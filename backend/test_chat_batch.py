@@ -0,0 +1,101 @@
+from collections import Counter
+
+import pytest
+
+import app
+import fetch_plan
+from fetch_plan import fetch_many
+from session_store import SessionStore
+
+
+MESSAGES = [
+    'hello',
+    'temperature in central today',
+    'overall weather in wan chai today',
+    'overall weather in central today',
+    'uv in tai po today',
+    'wind in 長洲 3-day forecast',
+    'humidity in sai kung tomorrow',
+    'weather please',
+]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app, 'SESSIONS', SessionStore())
+    return app.app.test_client()
+
+
+def batch(client, messages):
+    return client.post('/api/chat/batch', json={'messages': messages})
+
+
+def test_same_answers_as_one_by_one(client, feeds):
+    expected = [client.post('/api/chat', json={'message': m}).get_json() for m in MESSAGES]
+    replies = batch(client, MESSAGES).get_json()['responses']
+    for reply, single in zip(replies, expected):
+        assert reply['session_id'] != single['session_id']
+        del reply['session_id'], single['session_id']
+    assert replies == expected
+
+
+def test_each_feed_fetched_once(client, feeds):
+    batch(client, MESSAGES)
+    grids = {app.get_gazetteer().coords(district)['grid'] for district in ['central', 'wan chai']}
+    assert Counter(feeds) == {'local': len(grids), 'uv': 1, 'warnings': 1, 'forecast': 1}
+
+
+def test_fetch_many_groups_by_grid(monkeypatch):
+    calls = []
+    plans = [({'grid': '0906', 'place': 'a'}, ('local', 'uv')),
+             ({'grid': '0906', 'place': 'b'}, ('local',)),
+             ({'lat': 22.3, 'lng': 114.1}, ('local', 'uv'))]
+    for name in ['local', 'uv']:
+        async def fetch(coords, name=name):
+            calls.append(name)
+            return {'feed': name}
+        monkeypatch.setitem(fetch_plan.ASYNC_FEEDS, name, fetch)
+    results = fetch_many(plans)
+    assert sorted(calls) == ['local', 'local', 'uv']
+    assert results[1] == {'local': {'feed': 'local'}}
+    assert [sorted(result) for result in results] == [['local', 'uv'], ['local'], ['local', 'uv']]
+
+
+def test_failed_feed_only_fails_its_answers(client, feeds, monkeypatch):
+    async def broken(coords):
+        raise ValueError('bad payload')
+    monkeypatch.setitem(fetch_plan.ASYNC_FEEDS, 'uv', broken)
+    replies = batch(client, ['uv in tai po today', 'temperature in tai po today']).get_json()['responses']
+    assert replies[0]['message'].startswith('Sorry')
+    assert replies[1]['message'].startswith('Current temperature in Tai po')
+
+
+def test_sessions_carry_over(client, feeds):
+    first = batch(client, ['temperature in tai po today']).get_json()['responses'][0]
+    replies = batch(client, [{'message': 'and the wind?', 'session_id': first['session_id']},
+                             {'message': 'and the wind?'}]).get_json()['responses']
+    assert replies[0]['message'].startswith('Current wind conditions in Tai po')
+    assert replies[0]['session_id'] == first['session_id']
+    assert replies[1]['needs_location']
+    # The anonymous follow-up resolved nothing, so only the first turn's
+    # conversation was stored
+    assert len(app.SESSIONS.backend) == 1
+
+
+def test_one_conversation_matches_one_by_one(client, feeds):
+    follow_ups = ['tai po please', 'what about the weather', 'and tomorrow?']
+    sessions = [client.post('/api/chat', json={'message': 'temperature in central today'}).get_json()['session_id']
+                for _ in range(2)]
+    expected = [client.post('/api/chat', json={'message': m, 'session_id': sessions[0]}).get_json()['message']
+                for m in follow_ups]
+    replies = batch(client, [{'message': m, 'session_id': sessions[1]} for m in follow_ups]).get_json()['responses']
+    assert [reply['message'] for reply in replies] == expected
+    assert expected[1].startswith('For Tai po')
+    assert app.SESSIONS.get(sessions[1]).slots == app.SESSIONS.get(sessions[0]).slots
+
+
+@pytest.mark.parametrize('body', [{}, {'messages': 'hello'}, {'messages': ['hi'] * (app.MAX_BATCH + 1)}])
+def test_bad_requests(client, body):
+    reply = client.post('/api/chat/batch', json=body)
+    assert reply.status_code == 400
+    assert reply.get_json()['status'] == 'error'
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+import compact_assets
+from compact_assets import ASSETS, SOURCES, GridPoint, NowcastPoint, PointTable, pack
+
+
+def json_points(name):
+    with open(ASSETS / (name + '.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.mark.parametrize('name', sorted(SOURCES))
+def test_binary_assets_match_json(name):
+    # Fails when a JSON asset changed without `python compact_assets.py`
+    with open(ASSETS / (name + '.bin'), 'rb') as f:
+        assert f.read() == pack(json_points(name), SOURCES[name])
+    table = PointTable(ASSETS / (name + '.bin'))
+    points = json_points(name)
+    assert len(table) == len(points)
+    for point, expected in zip(table, points):
+        assert point.lat == expected['lat'] and point.lng == expected['lng']
+        if 'grid' in expected:
+            assert (point.grid, point.name) == (expected['grid'], expected['name'])
+
+
+def test_round_trip(tmp_path):
+    points = [{'lat': 22.3, 'lng': 114.1, 'grid': '0101', 'name': '中環'},
+              {'lat': 22.3125, 'lng': 114.2, 'grid': '1818', 'name': 'Tai Po'},
+              {'lat': 22.4, 'lng': 113.9, 'grid': '0101', 'name': '中環'}]
+    path = tmp_path / 'points.bin'
+    path.write_bytes(pack(points, 4))
+    table = PointTable(path)
+    assert list(table) == [GridPoint(22.3, 114.1, '0101', '中環'), GridPoint(22.3125, 114.2, '1818', 'Tai Po'),
+                           GridPoint(22.4, 113.9, '0101', '中環')]
+    assert table[-1] == table[2] and table[1:] == (table[1], table[2])
+    assert table[0].name is table[2].name
+    with pytest.raises(IndexError):
+        table[3]
+
+    path.write_bytes(pack([{'lat': 22.142, 'lng': 113.793}], 3))
+    assert list(PointTable(path)) == [NowcastPoint(22.142, 113.793)]
+
+
+def test_pack_rejects_lossy_input():
+    with pytest.raises(ValueError):
+        pack([{'lat': 22.123456, 'lng': 114.1}], 4)
+    with pytest.raises(ValueError):
+        pack([{'lat': 22.1, 'lng': 114.1, 'grid': '101', 'name': 'a'}], 4)
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'points.bin'
+    path.write_bytes(compact_assets.HEADER.pack(b'JSON', 1, 4, 0, 0))
+    with pytest.raises(ValueError):
+        PointTable(path)
@@ -0,0 +1,134 @@
+import asyncio
+import json
+
+import pytest
+
+import hko_cache
+import weather_data
+from conftest import FakeClock
+from fake_hko import FakeHKO
+from hko_cache import ResponseCache
+
+
+PATH = 'locspc/android_data/fnd_e.xml'
+FORECAST = {'forecast_desc': 'Fine.', 'forecast_detail': [{'forecast_date': '20261019'}]}
+
+
+class Feed(object):
+    """A feed route that answers 304 when the request's validators match"""
+
+    def __init__(self, body, etag='"v1"', last_modified='Sun, 18 Oct 2026 08:00:00 GMT'):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.conditional = []
+
+    def __call__(self, handler):
+        if_none_match = handler.headers.get('If-None-Match')
+        if_modified_since = handler.headers.get('If-Modified-Since')
+        self.conditional.append((if_none_match, if_modified_since))
+        headers = {}
+        if self.etag:
+            headers['ETag'] = self.etag
+        if self.last_modified:
+            headers['Last-Modified'] = self.last_modified
+        if self.etag and if_none_match:
+            not_modified = if_none_match == self.etag
+        else:
+            not_modified = bool(self.last_modified) and if_modified_since == self.last_modified
+        if not_modified:
+            return 304, headers, b''
+        return 200, headers, self.body
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def serve(feed):
+        server = FakeHKO({PATH: feed}).start()
+        servers.append(server)
+        return server.url + PATH
+
+    yield serve
+    for server in servers:
+        server.stop()
+
+
+def test_not_modified_reuses_response(serve):
+    feed = Feed(b'{"a": 1}')
+    url = serve(feed)
+    clock = FakeClock()
+    cache = ResponseCache(clock=clock)
+    changes = []
+    cache.subscribe(lambda url, changed: changes.append(changed))
+    first = cache.get(url)
+    clock.now = 3600
+    assert cache.get(url) is first
+    assert feed.conditional == [(None, None), ('"v1"', 'Sun, 18 Oct 2026 08:00:00 GMT')]
+    assert cache.stats()['not_modified'] == 1
+    assert cache.stats()['bytes_saved'] == len(b'{"a": 1}')
+    # A 304 restarts the TTL
+    assert cache.fresh(url)
+    cache.drain()
+    assert changes == [True, False]
+
+
+def test_modified_feed_is_replaced(serve):
+    feed = Feed(b'{"a": 1}')
+    url = serve(feed)
+    clock = FakeClock()
+    cache = ResponseCache(clock=clock)
+    first = cache.get(url)
+    feed.body, feed.etag = b'{"a": 2}', '"v2"'
+    clock.now = 3600
+    second = cache.get(url)
+    assert second is not first and second.json() == {'a': 2}
+    assert cache.stats()['not_modified'] == 0
+
+
+def test_last_modified_only(serve):
+    feed = Feed(b'{}', etag=None)
+    url = serve(feed)
+    clock = FakeClock()
+    cache = ResponseCache(clock=clock)
+    first = cache.get(url)
+    clock.now = 3600
+    assert cache.refresh(url) is first
+    assert feed.conditional[-1] == (None, 'Sun, 18 Oct 2026 08:00:00 GMT')
+
+
+def test_no_validators_no_conditional_request(serve):
+    feed = Feed(b'{}', etag=None, last_modified=None)
+    url = serve(feed)
+    cache = ResponseCache()
+    cache.get(url)
+    cache.refresh(url)
+    assert feed.conditional == [(None, None), (None, None)]
+
+
+def test_async_not_modified(serve):
+    url = serve(Feed(b'{"a": 1}'))
+    clock = FakeClock()
+    cache = ResponseCache(clock=clock)
+    first = cache.get(url)
+    clock.now = 3600
+    assert asyncio.run(cache.get_async(url)) is first
+    assert cache.stats()['not_modified'] == 1
+
+
+def test_parsed_result_survives_not_modified(serve, monkeypatch):
+    url = serve(Feed(json.dumps(FORECAST).encode()))
+    monkeypatch.setattr(weather_data, 'HKO_PDA_URL', url[:-len(PATH)])
+    cache = ResponseCache()
+    monkeypatch.setattr(hko_cache, 'CACHE', cache)
+    parses = []
+    monkeypatch.setattr(weather_data.json, 'loads', lambda text, loads=json.loads: parses.append(1) or loads(text))
+    first = weather_data.several_days_weather_forecast('EN')
+    assert first['result'] == FORECAST
+    # The refresh scheduler revalidates the feed: HKO answers 304, so the
+    # fetcher hands out what it parsed before
+    cache.refresh(url)
+    assert cache.stats()['not_modified'] == 1
+    assert weather_data.several_days_weather_forecast('EN') == first
+    assert len(parses) == 1
@@ -0,0 +1,54 @@
+import re
+
+import pytest
+
+from delimited import ASTRO_TIDE, MAJOR_CITY, RAINFALL_NOWCAST, Schema
+
+
+RAINFALL = b'201810181200@0@201810181230@0@201810181300@0@201810181330@0@201810181400#No rain#\xe7\x84\xa1\xe9\x9b\xa8#x'
+ASTRO_TIDE_PAYLOAD = b'06:20@18:01@10:00@21:00#0.8@02:10#2.0@08:30#0.9@14:00#2.1@20:30#20181018'
+CITIES = 'Bangkok#25#33#Cloudy#pic62@北京#8#17#晴#pic50'.encode('utf-8')
+
+
+@pytest.mark.parametrize('payload', [RAINFALL, ASTRO_TIDE_PAYLOAD, RAINFALL + b'@extra#fields'])
+@pytest.mark.parametrize('schema', [RAINFALL_NOWCAST, ASTRO_TIDE])
+def test_parse_matches_split(payload, schema):
+    fields = re.split('[@#]', payload.decode('utf-8'))
+    if len(fields) < len(schema.fields):
+        with pytest.raises(IndexError):
+            schema.parse(payload)
+    else:
+        assert list(schema.parse(payload)) == fields[:len(schema.fields)]
+        assert schema.parse(payload.decode('utf-8')) == schema.parse(payload)
+
+
+def test_parse_of_short_feed():
+    with pytest.raises(IndexError):
+        RAINFALL_NOWCAST.parse(b'201810181200@0')
+    with pytest.raises(IndexError):
+        ASTRO_TIDE.parse(b'')
+
+
+def test_records():
+    cities = list(MAJOR_CITY.records(CITIES))
+    assert cities[1] == MAJOR_CITY.record('北京', '8', '17', '晴', 'pic50')
+    assert [city.place for city in cities] == ['Bangkok', '北京']
+    assert MAJOR_CITY.dicts(CITIES) == [city._asdict() for city in cities]
+
+
+def test_records_skip_extra_fields_and_reject_short_ones():
+    schema = Schema('Pair', ['a', 'b'])
+    assert list(schema.records(b'1#2#3@4#5')) == [('1', '2'), ('4', '5')]
+    records = schema.records(b'1#2@3')
+    assert next(records) == ('1', '2')
+    with pytest.raises(IndexError):
+        next(records)
+    with pytest.raises(IndexError):
+        list(schema.records(b'1#2@'))
+    assert schema.dicts(b'1#2#3@4#5') == [{'a': '1', 'b': '2'}, {'a': '4', 'b': '5'}]
+    with pytest.raises(IndexError):
+        schema.dicts(b'1#2@3')
+
+
+def test_invalid_utf8_is_replaced():
+    assert next(MAJOR_CITY.records(b'\xff#1#2#3#4')).place == '�'
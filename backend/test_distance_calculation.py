@@ -0,0 +1,62 @@
+import random
+
+import numpy as np
+import pytest
+
+from distance_calculation import distance_calculation, distance_matrix
+
+
+def hong_kong(count, seed):
+    """Random pairs of locations over Hong Kong, up to about 30 km apart"""
+    rng = random.Random(seed)
+    pairs = []
+    for _ in range(count):
+        lat, lng = rng.uniform(22.1, 22.6), rng.uniform(113.8, 114.5)
+        pairs.append((lat, lng, lat + rng.uniform(-0.2, 0.2), lng + rng.uniform(-0.2, 0.2)))
+    return pairs
+
+
+# (lat1, lng1, lat2, lng2, km) pairs over Hong Kong, with their distance on
+# the WGS84 ellipsoid as computed by LatLon23, which distances used before
+GEODESIC = [
+    (22.2819, 114.1581, 22.2988, 114.1722, 2.3693),   # Central to Tsim Sha Tsui
+    (22.2819, 114.1581, 22.2760, 114.1751, 1.8699),   # Central to Wan Chai
+    (22.3193, 114.1694, 22.3303, 114.1622, 1.4262),   # Mong Kok to Sham Shui Po
+    (22.2480, 114.1550, 22.3282, 114.1916, 9.6486),   # Aberdeen to Kowloon City
+    (22.2819, 114.1581, 22.3771, 114.1974, 11.2927),  # Central to Sha Tin
+    (22.4501, 114.1688, 22.3814, 114.2705, 12.9427),  # Tai Po to Sai Kung
+    (22.4445, 114.0222, 22.3104, 114.2258, 25.6938),  # Yuen Long to Kwun Tong
+    (22.2890, 113.9410, 22.2180, 114.2120, 29.0193),  # Tung Chung to Stanley
+    (22.3908, 113.9725, 22.2643, 114.2370, 30.6393),  # Tuen Mun to Chai Wan
+    (22.2090, 114.0290, 22.5303, 114.1128, 36.6111),  # Cheung Chau to Lo Wu
+    (22.2530, 113.8620, 22.4710, 114.3610, 56.7829),  # Tai O to Tap Mun
+]
+
+
+@pytest.mark.parametrize('lat1, lng1, lat2, lng2, geodesic', GEODESIC)
+def test_close_to_geodesic(lat1, lng1, lat2, lng2, geodesic):
+    distance = distance_calculation(lat1, lng1, lat2, lng2)
+    assert abs(distance - geodesic) <= 0.005 * geodesic
+    # The 10 km range checks move by at most 50 m
+    if geodesic <= 10:
+        assert abs(distance - geodesic) < 0.05
+
+
+def test_scalar():
+    assert distance_calculation(22.3, 114.1, 22.3, 114.1) == 0
+    assert distance_calculation(22.3, 114.1, 22.4, 114.2) == distance_calculation(22.4, 114.2, 22.3, 114.1)
+    # A degree of latitude is about 111 km
+    assert distance_calculation(22.0, 114.0, 23.0, 114.0) == pytest.approx(111.2, abs=0.1)
+    assert distance_calculation(0.0, 0.0, 0.0, 180.0) == pytest.approx(20015.1, abs=0.1)
+
+
+def test_matrix_matches_scalar():
+    pairs = hong_kong(50, 1)
+    points = [pair[:2] for pair in pairs]
+    targets = [pair[2:] for pair in pairs[:30]]
+    matrix = distance_matrix(points, targets)
+    assert matrix.shape == (50, 30)
+    expected = [[distance_calculation(*point, *target) for target in targets] for point in points]
+    assert np.allclose(matrix, expected, rtol=1e-12, atol=1e-9)
+    assert distance_matrix([], targets).shape == (0, 30)
+    assert distance_matrix(points[0], targets[0]).shape == (1, 1)
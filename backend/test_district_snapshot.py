@@ -0,0 +1,177 @@
+import json
+import threading
+
+import pytest
+
+import app
+import hko_cache
+import weather_data
+from conftest import SAMPLE_FEEDS
+from district_snapshot import DistrictSnapshots
+from fetch_plan import FEEDS, fetch_feeds
+from fake_hko import FakeHKO
+
+
+def warnings_payload(warnings):
+    return ('var weather_warning_summary = ' + json.dumps(warnings) + '\n').encode()
+
+
+def uv_payload(uv):
+    return 'The maximum UV Index for {date} will be about {max_uv_index}. ' \
+           'The intensity of UV radiation wll be {intensity}.'.format(**uv).encode()
+
+
+def routes():
+    """Serve SAMPLE_FEEDS for every feed the chat districts read"""
+    feeds = {
+        weather_data.WEATHER_WARNING_URLS['EN']: warnings_payload(SAMPLE_FEEDS['warnings']['result']),
+        weather_data.FORECAST_URLS['EN']: json.dumps(SAMPLE_FEEDS['forecast']['result']).encode(),
+        weather_data.UV_INDEX_URLS['EN']: uv_payload(SAMPLE_FEEDS['uv']['result']),
+    }
+    for district in app.DISTRICT_COORDINATES:
+        grid = app.get_gazetteer().coords(district)['grid']
+        feeds[weather_data.GRID_DATA_URL.format(grid)] = json.dumps(SAMPLE_FEEDS['local']['result']).encode()
+    return feeds
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """Serve SAMPLE_FEEDS from a fake HKO server through a fresh cache and snapshot table"""
+    routes = {
+        'wxinfo/json/warnsum.xml': warnings_payload(SAMPLE_FEEDS['warnings']['result']),
+        'locspc/android_data/fnd_e.xml': json.dumps(SAMPLE_FEEDS['forecast']['result']).encode(),
+        'locspc/android_data/fuve.xml': uv_payload(SAMPLE_FEEDS['uv']['result']),
+        'locspc/android_data/gridData/0906_tc.xml': json.dumps(SAMPLE_FEEDS['local']['result']).encode(),
+    }
+    with FakeHKO(routes) as server:
+        monkeypatch.setattr(weather_data, 'HKO_PDA_URL', server.url)
+        monkeypatch.setattr(weather_data, 'HKO_WEB_URL', server.url)
+        cache = hko_cache.ResponseCache()
+        monkeypatch.setattr(hko_cache, 'CACHE', cache)
+        snapshots = DistrictSnapshots({'central': app.DISTRICT_COORDINATES['central']}).attach(cache)
+        monkeypatch.setattr(app, 'SNAPSHOTS', snapshots)
+        yield server
+
+
+def warm(feeds=tuple(FEEDS)):
+    """Fetch feeds of Central into the cache, as chat answers and the refresh
+    scheduler do, and wait for the snapshot table to hear of them"""
+    fetch_feeds(app.DISTRICT_COORDINATES['central'], feeds)
+    hko_cache.CACHE.drain()
+
+
+def test_rebuild_does_not_fetch(server):
+    app.SNAPSHOTS.rebuild()
+    assert server.requests == []
+    assert app.SNAPSHOTS.get('central') is None
+
+
+def test_answers_come_from_the_snapshot(server):
+    warm()
+    app.SNAPSHOTS.rebuild()
+    snapshot = app.SNAPSHOTS.get('central')
+    assert snapshot.grid == '0906'
+    assert snapshot.data['warnings']['result'] == {'WTS': {'Name': 'Thunderstorm Warning', 'InForce': 1}}
+    assert len(snapshot.data['forecast']['result']['forecast_detail']) == 3
+
+    fetched = len(server.requests)
+    coords = app.DISTRICT_COORDINATES['central']
+    for period in ['today', 'tomorrow', '3day']:
+        for info_type in ['overall', 'temperature', 'wind']:
+            message = app.format_weather_response('central', coords, period, info_type)
+            assert not message.startswith('Sorry')
+    assert 'Thunderstorm Warning' in app.format_weather_response('central', coords, 'today', 'overall')
+    assert len(server.requests) == fetched
+
+
+def test_snapshot_is_rebuilt_when_a_feed_changes(server):
+    warm()
+    rebuilds = app.SNAPSHOTS.rebuilds
+    url = weather_data.HKO_WEB_URL + 'wxinfo/json/warnsum.xml'
+
+    hko_cache.CACHE.refresh(url)
+    hko_cache.CACHE.drain()
+    assert app.SNAPSHOTS.rebuilds == rebuilds
+
+    server.routes['wxinfo/json/warnsum.xml'] = warnings_payload(
+        {'WRAINA': {'Name': 'Amber Rainstorm Warning Signal', 'InForce': 1}})
+    hko_cache.CACHE.refresh(url)
+    hko_cache.CACHE.drain()
+    assert app.SNAPSHOTS.rebuilds == rebuilds + 1
+    message = app.format_weather_response('central', app.DISTRICT_COORDINATES['central'], 'today', 'overall')
+    assert 'Amber Rainstorm Warning Signal' in message
+    assert 'Thunderstorm Warning' not in message
+
+
+def test_stale_snapshots_are_not_served(server):
+    warm()
+    assert app.SNAPSHOTS.get('central') is not None
+    hko_cache.CACHE.clear()
+    assert app.SNAPSHOTS.get('central') is None
+    assert app.SNAPSHOTS.get('tai po') is None
+
+
+def test_districts_with_failed_feeds_are_left_out(server):
+    del server.routes['locspc/android_data/gridData/0906_tc.xml']
+    warm(('uv', 'forecast', 'warnings'))
+    app.SNAPSHOTS.rebuild()
+    assert app.SNAPSHOTS.get('central') is None
+
+
+@pytest.fixture
+def live(monkeypatch):
+    """Serve every chat feed from a fake HKO server through the app's own cache
+    and snapshot table, both empty"""
+    with FakeHKO(routes()) as server:
+        monkeypatch.setattr(weather_data, 'HKO_PDA_URL', server.url)
+        monkeypatch.setattr(weather_data, 'HKO_WEB_URL', server.url)
+        monkeypatch.setattr(app.SNAPSHOTS, '_table', {})
+        hko_cache.CACHE.clear()
+        try:
+            yield server
+        finally:
+            hko_cache.CACHE.drain()
+            hko_cache.CACHE.clear()
+
+
+def post(path, body):
+    """Post to the app, failing instead of hanging if it does not answer"""
+    replies = []
+    thread = threading.Thread(target=lambda: replies.append(app.app.test_client().post(path, json=body)),
+                              daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    assert replies, 'no answer to {} in 10 s'.format(body)
+    return replies[0].get_json()
+
+
+@pytest.mark.parametrize('message', ['temperature in central today', 'uv in tai po today',
+                                     '3-day wind forecast for shatin'])
+def test_cold_cache_chat_with_live_snapshots(live, message):
+    reply = post('/api/chat', {'message': message})
+    assert not reply['message'].startswith('Sorry')
+
+
+def test_cold_cache_batch_with_live_snapshots(live):
+    replies = post('/api/chat/batch', {'messages': ['temperature in central today', 'uv in tai po today']})
+    assert not any(reply['message'].startswith('Sorry') for reply in replies['responses'])
+
+
+def test_cold_chat_fetches_only_what_it_reads(live):
+    post('/api/chat', {'message': 'uv in tai po today'})
+    hko_cache.CACHE.drain()
+    assert live.requests == [weather_data.UV_INDEX_URLS['EN']]
+    assert app.SNAPSHOTS.get('tai po') is None
+
+
+def test_chat_answers_from_live_snapshots(live):
+    # Between them these answers read every feed of Central
+    expected = [post('/api/chat', {'message': message})['message']
+                for message in ['overall weather in central today', 'wind in central 3-day forecast']]
+    hko_cache.CACHE.drain()
+    assert app.SNAPSHOTS.get('central') is not None
+    fetched = len(live.requests)
+    replies = [post('/api/chat', {'message': message})['message']
+               for message in ['overall weather in central today', 'wind in central 3-day forecast']]
+    assert replies == expected
+    assert len(live.requests) == fetched
@@ -0,0 +1,72 @@
+import importlib
+import json
+
+import pytest
+
+import hko
+import hko_cache
+from fake_hko import FakeHKO
+
+
+earthquake = importlib.import_module('hko.earthquake')
+
+EVENT = """
+  <Event>
+    <Verify>Y</Verify>
+    <HKTDate>2018101{day}</HKTDate>
+    <HKTTime>12{day}8</HKTTime>
+    <Lat>{lat}</Lat>
+    <Lon>121.{day}4</Lon>
+    <Mag>{mag}</Mag>
+    <Region>Taiwan &amp; vicinity</Region>
+  </Event>"""
+
+
+def feed(count):
+    """An earthquake feed in the shape HKO publishes, with count events"""
+    events = ''.join(EVENT.format(day=i % 10, lat=22 + i % 7, mag=3 + i % 5 / 2) for i in range(count))
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n<Earthquake>\n <Update>201810181230</Update>\n'
+            ' <EventList>{}\n </EventList>\n</Earthquake>\n').format(events).encode('utf-8')
+
+
+def xmltodict_path(content):
+    """How earthquake parsed a feed before"""
+    xmltodict = pytest.importorskip('xmltodict')
+    return json.loads(json.dumps(xmltodict.parse(content.decode('utf-8'))))
+
+
+@pytest.mark.parametrize('content', [
+    feed(0), feed(1), feed(30),
+    b'<a x="1">hi<b>t</b>tail<b/><c y="2"/>  <d>  </d><n:e xmlns:n="urn:x" n:z="3">v</n:e></a>',
+    b'<a><![CDATA[ q ]]><!-- note --></a>',
+    b'<a xmlns="urn:d"><b>1</b><b><c>2</c></b></a>',
+    '<a><b>地震</b></a>'.encode('utf-8'),
+])
+def test_parse_matches_xmltodict(content):
+    assert earthquake.parse(content) == xmltodict_path(content)
+
+
+def test_parse_gives_plain_dicts():
+    result = earthquake.parse(feed(2))
+    assert result['Earthquake']['Update'] == '201810181230'
+    assert result['Earthquake']['EventList']['Event'][1]['Region'] == 'Taiwan & vicinity'
+    assert json.loads(json.dumps(result)) == result
+
+
+def test_events():
+    quakes = list(earthquake.events(feed(3)))
+    assert len(quakes) == 3
+    assert type(quakes[0]).__name__ == 'Event'
+    assert quakes[0]._fields == ('Verify', 'HKTDate', 'HKTTime', 'Lat', 'Lon', 'Mag', 'Region')
+    assert quakes[1].Mag == '3.5' and quakes[1].Region == 'Taiwan & vicinity'
+    # Elements with attributes, text or repeated children are not events
+    assert list(earthquake.events(b'<a><b x="1"><c>1</c></b><d>t<e>1</e></d><f><g/><g/></f></a>')) == []
+
+
+def test_earthquake(monkeypatch):
+    with FakeHKO({earthquake.URL_EN: feed(5), earthquake.URL_UC: b'<Earthquake>'}) as server:
+        monkeypatch.setattr(earthquake, 'BASE_URL', server.url)
+        monkeypatch.setattr(hko_cache, 'CACHE', hko_cache.ResponseCache())
+        assert hko.earthquake('EN') == {'result': earthquake.parse(feed(5)), 'status': 1}
+        assert hko.earthquake('UC') == {'result': '', 'status': 2}
+        assert hko.earthquake('XX') == {'result': '', 'status': 0}
@@ -0,0 +1,50 @@
+import asyncio
+import time
+
+import pytest
+
+import app
+import fetch_plan
+from fetch_plan import required_feeds, fetch_feeds
+
+
+def test_required_feeds():
+    assert required_feeds('today', 'temperature') == ('local',)
+    assert required_feeds('today', 'wind') == ('local',)
+    assert required_feeds('today', 'uv') == ('uv',)
+    assert required_feeds('today', 'overall') == ('local', 'uv', 'warnings')
+    assert required_feeds('3day', 'humidity') == ('forecast',)
+    assert required_feeds('tomorrow', 'overall') == ('forecast',)
+
+
+@pytest.mark.parametrize('period, info_type', [
+    (period, info_type)
+    for period in ['today', 'tomorrow', '2day', '3day']
+    for info_type in ['overall', 'temperature', 'humidity', 'wind', 'uv']
+    if not (period != 'today' and info_type == 'uv')
+])
+def test_answers_fetch_only_required_feeds(feeds, period, info_type):
+    coords = app.DISTRICT_COORDINATES['central']
+    message = app.format_weather_response('central', coords, period, info_type)
+    assert not message.startswith('Sorry')
+    assert sorted(feeds) == sorted(required_feeds(period, info_type))
+
+
+def test_overall_answer_uses_every_feed(feeds):
+    message = app.format_weather_response('central', app.DISTRICT_COORDINATES['central'], 'today', 'overall')
+    assert 'Temperature: 25°C' in message
+    assert 'UV Index: 5 (moderate)' in message
+    assert 'Thunderstorm Warning' in message
+    assert 'Fire Danger Warning' not in message
+
+
+def test_feeds_are_fetched_in_parallel(monkeypatch):
+    for name in fetch_plan.ASYNC_FEEDS:
+        async def fetch(coords, name=name):
+            await asyncio.sleep(0.2)
+            return name
+        monkeypatch.setitem(fetch_plan.ASYNC_FEEDS, name, fetch)
+    start = time.perf_counter()
+    data = fetch_feeds({'lat': 22.28, 'lng': 114.15}, ('local', 'uv', 'warnings'))
+    assert time.perf_counter() - start < 0.5
+    assert data == {'local': 'local', 'uv': 'uv', 'warnings': 'warnings'}
@@ -0,0 +1,69 @@
+import pytest
+
+import app
+import fetch_plan
+import gazetteer
+from spatial_index import GRID, GRID_INDEX, load_asset
+from weather_data import grid_weather
+
+
+@pytest.fixture(scope='module')
+def places():
+    return gazetteer.load(app.DISTRICT_COORDINATES)
+
+
+def test_districts_come_first(places):
+    assert list(places.places)[:len(app.DISTRICT_COORDINATES)] == list(app.DISTRICT_COORDINATES)
+    coords = places.coords('Tuen  Mun')
+    assert (coords['lat'], coords['lng']) == (app.DISTRICT_COORDINATES['tuen mun']['lat'],
+                                              app.DISTRICT_COORDINATES['tuen mun']['lng'])
+    # region.json adds the Chinese name to the district rather than a second place
+    assert places.lookup('屯門') is places.lookup('tuen mun')
+
+
+def test_english_and_chinese_names(places):
+    grid_names = {point.name for point in GRID}
+    for english, escaped in load_asset('region.json').items():
+        chinese = escaped.encode('ascii').decode('unicode_escape')
+        if chinese in grid_names:
+            assert places.lookup(english) is places.lookup(chinese) is not None
+        else:
+            assert places.lookup(english) is None
+    assert places.lookup('SHA TIN').names == ('sha tin', '沙田')
+    assert places.lookup('Atlantis') is None
+    assert places.coords('Atlantis') is None
+
+
+def test_every_grid_name_is_known(places):
+    for name in {point.name for point in GRID}:
+        assert places.lookup(name) is not None
+
+
+def test_precomputed_grid_matches_search(places):
+    for place in places.places.values():
+        nearest, distance = GRID_INDEX.nearest(place.lat, place.lng)
+        assert place.grid == (nearest.grid if distance < 10 else None)
+        assert place.place == nearest.name
+
+
+def test_representative_lies_in_patch():
+    patches = {}
+    for point in GRID:
+        patches.setdefault(point.name, set()).add((point.lat, point.lng))
+    for name, centre in gazetteer.representative_points(GRID).items():
+        assert centre in patches[name]
+
+
+def test_grid_weather_out_of_range():
+    assert grid_weather(None, '香港') == {'result': '', 'status': 3}
+
+
+def test_chat_skips_grid_search(monkeypatch):
+    calls = []
+    monkeypatch.setattr(fetch_plan, 'local_weather', lambda lat, lng: pytest.fail('searched the grid'))
+    monkeypatch.setattr(fetch_plan, 'grid_weather', lambda grid, place: calls.append((grid, place)) or {
+        'status': 1, 'place': place, 'result': {'RegionalWeather': {'Temp': {'Value': '24'}}}})
+    reply = app.app.test_client().post('/api/chat', json={'message': 'temperature in 長洲 today'}).get_json()
+    place = app.get_gazetteer().lookup('cheung chau')
+    assert calls == [(place.grid, place.place)]
+    assert reply['message'].startswith('Current temperature in Cheung chau is 24')
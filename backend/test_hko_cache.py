@@ -0,0 +1,64 @@
+import pytest
+import requests
+
+import hko_cache
+from conftest import FakeClock
+from hko_cache import ResponseCache
+
+
+def test_cache_serves_fresh_responses(fetches):
+    clock = FakeClock()
+    cache = ResponseCache(clock=clock)
+    url = 'http://www.weather.gov.hk/wxinfo/json/warnsum.xml'
+    first = cache.get(url)
+    assert cache.get(url) is first
+    clock.now = 59
+    assert cache.get(url) is first
+    clock.now = 61
+    assert cache.get(url) is not first
+    assert fetches == [url, url]
+    assert cache.stats()['hits'] == 2
+    assert cache.stats()['misses'] == 2
+
+
+def test_ttl_policies():
+    cache = ResponseCache()
+    assert cache.ttl('http://www.weather.gov.hk/wxinfo/json/warnsumc.xml') == 60
+    assert cache.ttl('http://pda.weather.gov.hk/locspc/android_data/fnd_e.xml') == 3600
+    assert cache.ttl('http://pda.weather.gov.hk/locspc/android_data/fuve.xml') == 86400
+    assert cache.ttl('http://pda.weather.gov.hk/unknown.xml') == hko_cache.DEFAULT_TTL
+
+
+def test_languages_are_cached_separately(fetches):
+    cache = ResponseCache()
+    cache.get('http://pda.weather.gov.hk/locspc/android_data/fuve.xml')
+    cache.get('http://pda.weather.gov.hk/locspc/android_data/fuvc.xml')
+    assert len(fetches) == 2
+
+
+def test_least_recently_used_response_is_evicted(fetches):
+    cache = ResponseCache(maxsize=2)
+    cache.get('http://pda.weather.gov.hk/a')
+    cache.get('http://pda.weather.gov.hk/b')
+    cache.get('http://pda.weather.gov.hk/a')
+    cache.get('http://pda.weather.gov.hk/c')
+    cache.get('http://pda.weather.gov.hk/a')
+    cache.get('http://pda.weather.gov.hk/b')
+    assert fetches == ['http://pda.weather.gov.hk/a', 'http://pda.weather.gov.hk/b',
+                       'http://pda.weather.gov.hk/c', 'http://pda.weather.gov.hk/b']
+    assert cache.stats()['evictions'] == 2
+
+
+def test_failures_are_not_cached(fetches, monkeypatch):
+    cache = ResponseCache()
+    cache.get('http://pda.weather.gov.hk/broken')
+    cache.get('http://pda.weather.gov.hk/broken')
+    assert len(fetches) == 2
+
+    def get(url):
+        raise requests.exceptions.ConnectionError()
+
+    monkeypatch.setattr(hko_cache.hko_client, 'get', get)
+    with pytest.raises(requests.exceptions.RequestException):
+        cache.get('http://pda.weather.gov.hk/a')
+    assert cache.stats()['size'] == 0
@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from fake_hko import FakeHKO
+from hko_client import HKOClient
+
+
+def test_connections_are_reused():
+    with FakeHKO({'fuve.xml': b'uv'}) as server:
+        client = HKOClient()
+        for _ in range(10):
+            assert client.get(server.url + 'fuve.xml').content == b'uv'
+        client.close()
+    assert len(server.requests) == 10
+    assert server.connections == 1
+
+
+def test_read_timeout():
+    with FakeHKO({'fnd_e.xml': b'{}'}, latency=0.5) as server:
+        client = HKOClient(timeout=(1, 0.1), retries=0)
+        with pytest.raises(requests.exceptions.RequestException):
+            client.get(server.url + 'fnd_e.xml')
+        client.close()
+
+
+def test_server_errors_are_retried():
+    answers = [503, 502, 200]
+
+    def flaky(handler):
+        return answers.pop(0), {}, b'ok'
+
+    with FakeHKO({'warnsum.xml': flaky}) as server:
+        client = HKOClient(retries=2, backoff=0)
+        response = client.get(server.url + 'warnsum.xml')
+        client.close()
+    assert response.status_code == 200
+    assert len(server.requests) == 3
+
+
+def test_retries_are_bounded():
+    with FakeHKO({'warnsum.xml': lambda handler: (503, {}, b'busy')}) as server:
+        client = HKOClient(retries=1, backoff=0)
+        response = client.get(server.url + 'warnsum.xml')
+        client.close()
+    assert response.status_code == 503
+    assert len(server.requests) == 2
+
+
+def test_concurrency_is_capped():
+    in_flight = [0, 0]
+    lock = threading.Lock()
+
+    def slow(handler):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+        time.sleep(0.05)
+        with lock:
+            in_flight[0] -= 1
+        return 200, {}, b'ok'
+
+    with FakeHKO({'fuve.xml': slow}) as server:
+        client = HKOClient(max_concurrency=3)
+        threads = [threading.Thread(target=client.get, args=(server.url + 'fuve.xml',)) for _ in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        client.close()
+    assert len(server.requests) == 12
+    assert in_flight[1] <= 3
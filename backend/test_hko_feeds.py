@@ -0,0 +1,80 @@
+import importlib
+import pkgutil
+
+import pytest
+
+import hko
+import hko_cache
+from fake_hko import FakeHKO
+from hko import feeds
+from test_delimited import ASTRO_TIDE_PAYLOAD
+from test_single_flight import call_concurrently
+
+
+astro_tide = importlib.import_module('hko.astro_tide')
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    """Serve astro_tide.xml from a fake HKO server through a fresh cache, counting parses"""
+    parses = []
+
+    def parse(data):
+        parses.append(data)
+        return astro_tide.parse(data)
+
+    def serve(payload=ASTRO_TIDE_PAYLOAD, **kwargs):
+        server = FakeHKO({astro_tide.URL: payload}, **kwargs).start()
+        servers.append(server)
+        monkeypatch.setattr(astro_tide, 'BASE_URL', server.url)
+        monkeypatch.setattr(hko_cache, 'CACHE', hko_cache.ResponseCache())
+        monkeypatch.setitem(feeds.PARSERS, astro_tide.URL, parse)
+        return server, parses
+
+    servers = []
+    yield serve
+    for server in servers:
+        server.stop()
+
+
+def test_astro_and_tide_share_one_fetch_and_parse(serve):
+    server, parses = serve()
+    assert hko.astro() == {'status': 1, 'result': {
+        'sunrise': '06:20', 'sunset': '18:01', 'moonrise': '10:00', 'moonset': '21:00', 'date': '20181018'}}
+    assert hko.tide() == {'status': 1, 'result': {
+        'low_tide_1': {'value': '0.8', 'time': '02:10'}, 'high_tide_1': {'value': '2.0', 'time': '08:30'},
+        'low_tide_2': {'value': '0.9', 'time': '14:00'}, 'high_tide_2': {'value': '2.1', 'time': '20:30'},
+        'date': '20181018'}}
+    assert hko.astro_tide()['result']['sunrise'] == '06:20'
+    assert server.requests == [astro_tide.URL]
+    assert len(parses) == 1
+
+
+def test_concurrent_readers_share_one_fetch(serve):
+    server, parses = serve(latency=0.2)
+    results = call_concurrently(lambda: (hko.astro(), hko.tide()), callers=20)
+    assert server.requests == [astro_tide.URL]
+    assert len(parses) == 1
+    assert all(result == results[0] for result in results)
+
+
+def test_views_share_the_status(serve):
+    serve(b'06:20@18:01')
+    assert hko.astro() == {'result': '', 'status': 2}
+    assert hko.tide() == {'result': '', 'status': 2}
+
+
+def test_register_rejects_a_second_parser():
+    feeds.register(astro_tide.URL, feeds.PARSERS[astro_tide.URL])
+    with pytest.raises(ValueError):
+        feeds.register(astro_tide.URL, lambda data: None)
+
+
+def test_feeds_read_by_several_modules_are_registered():
+    readers = {}
+    for info in pkgutil.iter_modules(hko.__path__):
+        module = importlib.import_module('hko.' + info.name)
+        for name, value in vars(module).items():
+            if name.startswith('URL') and isinstance(value, str):
+                readers.setdefault(value, set()).add(info.name)
+    assert {url for url, modules in readers.items() if len(modules) > 1} <= set(feeds.PARSERS)
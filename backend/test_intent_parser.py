@@ -0,0 +1,163 @@
+import random
+
+import pytest
+
+import app
+from intent_parser import IntentParser
+
+
+# Messages as the frontend sends them, plus free text with tricky substrings
+CORPUS = [
+    "hi",
+    "Hello there",
+    "Good evening!",
+    "Weather Query",
+    "What's the weather like in Central?",
+    "What's the weather like in Causeway Bay?",
+    "Show me the today weather forecast for Wan Chai",
+    "Show me the tomorrow weather forecast for Tai Po",
+    "Show me the 2-day weather forecast for Shatin",
+    "Show me the 3-day weather forecast for Yuen Long",
+    "Show me the overall for Tuen Mun today forecast",
+    "Show me the temperature for Central 2-day forecast",
+    "Show me the humidity for Wan Chai 3-day forecast",
+    "Show me the wind for Causeway Bay tomorrow forecast",
+    "Show me the uv index for Tai Po today forecast",
+    "Show me the general for Shatin today forecast",
+    "Tuen Mun",
+    "yuen long please",
+    "which district is the rainiest",
+    "this is the 3 day and the 2 day forecast for central",
+    "is it windy in wan chai today, and what about the temperature tomorrow?",
+    "central or shatin, humidity and uv for today",
+    "tell me the forecast",
+    "what can you do",
+    "CENTRAL TEMPERATURE TODAY",
+    "the 3day outlook of tai po wind",
+    "",
+]
+
+
+# How app read each slot before the intent parser, one keyword list at a
+# time, for the districts it knew then
+def is_greeting(text):
+    """Check if the text is a greeting"""
+    greetings = ['hi', 'hello', 'hey', 'good morning', 'good afternoon', 'good evening']
+    return any(greeting in text.lower() for greeting in greetings)
+
+
+def is_weather_query(text):
+    """Check if the text contains weather-related keywords"""
+    weather_keywords = ['weather', 'temperature', 'rain', 'humidity', 'uv', 'forecast', 'wind']
+    return any(keyword in text.lower() for keyword in weather_keywords)
+
+
+def extract_district(text):
+    """Extract Hong Kong district from text"""
+    for district in app.DISTRICT_COORDINATES.keys():
+        if district in text.lower():
+            return district
+    return None
+
+
+def get_forecast_period(text):
+    """Extract forecast period from text"""
+    text = text.lower()
+    if '3 day' in text or '3-day' in text or '3day' in text:
+        return '3day'
+    elif '2 day' in text or '2-day' in text or '2day' in text:
+        return '2day'
+    elif 'tomorrow' in text:
+        return 'tomorrow'
+    elif 'today' in text:
+        return 'today'
+    return None
+
+
+def get_weather_info_type(text):
+    """Extract specific weather information type from text"""
+    text = text.lower()
+    if 'wind' in text:
+        return 'wind'
+    elif 'temperature' in text:
+        return 'temperature'
+    elif 'humidity' in text:
+        return 'humidity'
+    elif 'uv' in text:
+        return 'uv'
+    elif 'overall' in text or 'general' in text:
+        return 'overall'
+    return 'overall'
+
+
+def legacy(text):
+    text = text.lower()
+    return (
+        is_greeting(text),
+        extract_district(text),
+        get_forecast_period(text),
+        get_weather_info_type(text),
+        is_weather_query(text),
+        any(keyword in text for keyword in ['overall', 'general', 'temperature', 'humidity', 'wind', 'uv']),
+    )
+
+
+@pytest.mark.parametrize('message', CORPUS)
+def test_matches_legacy_helpers(message):
+    assert tuple(app.get_intent_parser().parse(message)) == legacy(message)
+
+
+def test_overlapping_phrases():
+    parser = IntentParser({'tai po': ['tai po market'], 'po': []})
+    # 'hi' inside 'which', 'po' inside 'tai po market': every occurrence counts
+    intent = parser.parse('Which way to Tai Po Market?')
+    assert intent.greeting
+    assert intent.district == 'tai po'
+    assert parser.parse('po toi').district == 'po'
+
+
+def test_longest_district_name_wins():
+    parser = IntentParser({'tai po': [], 'tai po kau': [], 'po': ['po toi']})
+    assert parser.parse('weather in tai po kau').district == 'tai po kau'
+    assert parser.parse('weather in tai po').district == 'tai po'
+    # A name inside a longer one is dropped even when another phrase
+    # starts at the same place
+    assert parser.parse('tai po kau and po toi').district == 'tai po kau'
+    # Names that do not overlap are still taken in priority order
+    assert parser.parse('po toi or tai po').district == 'tai po'
+    # Inside a longer keyword, 'temperature', the longest name still wins
+    assert IntentParser({'per': [], 'temper': []}).parse('temperature').district == 'temper'
+
+
+def test_many_aliases():
+    random.seed(1)
+    letters = 'abcdefghijklmnopqrstuvwxyz '
+    districts = {}
+    for i in range(300):
+        name = 'district {}'.format(i)
+        districts[name] = [''.join(random.choice(letters) for _ in range(random.randint(2, 8))) for _ in range(3)]
+    parser = IntentParser(districts)
+    for _ in range(500):
+        text = ''.join(random.choice(letters) for _ in range(60))
+        # Every occurrence of every alias, less those inside a longer one
+        found = [(start, start + len(alias), name) for name, aliases in districts.items()
+                 for alias in [name] + aliases for start in range(len(text)) if text.startswith(alias, start)]
+        named = {name for start, end, name in found
+                 if not any(s <= start and end <= e and e - s > end - start for s, e, _ in found)}
+        expected = next((name for name in districts if name in named), None)
+        assert parser.parse(text).district == expected
+
+
+def test_chat_flow(monkeypatch):
+    monkeypatch.setattr(app, 'format_weather_response', lambda *args: 'answer')
+    client = app.app.test_client()
+
+    def chat(message):
+        return client.post('/api/chat', json={'message': message}).get_json()
+
+    assert chat('Weather Query')['needs_location']
+    reply = chat("What's the weather like in Tai Po?")
+    assert reply['needs_forecast_period'] and reply['selected_location'] == 'tai po'
+    reply = chat('Show me the 2-day weather forecast for tai po')
+    assert reply['needs_info_type'] and reply['selected_period'] == '2day'
+    assert chat('Show me the wind for tai po 2-day forecast')['message'] == 'answer'
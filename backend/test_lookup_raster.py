@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+import lookup_raster
+import spatial_index
+from compact_assets import GridPoint, NowcastPoint, PointTable, pack
+from lookup_raster import LookupRaster, build, checksum
+from spatial_index import ASSETS, GRID_INDEX, RAINFALL_INDEX, RASTER, NearestIndex, VectorizedIndex
+
+
+def exact(grid_index, nowcast_index, lat, lng):
+    """What local_weather and rainfall_nowcast picked before the table"""
+    point, distance = grid_index.nearest(lat, lng)
+    grid = (point.grid, point.name) if distance < 10 else (None, None)
+    point, distance = nowcast_index.nearest(lat, lng)
+    return grid, None if distance > 10 else point
+
+
+def sample(raster, count, seed):
+    """Random locations over the table and beyond, half of them on cell edges"""
+    rng = random.Random(seed)
+    south, west = raster.lat0 - 0.05, raster.lng0 - 0.05
+    north = raster.lat0 + raster.rows * raster.step + 0.05
+    east = raster.lng0 + raster.cols * raster.step + 0.05
+    locations = [(rng.uniform(south, north), rng.uniform(west, east)) for _ in range(count // 2)]
+    for _ in range(count - len(locations)):
+        row, col = rng.randrange(raster.rows), rng.randrange(raster.cols)
+        locations.append((raster.lat0 + row * raster.step, raster.lng0 + (col + rng.random()) * raster.step))
+    return locations
+
+
+def test_table_matches_exact_search():
+    for lat, lng in sample(RASTER, 2000, 0):
+        assert (RASTER.grid(lat, lng), RASTER.nowcast_point(lat, lng)) == \
+            exact(GRID_INDEX, RAINFALL_INDEX, lat, lng), (lat, lng)
+
+
+def test_lookups_in_hong_kong():
+    assert RASTER.grid(22.2828, 114.1588) == ('0906', '中環')
+    assert RASTER.nowcast_point(22.2828, 114.1588) is not None
+    # Guangzhou
+    assert RASTER.grid(23.1291, 113.2644) == (None, None)
+    assert RASTER.nowcast_point(23.1291, 113.2644) is None
+
+
+def test_built_table_matches_exact_search(tmp_path):
+    # Duplicated locations, names shared across grids, and a point far off
+    grid = [GridPoint(22.30, 114.10, '0101', 'a'), GridPoint(22.30, 114.10, '0102', 'b'),
+            GridPoint(22.30, 114.11, '0101', 'a'), GridPoint(22.31, 114.10, '0103', 'a'),
+            GridPoint(22.32, 114.12, '0104', 'c'), GridPoint(22.45, 114.30, '0105', 'd')]
+    nowcast = [NowcastPoint(22.301, 114.102), NowcastPoint(22.32, 114.121), NowcastPoint(22.4, 114.2)]
+    sources = [tmp_path / 'grid.bin', tmp_path / 'nowcast.bin']
+    sources[0].write_bytes(pack([point._asdict() for point in grid], 4))
+    sources[1].write_bytes(pack([point._asdict() for point in nowcast], 3))
+    grid, nowcast = PointTable(sources[0]), PointTable(sources[1])
+    path = tmp_path / 'raster.bin'
+    path.write_bytes(build(grid, nowcast, checksum(sources), step=0.005))
+    raster = LookupRaster(path, grid, nowcast, sources)
+    grid_index, nowcast_index = NearestIndex(grid), VectorizedIndex(nowcast)
+    for lat, lng in sample(raster, 2000, 1):
+        assert (raster.grid(lat, lng), raster.nowcast_point(lat, lng)) == \
+            exact(grid_index, nowcast_index, lat, lng), (lat, lng)
+
+
+def test_rejects_stale_table(tmp_path):
+    sources = [ASSETS / name for name in lookup_raster.SOURCES]
+    LookupRaster(ASSETS / 'lookup_raster.bin', spatial_index.GRID, spatial_index.RAINFALL_MAPPING, sources)
+    changed = tmp_path / 'grid_location.bin'
+    changed.write_bytes(sources[0].read_bytes() + b'\0')
+    with pytest.raises(ValueError, match='out of date'):
+        LookupRaster(ASSETS / 'lookup_raster.bin', spatial_index.GRID, spatial_index.RAINFALL_MAPPING,
+                     [changed, sources[1]])
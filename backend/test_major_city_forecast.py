@@ -0,0 +1,94 @@
+import asyncio
+import importlib
+import time
+
+import pytest
+
+import hko
+import hko.aio
+import hko_cache
+import hko_client
+from fake_hko import FakeHKO
+
+
+major_city_forecast = importlib.import_module('hko.major_city_forecast')
+
+PAYLOADS = {
+    'Asia': 'Bangkok#25#33#Cloudy#pic62@Beijing#8#17#Sunny#pic50',
+    'Africa': 'Cairo#20#29#Sunny#pic50',
+    'AustraliaSouthPacific': 'Sydney#14#22#Showers#pic63',
+    'Europe': 'London#9#15#Rain#pic64@Paris#8#16#Cloudy#pic62',
+    'NorthCentralAmerica': 'New York#10#18#Fine#pic51',
+    'SouthAmerica': 'Lima#16#21#Overcast#pic62',
+}
+
+
+def routes(lang='EN', skip=()):
+    return {(url_en if lang == 'EN' else url_uc): PAYLOADS[name].encode()
+            for name, url_uc, url_en in major_city_forecast.REGIONS if name not in skip}
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    """Start a fake HKO server for the major city feeds, with an empty cache"""
+    servers = []
+
+    def serve(**kwargs):
+        server = FakeHKO(kwargs.pop('routes'), **kwargs).start()
+        servers.append(server)
+        monkeypatch.setattr(major_city_forecast, 'BASE_URL', server.url)
+        monkeypatch.setattr(hko_cache, 'CACHE', hko_cache.ResponseCache())
+        return server
+
+    yield serve
+    for server in servers:
+        server.stop()
+
+
+def test_parse():
+    assert major_city_forecast.parse(PAYLOADS['Asia']) == [
+        {'place': 'Bangkok', 'mintemp': '25', 'maxtemp': '33', 'status': 'Cloudy', 'photo': 'pic62'},
+        {'place': 'Beijing', 'mintemp': '8', 'maxtemp': '17', 'status': 'Sunny', 'photo': 'pic50'},
+    ]
+    with pytest.raises(IndexError):
+        major_city_forecast.parse('Bangkok#25#33')
+
+
+def test_all_regions(serve):
+    serve(routes=routes('UC'))
+    response = hko.major_city_forecast('UC')
+    assert response['status'] == 1
+    # A full answer has the keys it always had
+    assert sorted(response) == ['result', 'status']
+    assert response['result'] == {name: major_city_forecast.parse(PAYLOADS[name]) for name in PAYLOADS}
+    assert asyncio.run(hko.aio.major_city_forecast('UC')) == response
+
+
+def test_region_functions(serve):
+    serve(routes=routes('EN'))
+    assert major_city_forecast.europe('EN') == major_city_forecast.parse(PAYLOADS['Europe'])
+    assert major_city_forecast.south_america('EN') == major_city_forecast.parse(PAYLOADS['SouthAmerica'])
+
+
+def test_failed_region_keeps_the_others(serve):
+    serve(routes=routes('EN', skip=['Europe']))
+    response = hko.major_city_forecast('EN')
+    assert response['status'] == 1
+    assert response['failed'] == ['Europe']
+    assert response['result']['Europe'] == ''
+    assert response['result']['Asia'] == major_city_forecast.parse(PAYLOADS['Asia'])
+
+
+def test_every_region_failing(serve, monkeypatch):
+    serve(routes={}).stop()
+    monkeypatch.setattr(hko_client, 'CLIENT', hko_client.HKOClient(retries=0))
+    assert hko.major_city_forecast('EN') == {'result': '', 'failed': list(PAYLOADS), 'status': 5}
+    assert hko.major_city_forecast('XX') == {'result': '', 'status': 0}
+
+
+def test_regions_are_fetched_in_parallel(serve):
+    server = serve(routes=routes('EN'), latency=0.2)
+    start = time.perf_counter()
+    assert hko.major_city_forecast('EN')['status'] == 1
+    assert time.perf_counter() - start < 0.6
+    assert len(server.requests) == 6
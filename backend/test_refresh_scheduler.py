@@ -0,0 +1,79 @@
+import time
+
+import hko_cache
+import hko_client
+import weather_data
+from fake_hko import FakeHKO
+from hko_cache import ResponseCache
+from refresh_scheduler import RefreshScheduler, hot_urls
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_hot_urls():
+    districts = {'central': {'lat': 22.2828, 'lng': 114.1588},
+                 'also central': {'lat': 22.2829, 'lng': 114.1589},
+                 'guangzhou': {'lat': 23.1291, 'lng': 113.2644}}
+    assert hot_urls(districts) == [
+        weather_data.HKO_WEB_URL + 'wxinfo/json/warnsum.xml',
+        weather_data.HKO_PDA_URL + 'locspc/android_data/fnd_e.xml',
+        weather_data.HKO_PDA_URL + 'locspc/android_data/fuve.xml',
+        weather_data.HKO_PDA_URL + 'locspc/android_data/gridData/0906_tc.xml',
+    ]
+
+
+def test_stale_responses_are_served_while_refreshing():
+    class Clock(object):
+        now = 0.0
+
+        def __call__(self):
+            return self.now
+
+    clock = Clock()
+    with FakeHKO({'fuve.xml': b'uv'}) as server:
+        cache = ResponseCache(policies=[('', 10)], clock=clock, stale_while_revalidate=True)
+        url = server.url + 'fuve.xml'
+        first = cache.get(url)
+        clock.now = 15
+        assert cache.get(url) is first
+        wait_for(lambda: len(server.requests) == 2 and cache.get(url) is not first)
+        clock.now = 100
+        assert cache.get(url) is not first
+    assert cache.stats()['stale_hits'] == 1
+
+
+def test_scheduler_keeps_feeds_warm(monkeypatch):
+    with FakeHKO({'a.xml': b'a', 'b.xml': b'b'}) as server:
+        cache = ResponseCache(policies=[('a.xml', 0.2), ('b.xml', 10)])
+        monkeypatch.setattr(hko_cache, 'CACHE', cache)
+        urls = [server.url + 'a.xml', server.url + 'b.xml']
+        scheduler = RefreshScheduler(urls).start()
+        try:
+            wait_for(lambda: server.requests.count('a.xml') >= 4)
+            fetched = len(server.requests)
+            for _ in range(20):
+                for url in urls:
+                    assert cache.get(url).ok
+            assert cache.stats()['misses'] == 0
+        finally:
+            scheduler.stop()
+    assert server.requests.count('b.xml') == 1
+    assert fetched >= 5
+
+
+def test_failed_refreshes_are_retried(monkeypatch):
+    answers = [503, 200]
+    with FakeHKO({'a.xml': lambda handler: (answers.pop(0) if answers else 200, {}, b'a')}) as server:
+        monkeypatch.setattr(hko_cache, 'CACHE', ResponseCache())
+        monkeypatch.setattr(hko_client, 'CLIENT', hko_client.HKOClient(retries=0))
+        scheduler = RefreshScheduler([server.url + 'a.xml'], retry_delay=0.05).start()
+        try:
+            wait_for(lambda: scheduler.refreshes == 1)
+        finally:
+            scheduler.stop()
+    assert scheduler.failures == 1
@@ -0,0 +1,186 @@
+import json
+import multiprocessing
+import pickle
+import sqlite3
+
+import pytest
+
+import app
+import hko_cache
+import weather_data
+from conftest import FakeClock
+from district_snapshot import DistrictSnapshots
+from fake_hko import FakeHKO
+from session_store import MemoryBackend, Session, SessionStore, SQLiteBackend
+from test_district_snapshot import routes
+
+
+@pytest.fixture
+def store(monkeypatch):
+    clock = FakeClock()
+    store = SessionStore(MemoryBackend(maxsize=4, ttl=100, clock=clock))
+    monkeypatch.setattr(app, 'SESSIONS', store)
+    return store
+
+
+@pytest.fixture
+def chat():
+    client = app.app.test_client()
+    state = {'session_id': None}
+
+    def send(message):
+        reply = client.post('/api/chat', json={'message': message, 'session_id': state['session_id']}).get_json()
+        state['session_id'] = reply['session_id']
+        return reply
+
+    return send
+
+
+def test_memory_backend_ttl_and_lru():
+    clock = FakeClock()
+    backend = MemoryBackend(maxsize=2, ttl=10, clock=clock)
+    backend.set('a', 1)
+    backend.set('b', 2)
+    assert backend.get('a') == 1
+    backend.set('c', 3)  # evicts b, the least recently used
+    assert backend.get('b') is None
+    clock.now = 5
+    backend.set('a', 1)
+    clock.now = 12
+    assert backend.get('c') is None
+    assert backend.get('a') == 1
+    backend.delete('a')
+    assert backend.get('a') is None and len(backend) == 0
+
+
+def test_sqlite_backend_ttl_and_eviction(tmp_path):
+    clock = FakeClock()
+    backend = SQLiteBackend(str(tmp_path / 'sessions.sqlite3'), maxsize=2, ttl=10, clock=clock)
+    backend.set('a', 1)
+    clock.now = 1
+    backend.set('b', 2)
+    clock.now = 2
+    backend.set('c', 3)  # evicts a, the one saved longest ago
+    assert backend.get('a') is None and backend.get('b') == 2
+    clock.now = 11
+    assert backend.get('b') is None and backend.get('c') == 3
+    backend.delete('c')
+    assert backend.get('c') is None and len(backend) == 1
+
+
+def test_sqlite_backend_stores_json(tmp_path):
+    path = str(tmp_path / 'sessions.sqlite3')
+    backend = SQLiteBackend(path)
+    backend.set('s', {'district': 'tai po', 'period': None, 'info_type': None})
+    with sqlite3.connect(path) as db:
+        assert json.loads(db.execute('SELECT value FROM sessions').fetchone()[0])['district'] == 'tai po'
+        # Anything else in the file, such as a pickle, is never loaded
+        db.execute('UPDATE sessions SET value = ?', (pickle.dumps({'district': 'tai po'}),))
+    assert backend.get('s') is None
+
+
+def save_session(path, session_id):
+    store = SessionStore(SQLiteBackend(path))
+    session = Session(session_id)
+    session.remember('tai po', 'today', 'wind')
+    store.save(session)
+
+
+def test_sqlite_backend_shares_sessions_between_processes(tmp_path):
+    path = str(tmp_path / 'sessions.sqlite3')
+    store = SessionStore(SQLiteBackend(path))
+    worker = multiprocessing.get_context('spawn').Process(target=save_session, args=(path, 's'))
+    worker.start()
+    worker.join(timeout=30)
+    assert worker.exitcode == 0
+    assert store.get('s').slots == {'district': 'tai po', 'period': 'today', 'info_type': 'wind'}
+
+
+def test_unknown_sessions_start_afresh(store):
+    session = store.get('no-such-id')
+    assert session.id != 'no-such-id'
+    assert store.get(None).id != session.id
+    session.remember('tai po')
+    store.save(session)
+    assert store.get(session.id).slots == session.slots
+    store.backend.clock.now = 101
+    assert store.get(session.id).id != session.id
+
+
+@pytest.mark.parametrize('session_id', [[1], {'a': 1}, 42, 'x' * 65, ''])
+def test_invalid_session_ids_start_afresh(store, feeds, session_id):
+    session = store.get(session_id)
+    assert isinstance(session.id, str) and session.id != session_id
+    reply = app.app.test_client().post('/api/chat', json={'message': 'temperature in tai po today',
+                                                          'session_id': session_id})
+    assert reply.status_code == 200
+    assert reply.get_json()['session_id'] != session_id
+
+
+def test_only_conversations_with_slots_are_saved(store):
+    session = store.get()
+    store.save(session)
+    assert len(store.backend) == 0
+    session.remember('tai po', 'today')
+    store.save(session)
+    assert len(store.backend) == 1
+    # A stored conversation is saved again to restart its TTL, changed or not
+    store.backend.clock.now = 60
+    store.save(store.get(session.id))
+    store.backend.clock.now = 120
+    assert store.get(session.id).slots['period'] == 'today'
+
+
+def test_unchanged_slots_are_not_rewritten(store):
+    session = store.get()
+    session.remember('tai po')
+    assert session.changed
+    store.save(session)
+    session = store.get(session.id)
+    session.remember('tai po')
+    assert session.stored and not session.changed
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Serve every chat feed from a fake HKO server through a fresh cache"""
+    with FakeHKO(routes()) as server:
+        monkeypatch.setattr(weather_data, 'HKO_PDA_URL', server.url)
+        monkeypatch.setattr(weather_data, 'HKO_WEB_URL', server.url)
+        monkeypatch.setattr(hko_cache, 'CACHE', hko_cache.ResponseCache())
+        monkeypatch.setattr(app, 'SNAPSHOTS', DistrictSnapshots({}))
+        yield server
+
+
+def test_follow_ups_reuse_slots_and_feeds(store, upstream, chat):
+    grid = weather_data.GRID_DATA_URL.format(app.get_gazetteer().coords('tai po')['grid'])
+    answer = chat('temperature in tai po today')['message']
+    assert answer.startswith('Current temperature in Tai po')
+    assert upstream.requests == [grid]
+    # Only the info type changes: the district and period are reused, and
+    # the response cache answers the feed
+    assert chat('and the wind?')['message'].startswith('Current wind conditions in Tai po')
+    assert upstream.requests == [grid]
+    # Only the period changes: the info type is kept
+    assert chat('what about tomorrow')['message'].startswith('1-day wind forecast for Tai po')
+    assert upstream.requests == [grid, weather_data.FORECAST_URLS['EN']]
+    # Small talk does not pick the remembered district
+    assert chat('thanks')['needs_forecast_period'] is False
+
+
+def test_follow_up_asks_for_missing_slots(store, feeds, chat):
+    reply = chat('Sai Kung')
+    assert reply['needs_forecast_period'] and reply['selected_location'] == 'sai kung'
+    reply = chat('today please')
+    assert reply['needs_info_type'] and reply['selected_period'] == 'today'
+    assert chat('humidity')['message'].startswith('Current humidity in Sai kung')
+
+
+def test_without_session_nothing_is_remembered(store, feeds):
+    client = app.app.test_client()
+    first = client.post('/api/chat', json={'message': 'temperature in tai po today'}).get_json()
+    second = client.post('/api/chat', json={'message': 'and the wind?'}).get_json()
+    assert first['session_id'] != second['session_id']
+    assert second['needs_location']
+    # Only the question that resolved a district was worth keeping
+    assert len(store.backend) == 1
@@ -0,0 +1,125 @@
+import multiprocessing
+
+import pytest
+
+import hko_client
+import shared_cache
+from conftest import FakeClock
+from fake_hko import FakeHKO
+from hko_cache import ResponseCache
+from shared_cache import SQLiteStore
+
+
+URL = 'locspc/android_data/fnd_e.xml'
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'cache.sqlite3')
+
+
+def test_store_round_trip(path):
+    with FakeHKO({URL: '{"天氣": 1}'.encode()}) as server:
+        response = hko_client.HKOClient().get(server.url + URL)
+    store = SQLiteStore(path)
+    store.set(server.url + URL, response, 60)
+    entry = SQLiteStore(path).get(server.url + URL)
+    assert entry.expires - entry.stored == 60
+    assert entry.response.status_code == 200
+    assert entry.response.content == response.content
+    assert entry.response.json() == {'天氣': 1}
+    assert entry.response.headers['content-length'] == response.headers['content-length']
+    assert store.get('missing') is None
+
+
+def test_one_lock_holder(path):
+    clock = FakeClock()
+    first, second = SQLiteStore(path, lock_timeout=10, clock=clock), SQLiteStore(path, lock_timeout=10, clock=clock)
+    assert first.acquire(URL)
+    assert not second.acquire(URL)
+    assert second.locked(URL)
+    second.release(URL)  # only the holder can release
+    assert not second.acquire(URL)
+    first.release(URL)
+    assert second.acquire(URL)
+    # A holder that never releases loses the lock after lock_timeout
+    clock.now = 10
+    assert first.acquire(URL)
+
+
+def test_processes_read_each_others_responses(path):
+    with FakeHKO({URL: b'{}'}) as server:
+        first = ResponseCache(shared=SQLiteStore(path))
+        second = ResponseCache(shared=SQLiteStore(path))
+        response = first.get(server.url + URL)
+        assert second.get(server.url + URL).content == response.content
+        assert server.requests == [URL]
+        assert second.stats()['shared_hits'] == 1
+        # Cached locally from then on
+        second.get(server.url + URL)
+        assert second.stats()['hits'] == 1
+
+
+def test_others_read_previous_value_while_one_refreshes(path):
+    clock = FakeClock()
+    with FakeHKO({URL: b'new'}) as server:
+        url = server.url + URL
+        holder = SQLiteStore(path, clock=clock)
+        holder.set(url, hko_client.HKOClient().get(url), 60)
+        server.requests.clear()
+        clock.now += 120
+        assert holder.acquire(url)
+        cache = ResponseCache(shared=SQLiteStore(path, clock=clock))
+        assert cache.refresh(url).content == b'new'
+        assert server.requests == []
+
+
+def test_refresh_reuses_recent_shared_response(path):
+    with FakeHKO({URL: b'{}'}) as server:
+        first = ResponseCache(shared=SQLiteStore(path))
+        second = ResponseCache(shared=SQLiteStore(path))
+        first.refresh(server.url + URL)
+        second.refresh(server.url + URL, max_age=60)
+        assert server.requests == [URL]
+        second.refresh(server.url + URL)
+        assert server.requests == [URL, URL]
+
+
+def test_waits_for_first_fetch_then_fetches_if_it_failed(path):
+    with FakeHKO({URL: b'{}'}) as server:
+        holder = SQLiteStore(path, lock_timeout=0.2)
+        assert holder.acquire(server.url + URL)
+        cache = ResponseCache(shared=SQLiteStore(path))
+        assert cache.get(server.url + URL).ok
+        assert server.requests == [URL]
+
+
+def fetch_in_worker(path, url, start, results):
+    hko_client.CLIENT = hko_client.HKOClient()
+    cache = ResponseCache(shared=SQLiteStore(path))
+    start.wait()
+    results.put(cache.get(url).content)
+
+
+def test_one_worker_fetches_for_all(path):
+    context = multiprocessing.get_context('fork')
+    with FakeHKO({URL: b'{}'}, latency=0.3) as server:
+        start, results = context.Event(), context.Queue()
+        workers = [context.Process(target=fetch_in_worker, args=(path, server.url + URL, start, results))
+                   for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        start.set()
+        contents = [results.get(timeout=10) for _ in workers]
+        for worker in workers:
+            worker.join()
+    assert contents == [b'{}'] * 4
+    assert server.requests == [URL]
+
+
+
+def test_lock_outlasts_the_slowest_fetch():
+    client = hko_client.HKOClient()
+    retry = client.session.get_adapter('http://').max_retries
+    slowest = (retry.total + 1) * sum(client.timeout) + sum(retry.backoff_factor * 2 ** i for i in range(retry.total))
+    assert shared_cache.LOCK_TIMEOUT > slowest
@@ -0,0 +1,124 @@
+import importlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+import hko
+import hko_cache
+import weather_data
+from conftest import FakeClock
+from fake_hko import FakeHKO
+from hko_cache import ResponseCache, SingleFlight, cached_get, prefetched, single_flight
+from test_district_snapshot import warnings_payload
+
+
+WARNINGS = {'WTS': {'Name': 'Thunderstorm Warning', 'InForce': 1}}
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """Serve the warnings slowly from a fake HKO server through a fresh cache"""
+    with FakeHKO({'wxinfo/json/warnsum.xml': warnings_payload(WARNINGS)}, latency=0.2) as server:
+        monkeypatch.setattr(weather_data, 'HKO_WEB_URL', server.url)
+        monkeypatch.setattr(importlib.import_module('hko.weather_warning'), 'BASE_URL', server.url)
+        monkeypatch.setattr(hko_cache, 'CACHE', ResponseCache())
+        yield server
+
+
+def call_concurrently(func, callers=100):
+    start = threading.Barrier(callers)
+
+    def call(_):
+        start.wait()
+        return func()
+
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        return list(pool.map(call, range(callers)))
+
+
+def test_hundred_callers_one_fetch(server):
+    results = call_concurrently(lambda: weather_data.weather_warning('EN'))
+    assert server.requests == ['wxinfo/json/warnsum.xml']
+    assert results[0] == {'result': WARNINGS, 'status': 1}
+    # Every caller got its own copy of the one parsed result
+    assert all(result == results[0] for result in results)
+    assert len({id(result) for result in results}) == len(results)
+
+
+def test_hko_package_callers_one_fetch(server):
+    results = call_concurrently(lambda: hko.weather_warning('EN'))
+    assert server.requests == ['wxinfo/json/warnsum.xml']
+    assert all(result == {'result': WARNINGS, 'status': 1} for result in results)
+
+
+def test_cache_misses_share_one_fetch(server):
+    url = server.url + 'wxinfo/json/warnsum.xml'
+    results = call_concurrently(lambda: hko_cache.CACHE.get(url))
+    assert server.requests == ['wxinfo/json/warnsum.xml']
+    assert all(result is results[0] for result in results)
+    assert hko_cache.CACHE.stats()['coalesced'] + hko_cache.CACHE.stats()['hits'] == 99
+
+
+def test_result_reused_while_responses_unchanged(fetches, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(hko_cache, 'CACHE', ResponseCache(clock=clock))
+    calls = []
+
+    @single_flight
+    def fetch(lang):
+        calls.append(lang)
+        return {'body': cached_get('http://pda.weather.gov.hk/unknown_' + lang).content}
+
+    first = fetch('EN')
+    assert fetch('EN') == first
+    assert fetch('UC') == {'body': b'http://pda.weather.gov.hk/unknown_UC'}
+    assert calls == ['EN', 'UC']
+    # Once the response expires the fetcher runs, and fetches, again
+    clock.now = hko_cache.DEFAULT_TTL
+    assert fetch('EN') == first
+    assert calls == ['EN', 'UC', 'EN']
+
+
+def test_callers_cannot_change_the_shared_result():
+    @single_flight
+    def fetch():
+        return {'result': {'forecast_detail': [{'max_temp': 27}]}, 'status': 1}
+
+    first = fetch()
+    first['result']['forecast_detail'][0]['max_temp'] = 99
+    first['status'] = 5
+    assert fetch() == {'result': {'forecast_detail': [{'max_temp': 27}]}, 'status': 1}
+
+
+def test_followers_get_the_leaders_exception():
+    flights = SingleFlight()
+    started = threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError('bad payload')
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        leader = pool.submit(flights.do, 'key', fail)
+        started.wait()
+        followers = [pool.submit(flights.do, 'key', fail) for _ in range(4)]
+        for future in [leader] + followers:
+            with pytest.raises(ValueError):
+                future.result()
+    assert flights.shared == 4
+
+
+def test_prefetched_calls_run_on_their_own(server):
+    url = server.url + 'wxinfo/json/warnsum.xml'
+    response = requests.Response()
+    response._content = warnings_payload({})
+    response.encoding = 'utf-8'
+    with prefetched({url: response}):
+        assert weather_data.weather_warning('EN') == {'result': {}, 'status': 1}
+    assert server.requests == []
+    # Nothing answered inside the block is kept for later callers
+    assert weather_data.weather_warning('EN') == {'result': WARNINGS, 'status': 1}
@@ -0,0 +1,134 @@
+import json
+import os
+import random
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import hko_cache
+import weather_data
+from compact_assets import GridPoint
+from distance_calculation import distance_calculation
+from spatial_index import GRID, GRID_INDEX, NearestIndex, RAINFALL_MAPPING, RAINFALL_INDEX, VectorizedIndex
+
+
+def scan(points, lat, lng):
+    """The full scan local_weather and rainfall_nowcast used before the indexes existed"""
+    distances = [distance_calculation(lat, lng, i.lat, i.lng) for i in points]
+    best = min(range(len(points)), key=lambda i: distances[i])
+    return points[best], distances[best]
+
+
+LOCATIONS = [
+    (22.2828, 114.1588),  # Central
+    (22.3911, 113.9714),  # Tuen Mun
+    (22.4445, 114.0225),  # Yuen Long
+    (22.3193, 114.1694),
+    (22.205, 114.105),    # exactly on a half-step grid point
+    (22.13, 113.81),      # corner of the grid, duplicated coordinates
+    (22.5, 114.6),        # east of the grid
+    (23.1291, 113.2644),  # Guangzhou, out of range
+    (0.0, 0.0),
+]
+
+
+def test_nearest_matches_scan():
+    for lat, lng in LOCATIONS:
+        expected, expected_distance = scan(GRID, lat, lng)
+        nearest, distance = GRID_INDEX.nearest(lat, lng)
+        assert nearest == expected
+        assert distance == expected_distance
+
+
+def test_rainfall_nearest_matches_scan():
+    for lat, lng in LOCATIONS:
+        expected, expected_distance = scan(RAINFALL_MAPPING, lat, lng)
+        nearest, distance = RAINFALL_INDEX.nearest(lat, lng)
+        assert nearest == expected
+        assert distance == expected_distance
+
+
+def test_rainfall_nearest_many_matches_nearest():
+    assert RAINFALL_INDEX.nearest_many(LOCATIONS) == \
+        [RAINFALL_INDEX.nearest(lat, lng) for lat, lng in LOCATIONS]
+    assert RAINFALL_INDEX.nearest_many([]) == []
+
+
+def test_nearest_prefers_first_of_equal_points():
+    points = [GridPoint(22.3, 114.1, '0101', 'a'),
+              GridPoint(22.3, 114.1, '0101', 'b'),
+              GridPoint(22.4, 114.1, '0102', 'c')]
+    for index in (NearestIndex(points), VectorizedIndex(points)):
+        nearest, _ = index.nearest(22.31, 114.1)
+        assert nearest.name == 'a'
+
+
+def test_lookup_data_is_immutable():
+    with pytest.raises(TypeError):
+        GRID[0] = GRID[1]
+    with pytest.raises(TypeError):
+        RAINFALL_MAPPING[0] = RAINFALL_MAPPING[1]
+    with pytest.raises(AttributeError):
+        GRID[0].grid = '9999'
+    with pytest.raises(TypeError):
+        GRID[0]['dis'] = 0
+    with pytest.raises(ValueError):
+        RAINFALL_INDEX._coords[0, 0] = 0
+
+
+def test_concurrent_lookups():
+    random.seed(3)
+    locations = [(random.uniform(22.15, 22.55), random.uniform(113.85, 114.45)) for _ in range(40)]
+    expected = [(GRID_INDEX.nearest(lat, lng), RAINFALL_INDEX.nearest(lat, lng)) for lat, lng in locations]
+    jobs = list(range(len(locations))) * 25
+    random.shuffle(jobs)
+
+    def lookup(i):
+        lat, lng = locations[i]
+        return i, (GRID_INDEX.nearest(lat, lng), RAINFALL_INDEX.nearest(lat, lng))
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        for i, result in pool.map(lookup, jobs):
+            assert result == expected[i]
+
+
+def test_concurrent_local_weather(monkeypatch):
+    class FakeResponse(object):
+        ok = True
+
+        def __init__(self, url):
+            self.text = json.dumps({'url': url})
+            self.content = self.text.encode()
+
+    monkeypatch.setattr(hko_cache.hko_client, 'get', FakeResponse)
+    monkeypatch.setattr(hko_cache, 'CACHE', hko_cache.ResponseCache())
+    locations = LOCATIONS[:5]
+    expected = [weather_data.local_weather(lat, lng) for lat, lng in locations]
+    assert all(i['status'] == 1 for i in expected)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda i: weather_data.local_weather(*locations[i % 5]), range(500)))
+    assert results == [expected[i % 5] for i in range(500)]
+
+
+def test_empty_index():
+    assert NearestIndex([]).nearest(22.3, 114.1) == (None, None)
+    assert VectorizedIndex([]).nearest(22.3, 114.1) == (None, None)
+
+
+def test_assets_load_on_first_use():
+    # A fresh interpreter, as this one has loaded everything already
+    code = (
+        "import sys, app, spatial_index\n"
+        "assert not {'GRID', 'GRID_INDEX', 'RAINFALL_MAPPING', 'RAINFALL_INDEX'} & set(vars(spatial_index))\n"
+        "assert not {'pkg_resources', 'LatLon23', 'numpy', 'httpx'} & set(sys.modules)\n"
+        "assert app.get_intent_parser().parse('hello').greeting\n"
+        "assert 'RASTER' in vars(spatial_index) and 'GRID_INDEX' not in vars(spatial_index)\n"
+        "spatial_index.preload()\n"
+        "assert not {'GRID_INDEX', 'RAINFALL_INDEX'} & set(vars(spatial_index))\n"
+        "assert 'numpy' not in sys.modules\n"
+    )
+    subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                   env=dict(os.environ, HKO_REFRESH='0'), check=True)
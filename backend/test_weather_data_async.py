@@ -0,0 +1,115 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+import fetch_plan
+import hko
+import hko.aio
+import hko_cache
+import hko_client
+import weather_data
+import weather_data_async
+from fake_hko import FakeHKO
+from fetch_plan import fetch_feeds_async
+
+
+FEEDS = {
+    'locspc/android_data/gridData/0906_tc.xml': json.dumps({'RegionalWeather': {'Temp': {'Value': '25'}}}).encode(),
+    'locspc/android_data/rainfallnowcast/22.286_114.163.xml':
+        b'201810181200@0@201810181230@0@201810181300@0@201810181330@0@201810181400#No rain#\xe7\x84\xa1\xe9\x9b\xa8#x',
+    'locspc/android_data/fuve.xml':
+        b'The maximum UV Index for 18 Oct will be about 7. The intensity of UV radiation wll be high.',
+    'locspc/android_data/fnd_e.xml': json.dumps({'forecast_detail': []}).encode(),
+    'wxinfo/json/warnsum.xml': b'var weather_warning_summary = {"WTS":{"Name":"Thunderstorm Warning","InForce":1}}\n',
+    'locspc/android_data/astro_tide.xml': b'06:20@18:01@10:00@21:00#0.8@02:10#2.0@08:30#0.9@14:00#2.1@20:30#20181018',
+}
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """Point weather_data and hko.astro_tide at a fake HKO server, with an empty cache"""
+    with FakeHKO(FEEDS) as server:
+        monkeypatch.setattr(weather_data, 'HKO_PDA_URL', server.url)
+        monkeypatch.setattr(weather_data, 'HKO_WEB_URL', server.url)
+        monkeypatch.setattr(hko.aio._module('astro_tide'), 'BASE_URL', server.url)
+        monkeypatch.setattr(hko_cache, 'CACHE', hko_cache.ResponseCache())
+        yield server
+
+
+def test_async_functions_match_sync(server):
+    lat, lng = 22.2828, 114.1588
+    calls = [
+        (weather_data.local_weather, weather_data_async.local_weather, (lat, lng)),
+        (weather_data.local_weather, weather_data_async.local_weather, (23.1291, 113.2644)),
+        (weather_data.local_weather, weather_data_async.local_weather, (22, 114)),
+        (weather_data.rainfall_nowcast, weather_data_async.rainfall_nowcast, (lat, lng)),
+        (weather_data.uv_index, weather_data_async.uv_index, ('EN',)),
+        (weather_data.uv_index, weather_data_async.uv_index, ('XX',)),
+        (weather_data.weather_warning, weather_data_async.weather_warning, ('EN',)),
+        (weather_data.several_days_weather_forecast, weather_data_async.several_days_weather_forecast, ('EN',)),
+        (hko.astro, hko.aio.astro, ()),
+        (hko.tide, hko.aio.tide, ()),
+        (hko.astro_tide, hko.aio.astro_tide, ()),
+    ]
+    for sync, coroutine, args in calls:
+        assert asyncio.run(coroutine(*args)) == sync(*args)
+    assert weather_data.local_weather(lat, lng)['status'] == 1
+    assert weather_data.rainfall_nowcast(lat, lng)['status'] == 1
+
+
+def test_async_functions_do_not_block(server, monkeypatch):
+    def blocking_get(url, **kwargs):
+        raise AssertionError('blocking fetch of ' + url)
+
+    monkeypatch.setattr(hko_client, 'get', blocking_get)
+    result = asyncio.run(weather_data_async.uv_index('EN'))
+    assert result['status'] == 1
+    assert result['result']['max_uv_index'] == '7'
+
+
+def test_feeds_are_awaited_together(server):
+    server.latency = 0.2
+    start = time.perf_counter()
+    data = asyncio.run(fetch_feeds_async({'lat': 22.2828, 'lng': 114.1588}, ('local', 'uv', 'warnings')))
+    assert time.perf_counter() - start < 0.5
+    assert [data[feed]['status'] for feed in ('local', 'uv', 'warnings')] == [1, 1, 1]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Replace the shared asyncio client with one that does not retry"""
+    client = hko_client.AsyncHKOClient(retries=0)
+    monkeypatch.setattr(hko_client, 'ASYNC_CLIENT', client)
+    yield client
+    client.close()
+
+
+def test_fetch_errors_keep_sync_statuses(server, client, monkeypatch):
+    monkeypatch.setattr(weather_data, 'HKO_PDA_URL', 'http://127.0.0.1:1/')
+    result = asyncio.run(weather_data_async.several_days_weather_forecast('EN'))
+    assert result == {'result': '', 'status': 5}
+
+
+def test_one_pool_for_every_event_loop(server, client):
+    url = server.url + 'locspc/android_data/fuve.xml'
+    for _ in range(3):
+        assert asyncio.run(client.get(url)).content == FEEDS['locspc/android_data/fuve.xml']
+    assert client.run(client.get(url)).ok
+    assert len(server.requests) == 4
+    assert server.connections == 1
+
+
+def test_chat_feeds_are_awaited_on_the_shared_loop(server, client, monkeypatch):
+    coords = {'lat': 22.2828, 'lng': 114.1588}
+    feeds = ('local', 'uv', 'forecast', 'warnings')
+    expected = {feed: fetch_plan.FEEDS[feed](coords) for feed in feeds}
+    hko_cache.CACHE.clear()
+
+    def blocking_get(url, **kwargs):
+        raise AssertionError('blocking fetch of ' + url)
+
+    monkeypatch.setattr(hko_client, 'get', blocking_get)
+    assert fetch_plan.fetch_feeds(coords, feeds) == expected
+    assert fetch_plan.fetch_many([(coords, feeds), (coords, ('uv',))]) == [expected, {'uv': expected['uv']}]
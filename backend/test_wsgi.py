@@ -0,0 +1,41 @@
+import signal
+
+import requests
+
+import weather_data
+from fake_hko import FakeHKO
+from gunicorn_server import serve
+from test_district_snapshot import routes
+
+
+def test_conversations_span_workers(tmp_path):
+    with FakeHKO(routes()) as upstream:
+        server, url = serve(4, upstream.url, HKO_SESSION_DB=str(tmp_path / 'sessions.sqlite3'))
+        try:
+            session_id = None
+            for _ in range(8):
+                # A new connection per turn, so the turns reach any worker
+                reply = requests.post(url + 'chat', json={'message': 'Tai Po', 'session_id': session_id}).json()
+                session_id = reply['session_id']
+                reply = requests.post(url + 'chat', json={'message': 'today', 'session_id': session_id}).json()
+                assert reply['needs_info_type'] and reply['selected_location'] == 'tai po'
+                assert reply['session_id'] == session_id
+        finally:
+            server.send_signal(signal.SIGTERM)
+            assert server.wait(timeout=30) == 0
+
+
+def test_gunicorn_serves_and_shuts_down(monkeypatch):
+    # The server must not inherit settings from the environment of the tests
+    monkeypatch.setenv('HKO_REFRESH', '0')
+    with FakeHKO(routes()) as upstream:
+        server, url = serve(2, upstream.url)
+        try:
+            reply = requests.post(url + 'chat', json={'message': 'temperature in tai po today'}).json()
+            assert reply['message'].startswith('Current temperature in Tai po is 25')
+        finally:
+            server.send_signal(signal.SIGTERM)
+            assert server.wait(timeout=30) == 0
+        # The answer only read local weather; the forecast was fetched by the
+        # refresh scheduler the worker started after the fork
+        assert weather_data.FORECAST_URLS['EN'] in upstream.requests
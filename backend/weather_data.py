@@ -1,23 +1,25 @@
 """A module to retrieve various weather data from Hong Kong Observatory"""
 
 import json
-import pkg_resources
-import re
-from operator import itemgetter
+import os
 import requests
 
-from distance_calculation import distance_calculation
+from delimited import RAINFALL_NOWCAST
+from hko_cache import cached_get, single_flight
+import spatial_index
 
-# Load required JSON data
-with open(pkg_resources.resource_filename(__name__, 'assets/grid_location.json')) as f:
-    GRID = json.load(f)
-with open(pkg_resources.resource_filename(__name__, 'assets/rainfall_nowcast_mapping.json')) as f:
-    RAINFALL_MAPPING = json.load(f)
+# Base URLs, which can point at a mirror or a local stand-in
+HKO_PDA_URL = os.environ.get('HKO_PDA_URL', 'http://pda.weather.gov.hk/')
+HKO_WEB_URL = os.environ.get('HKO_WEB_URL', 'http://www.weather.gov.hk/')
 
-# Base URLs
-HKO_PDA_URL = 'http://pda.weather.gov.hk/'
-HKO_WEB_URL = 'http://www.weather.gov.hk/'
+# Feed paths
+GRID_DATA_URL = 'locspc/android_data/gridData/{}_tc.xml'
+RAINFALL_NOWCAST_URL = 'locspc/android_data/rainfallnowcast/{}_{}.xml'
+UV_INDEX_URLS = {'UC': 'locspc/android_data/fuvc.xml', 'EN': 'locspc/android_data/fuve.xml'}
+WEATHER_WARNING_URLS = {'UC': 'wxinfo/json/warnsumc.xml', 'EN': 'wxinfo/json/warnsum.xml'}
+FORECAST_URLS = {'UC': 'locspc/android_data/fnd_uc.xml', 'EN': 'locspc/android_data/fnd_e.xml'}
 
+@single_flight
 def local_weather(lat, lng):
     """Retrieve local weather data from Hong Kong Observatory
     
@@ -28,36 +30,42 @@ def local_weather(lat, lng):
     Returns:
         dict: Response containing weather data and status
     """
-    response = {}
     if isinstance(lat, float) and isinstance(lng, float) and\
        -90 <= lat <= 90 and -180 <= lng <= 180:
-        temp_dict = GRID
-        for i in temp_dict:
-            distance = distance_calculation(lat, lng, float(i['lat']), float(i['lng']))
-            i['dis'] = distance
-        newlist = sorted(temp_dict, key=itemgetter('dis'))
-        if newlist[0]['dis'] < 10:
-            try:
-                grid = newlist[0]['grid']
-                url = 'locspc/android_data/gridData/{}_tc.xml'.format(grid)
-                grid_data = json.loads(requests.get(HKO_PDA_URL + url).text)
-                response['status'] = 1
-                response['result'] = grid_data
-                response['place'] = newlist[0]['name']
-            except IndexError:
-                response['result'] = ''
-                response['status'] = 2
-            except requests.exceptions.RequestException:
-                response['result'] = ''
-                response['status'] = 5
-        else:
+        return grid_weather(*spatial_index.RASTER.grid(lat, lng))
+    return {'result': '', 'status': 0}
+
+@single_flight
+def grid_weather(grid, place):
+    """Retrieve local weather data of a grid already looked up, see local_weather
+    
+    Args:
+        grid (str): The grid id, or None if no grid is within 10 km
+        place (str): The name of the grid point, returned as 'place'
+        
+    Returns:
+        dict: Response containing weather data and status
+    """
+    response = {}
+    if grid is not None:
+        try:
+            url = GRID_DATA_URL.format(grid)
+            grid_data = json.loads(cached_get(HKO_PDA_URL + url).text)
+            response['status'] = 1
+            response['result'] = grid_data
+            response['place'] = place
+        except IndexError:
             response['result'] = ''
-            response['status'] = 3
+            response['status'] = 2
+        except requests.exceptions.RequestException:
+            response['result'] = ''
+            response['status'] = 5
     else:
         response['result'] = ''
-        response['status'] = 0
+        response['status'] = 3
     return response
 
+@single_flight
 def rainfall_nowcast(lat, lng):
     """Retrieve rainfall nowcast data from Hong Kong Observatory
     
@@ -71,29 +79,24 @@ def rainfall_nowcast(lat, lng):
     response = {}
     if isinstance(lat, float) and isinstance(lng, float) and\
        -90 <= lat <= 90 and -180 <= lng <= 180:
-        temp_dict = RAINFALL_MAPPING
-        for i in temp_dict:
-            distance = distance_calculation(lat, lng, float(i['lat']), float(i['lng']))
-            i['dis'] = distance
-        newlist = sorted(temp_dict, key=itemgetter('dis'))
-        if newlist[0]['dis'] > 10:
+        nearest = spatial_index.RASTER.nowcast_point(lat, lng)
+        if nearest is None:
             response['result'] = ''
             response['status'] = 3
             return response
-        lat_2 = newlist[0]['lat']
-        lng_2 = newlist[0]['lng']
+        lat_2 = nearest.lat
+        lng_2 = nearest.lng
         try:
-            url = 'locspc/android_data/rainfallnowcast/{}_{}.xml'.format(float(lat_2), float(lng_2))
-            data = requests.get(HKO_PDA_URL + url).content
-            data2 = re.split('[@#]', data.decode('utf-8'))
+            url = RAINFALL_NOWCAST_URL.format(float(lat_2), float(lng_2))
+            record = RAINFALL_NOWCAST.parse(cached_get(HKO_PDA_URL + url).content)
             temp = {}
-            temp['0-30'] = {'from_time': data2[0], 'to_time': data2[2], 'value': data2[1]}
-            temp['30-60'] = {'from_time': data2[2], 'to_time': data2[4], 'value': data2[3]}
-            temp['60-90'] = {'from_time': data2[4], 'to_time': data2[6], 'value': data2[5]}
-            temp['90-120'] = {'from_time': data2[6], 'to_time': data2[8], 'value': data2[7]}
-            temp['description_en'] = data2[9]
-            temp['description_tc'] = data2[10]
-            temp['description_sc'] = data2[11]
+            temp['0-30'] = {'from_time': record.from_0, 'to_time': record.from_30, 'value': record.value_0}
+            temp['30-60'] = {'from_time': record.from_30, 'to_time': record.from_60, 'value': record.value_30}
+            temp['60-90'] = {'from_time': record.from_60, 'to_time': record.from_90, 'value': record.value_60}
+            temp['90-120'] = {'from_time': record.from_90, 'to_time': record.to_120, 'value': record.value_90}
+            temp['description_en'] = record.description_en
+            temp['description_tc'] = record.description_tc
+            temp['description_sc'] = record.description_sc
             response['result'] = temp
             response['status'] = 1
         except IndexError:
@@ -107,6 +110,7 @@ def rainfall_nowcast(lat, lng):
         response['status'] = 0
     return response
 
+@single_flight
 def uv_index(lang='UC'):
     """Retrieve UV index data from Hong Kong Observatory
     
@@ -120,7 +124,7 @@ def uv_index(lang='UC'):
     if lang in ['UC', 'EN']:
         try:
             if lang == 'UC':
-                data = requests.get(HKO_PDA_URL + 'locspc/android_data/fuvc.xml').content.decode('utf8')
+                data = cached_get(HKO_PDA_URL + UV_INDEX_URLS['UC']).content.decode('utf8')
                 data_1 = data.split(u'的最高紫外線指數大約是')
                 response['result'] = {}
                 response['result']['date'] = data_1[0]
@@ -128,7 +132,7 @@ def uv_index(lang='UC'):
                 response['result']['intensity'] = data_1[1].split(u'，強度屬於')[1][:-1]
                 response['status'] = 1
             if lang == 'EN':
-                data = requests.get(HKO_PDA_URL + 'locspc/android_data/fuve.xml').content.decode('utf8')
+                data = cached_get(HKO_PDA_URL + UV_INDEX_URLS['EN']).content.decode('utf8')
                 data_1 = data.replace('The maximum UV Index for ', '')\
                              .replace(' will be about ', ',')\
                              .replace('. The intensity of UV radiation wll be ', ',')[:-1]
@@ -153,6 +157,7 @@ def uv_index(lang='UC'):
         response['status'] = 0
     return response
 
+@single_flight
 def weather_warning(lang='UC'):
     """Retrieve weather warning data from Hong Kong Observatory
     
@@ -166,9 +171,9 @@ def weather_warning(lang='UC'):
     if lang in ['UC', 'EN']:
         try:
             if lang == 'UC':
-                data = requests.get(HKO_WEB_URL + 'wxinfo/json/warnsumc.xml')
+                data = cached_get(HKO_WEB_URL + WEATHER_WARNING_URLS['UC'])
             if lang == 'EN':
-                data = requests.get(HKO_WEB_URL + 'wxinfo/json/warnsum.xml')
+                data = cached_get(HKO_WEB_URL + WEATHER_WARNING_URLS['EN'])
             data_2 = json.loads(data.text.replace('var weather_warning_summary = ', '')[:-2] + '}')
             response['result'] = data_2
             response['status'] = 1
@@ -183,6 +188,7 @@ def weather_warning(lang='UC'):
         response['status'] = 0
     return response
 
+@single_flight
 def several_days_weather_forecast(lang='UC'):
     """Retrieve several days weather forecast data from Hong Kong Observatory
     
@@ -195,8 +201,8 @@ def several_days_weather_forecast(lang='UC'):
     response = {}
     if lang in ['UC', 'EN']:
         try:
-            url = 'locspc/android_data/fnd_uc.xml' if lang == 'UC' else 'locspc/android_data/fnd_e.xml'
-            data = json.loads(requests.get(HKO_PDA_URL + url).content)
+            url = FORECAST_URLS[lang]
+            data = json.loads(cached_get(HKO_PDA_URL + url).content)
             response['result'] = data
             response['status'] = 1
         except IndexError:
@@ -0,0 +1,67 @@
+"""An asyncio version of weather_data that fetches from Hong Kong Observatory
+without blocking the event loop
+
+Each coroutine works out the URLs its weather_data counterpart reads, fetches
+them concurrently through the shared response cache, then runs the
+counterpart on the prefetched responses, so both return exactly the same
+data and statuses.
+"""
+
+import weather_data
+from hko_cache import run_prefetched
+import spatial_index
+
+
+def _valid(lat, lng):
+    return isinstance(lat, float) and isinstance(lng, float) and\
+        -90 <= lat <= 90 and -180 <= lng <= 180
+
+
+def _lang_urls(base_url, urls, lang):
+    return [base_url + urls[lang]] if lang in urls else []
+
+
+async def local_weather(lat, lng):
+    """Retrieve local weather data from Hong Kong Observatory, see weather_data.local_weather"""
+    urls = []
+    if _valid(lat, lng):
+        grid, _ = spatial_index.RASTER.grid(lat, lng)
+        if grid is not None:
+            urls.append(weather_data.HKO_PDA_URL + weather_data.GRID_DATA_URL.format(grid))
+    return await run_prefetched(weather_data.local_weather, urls, lat, lng)
+
+
+async def grid_weather(grid, place):
+    """Retrieve local weather data of a grid already looked up, see weather_data.grid_weather"""
+    urls = [] if grid is None else [weather_data.HKO_PDA_URL + weather_data.GRID_DATA_URL.format(grid)]
+    return await run_prefetched(weather_data.grid_weather, urls, grid, place)
+
+
+async def rainfall_nowcast(lat, lng):
+    """Retrieve rainfall nowcast data from Hong Kong Observatory, see weather_data.rainfall_nowcast"""
+    urls = []
+    if _valid(lat, lng):
+        nearest = spatial_index.RASTER.nowcast_point(lat, lng)
+        if nearest is not None:
+            urls.append(weather_data.HKO_PDA_URL +
+                        weather_data.RAINFALL_NOWCAST_URL.format(float(nearest.lat), float(nearest.lng)))
+    return await run_prefetched(weather_data.rainfall_nowcast, urls, lat, lng)
+
+
+async def uv_index(lang='UC'):
+    """Retrieve UV index data from Hong Kong Observatory, see weather_data.uv_index"""
+    urls = _lang_urls(weather_data.HKO_PDA_URL, weather_data.UV_INDEX_URLS, lang)
+    return await run_prefetched(weather_data.uv_index, urls, lang)
+
+
+async def weather_warning(lang='UC'):
+    """Retrieve weather warning data from Hong Kong Observatory, see weather_data.weather_warning"""
+    urls = _lang_urls(weather_data.HKO_WEB_URL, weather_data.WEATHER_WARNING_URLS, lang)
+    return await run_prefetched(weather_data.weather_warning, urls, lang)
+
+
+async def several_days_weather_forecast(lang='UC'):
+    """Retrieve several days weather forecast data from Hong Kong Observatory,
+    see weather_data.several_days_weather_forecast"""
+    urls = _lang_urls(weather_data.HKO_PDA_URL, weather_data.FORECAST_URLS, lang)
+    return await run_prefetched(weather_data.several_days_weather_forecast, urls, lang)
@@ -0,0 +1,13 @@
+"""The WSGI entry point for production servers
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The app builds its grid and rainfall indexes, gazetteer and intent parser
+on first use. This module builds them on import instead, so a server that
+preloads it builds them once and shares them with every worker it forks.
+"""
+
+from app import create_app, preload
+
+preload()
+app = create_app()
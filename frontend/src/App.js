@@ -9,6 +9,7 @@ function App() {
   const [selectedPeriod, setSelectedPeriod] = useState(null);
   const [selectedInfoType, setSelectedInfoType] = useState(null);
   const [isLoading, setIsLoading] = useState(false);
+  const [sessionId, setSessionId] = useState(null);
   const messagesEndRef = useRef(null);
 
   const districts = ['Central', 'Wan Chai', 'Causeway Bay', 'Tai Po', 'Shatin', 'Tuen Mun', 'Yuen Long'];
@@ -34,7 +35,8 @@ function App() {
   const sendMessage = async (message) => {
     setIsLoading(true);
     try {
-      const response = await axios.post('http://localhost:5000/api/chat', { message });
+      const response = await axios.post('http://localhost:5000/api/chat', { message, session_id: sessionId });
+      setSessionId(response.data.session_id);
       setMessages(prev => [...prev, 
         { text: message, isUser: true }, 
         { text: response.data.message, isUser: false, formatted: formatMessage(response.data.message) }